@@ -6,34 +6,73 @@ Film Media 匹配 Web 服务
 """
 
 import asyncio
+import logging
+import math
 import os
 import json
 import uuid
-from datetime import timedelta
 from typing import List, Optional, Dict, Any
-from cachetools import TTLCache
-from langchain_openai import AzureOpenAIEmbeddings
-import boto3
-from botocore.exceptions import ClientError
-from one2x_sdk.medeo.core_api.core_api_client import CoreApiClient
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect
+from flask import Flask, render_template, request, jsonify, redirect, Response, stream_with_context, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-import threading
+from werkzeug.security import safe_join
 import time
 from dotenv import load_dotenv
+from task_store import create_task_store, MemoryTaskStore
+from s3_clients import get_s3_client, get_bucket_name
+from s3_transfer import ResumableDownloader, TransferSettings
+from media_cache import MediaCache, create_media_cache
+from bundle_stream import stream_zip, stream_tar
+from file_serving import serve_file, FileServeSettings
+from presign_cache import PresignedUrlCache
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import create_embedding_cache, normalize_text
+from search_cache import create_search_cache
+from task_executor import create_task_executor, QueueFullError
+from task_events import TaskEventBus
+from rate_limit import create_rate_limit_store, create_client_rate_limiter, create_upstream_budget
+from lazy import lazy_service
+from logs import configure_logging
+import metrics
 
 # 加载环境变量
 load_dotenv()
 
+# 分级、可采样的日志（取代 print）
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
 # 启用CORS
 CORS(app)
 
-# 全局变量存储任务状态
-task_status = {}
+# 任务状态存储（带容量上限和过期清理，含媒体索引）
+task_store = create_task_store()
+# SQLite/Redis 后端的读写会阻塞，在事件循环中调用时放到线程池（见 call_task_store）
+shared_task_store = not isinstance(task_store, MemoryTaskStore)
+
+# 任务状态变更通知，供 SSE 推送使用
+task_events = TaskEventBus()
+
+# 后台任务执行器：常驻事件循环 + 有界并发和队列，按客户端公平排队
+task_executor = create_task_executor()
+
+# 客户端令牌桶限流和各上游（embeddings / match / s3）的全局并发预算，状态可跨 worker 共享
+rate_limit_store = create_rate_limit_store()
+client_rate_limiter = create_client_rate_limiter(rate_limit_store)
+upstream_budget = create_upstream_budget(rate_limit_store)
+
+# 预签名URL缓存，剩余有效期不足时重新签名
+presigned_url_cache = PresignedUrlCache(
+    maxsize=int(os.environ.get('PRESIGN_CACHE_SIZE', 10000)),
+    expires_in=int(os.environ.get('PRESIGN_EXPIRES_IN', 3600)),
+    min_remaining=int(os.environ.get('PRESIGN_MIN_REMAINING', 900))
+)
+
+# 本地文件发送方式：直接发送或交给 nginx（X-Accel-Redirect）/ X-Sendfile
+file_serve_settings = FileServeSettings.from_env()
 
 class EmbeddingService:
     """文本转向量服务"""
@@ -45,29 +84,46 @@ class EmbeddingService:
         if not api_key or not endpoint:
             raise ValueError("缺少必要的环境变量: AZURE_OPENAI_API_KEY_EASTUS 或 AZURE_OPENAI_API_ENDPOINT_EASTUS")
         
+        # langchain_openai/openai 导入较慢，首次使用向量服务时才导入
+        from langchain_openai import AzureOpenAIEmbeddings
+        
+        self.model = "text-embedding-3-small"
+        self.dimensions = 512
         self.embeddings = AzureOpenAIEmbeddings(
-            azure_deployment="text-embedding-3-small",
+            azure_deployment=self.model,
             openai_api_key=api_key,
             azure_endpoint=endpoint,
-            dimensions=512,
+            dimensions=self.dimensions,
         )
-        self.embedding_cache = TTLCache(
-            maxsize=1000, ttl=timedelta(hours=1).total_seconds()
+        # 内存 + 磁盘两级缓存，键包含模型和维度
+        self.embedding_cache = create_embedding_cache(self.model, self.dimensions)
+        # 合并并发请求为批量调用，每个批次占用一个 embeddings 并发名额
+        async def embed_documents(texts: List[str]) -> List[List[float]]:
+            async with upstream_budget.slot("embeddings"):
+                return await self.embeddings.aembed_documents(texts)
+        
+        self.batcher = EmbeddingBatcher(
+            embed_documents,
+            window=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 10)) / 1000,
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 64)),
         )
     
     async def text_to_embedding(self, text: str) -> Optional[List[float]]:
         """将文本转换为向量"""
         try:
-            if text in self.embedding_cache:
-                return self.embedding_cache[text]
+            embedding = await self.embedding_cache.aget(text)
+            if embedding is not None:
+                return embedding
             
-            embedding = await self.embeddings.aembed_query(text)
-            self.embedding_cache[text] = embedding
+            # 使用规范化后的文本请求，保证同一缓存键对应同一向量
+            with metrics.timed("embedding"):
+                embedding = await self.batcher.embed(normalize_text(text))
+            await self.embedding_cache.aset(text, embedding)
             return embedding
         except Exception as e:
-            print(f"文本转向量失败: {str(e)}")
+            logger.warning("文本转向量失败: %s", e)
             return None
-
+    
 class S3Downloader:
     """AWS S3 文件下载器"""
     
@@ -75,112 +131,281 @@ class S3Downloader:
         self.aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
         self.aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         self.aws_region = os.getenv("AWS_REGION", "ap-east-1")
-        self.bucket_name = os.getenv("AWS_BUCKET", "one2x-share")
+        self.bucket_name = get_bucket_name()
         
         if not self.aws_access_key_id or not self.aws_secret_access_key:
             raise ValueError("缺少必要的 AWS 环境变量")
         
-        from botocore.config import Config
-        
-        if self.aws_region == 'ap-east-1':
-            # ap-east-1需要特殊配置
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.aws_access_key_id,
-                aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.aws_region,
-                endpoint_url=f'https://s3.{self.aws_region}.amazonaws.com',
-                config=Config(s3={'addressing_style': 'virtual'})
-            )
-        else:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.aws_access_key_id,
-                aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.aws_region
-            )
+        # 复用进程内共享的客户端
+        self.s3_client = get_s3_client(self.aws_region)
+        # 可续传的并发下载器
+        self.transfer = ResumableDownloader(self.s3_client, TransferSettings.from_env())
+        self.max_concurrent_downloads = int(os.getenv("S3_DOWNLOAD_CONCURRENCY", 4))
+    
+    @lazy_service
+    def media_cache(self) -> Optional[MediaCache]:
+        """跨任务共享的媒体缓存，任务目录只保存链接；首次下载时创建，缓存目录不可写时为 None"""
+        return create_media_cache(self.transfer)
     
-    async def download_file(self, key: str, local_path: str) -> bool:
-        """从 S3 下载文件"""
+    def fetch_to(self, key: str, local_path: str, head: Optional[dict] = None, on_bytes=None):
+        """获取对象到 local_path，占用一个 s3 并发名额（同步，在线程中调用）
+        
+        有媒体缓存时经过缓存并创建链接，否则直接下载
+        """
+        with upstream_budget.hold("s3"):
+            if self.media_cache is None:
+                self.transfer.download(self.bucket_name, key, local_path, on_bytes, head)
+                return
+            cached_path = self.media_cache.fetch(self.bucket_name, key, head, on_bytes)
+        self.media_cache.link_into(cached_path, local_path)
+    
+    async def download_file(self, key: str, local_path: str, on_bytes=None) -> bool:
+        """从 S3 下载文件（经过媒体缓存，在线程中执行，不阻塞事件循环；中断后可续传）"""
         try:
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            self.s3_client.download_file(self.bucket_name, key, local_path)
+            await asyncio.to_thread(self.fetch_to, key, local_path, None, on_bytes)
             return True
         except Exception as e:
-            print(f"S3 下载失败: {str(e)}")
+            logger.warning("S3 下载失败: %s", e, extra={"key": key})
             return False
     
-    async def download_media_files(self, media_list: List[dict], download_dir: str) -> List[str]:
-        """批量下载媒体文件"""
-        downloaded_files = []
+    async def download_media_files(self, media_list: List[dict], download_dir: str, progress_callback=None) -> List[str]:
+        """批量并发下载媒体文件
         
-        print(f"开始下载 {len(media_list)} 个媒体文件")
+        progress_callback: 进度回调 (已下载字节, 总字节, 已完成文件数, 文件总数)
+        """
+        logger.info("开始下载媒体文件", extra={"files": len(media_list), "download_dir": download_dir})
         
+        jobs = []
         for i, media in enumerate(media_list):
             if 'key' not in media:
-                print(f"媒体 {i+1} 缺少key字段: {media}")
+                logger.warning("媒体缺少key字段", extra={"index": i + 1, "media_id": media.get('id')})
                 continue
             
             key = media['key']
             media_id = media.get('id', f'media_{i+1}')
             file_extension = os.path.splitext(key)[1] or '.mp4'
             local_filename = f"{media_id}{file_extension}"
-            local_path = os.path.join(download_dir, local_filename)
-            
-            print(f"下载文件 {i+1}: {key} -> {local_path}")
-            success = await self.download_file(key, local_path)
-            if success:
-                downloaded_files.append(local_path)
-                print(f"下载成功: {local_path}")
-            else:
-                print(f"下载失败: {key}")
-        
-        print(f"下载完成，成功下载 {len(downloaded_files)} 个文件")
+            jobs.append((key, os.path.join(download_dir, local_filename)))
+        
+        # 先获取对象大小用于计算总进度
+        heads = await asyncio.gather(
+            *(asyncio.to_thread(self.s3_client.head_object, Bucket=self.bucket_name, Key=key) for key, _ in jobs),
+            return_exceptions=True
+        )
+        total_bytes = sum(head['ContentLength'] for head in heads if isinstance(head, dict))
+        progress = {"bytes": 0, "files": 0}
+        loop = asyncio.get_running_loop()
+        
+        def report():
+            if progress_callback is not None:
+                progress_callback(progress["bytes"], total_bytes, progress["files"], len(jobs))
+        
+        def on_bytes(count: int):
+            # 下载线程回调，切回事件循环线程更新进度
+            def add():
+                progress["bytes"] += count
+                report()
+            loop.call_soon_threadsafe(add)
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+        
+        async def download_one(key: str, local_path: str, head) -> bool:
+            if isinstance(head, BaseException):
+                logger.warning("下载失败: %s", head, extra={"key": key})
+                return False
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.fetch_to, key, local_path, head, on_bytes)
+                    success = True
+                except Exception as e:
+                    logger.warning("S3 下载失败: %s", e, extra={"key": key})
+                    success = False
+                metrics.observe_download(time.perf_counter() - start, success)
+            progress["files"] += 1
+            report()
+            return success
+        
+        results = await asyncio.gather(
+            *(download_one(key, local_path, head) for (key, local_path), head in zip(jobs, heads))
+        )
+        downloaded_files = [local_path for (_, local_path), success in zip(jobs, results) if success]
+        
+        logger.info("下载完成", extra={"downloaded": len(downloaded_files), "files": len(jobs)})
         return downloaded_files
 
+def file_mtime(path: str) -> Optional[float]:
+    """文件修改时间，不存在时返回 None"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
 class FilmMediaService:
-    """Film Media 匹配服务"""
+    """Film Media 匹配服务
+    
+    各依赖在首次使用时才创建，重量级库（aiohttp、numpy 等）也在此时才导入
+    """
     
     def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.s3_downloader = S3Downloader()
-        self.core_api_client = CoreApiClient(
-            base_url="https://medeo-core-api.test-us.one2x.ai", 
-            token="token",
-            enable_requests=True
-        )
+        # 搜索结果缓存：相同文本和阈值的搜索复用结果，进行中的相同搜索只执行一次
+        self.result_cache = create_search_cache()
+        # 本地索引快照文件的修改时间和上次检查时间，文件更新后重新加载
+        self._index_mtime: Optional[float] = None
+        self._index_checked_at = 0.0
+        self._index_reload: Optional[asyncio.Future] = None
+    
+    @lazy_service
+    def embedding_service(self) -> EmbeddingService:
+        return EmbeddingService()
+    
+    @lazy_service
+    def s3_downloader(self) -> S3Downloader:
+        return S3Downloader()
+    
+    @lazy_service
+    def core_api_client(self):
+        """异步 core API 客户端：连接池复用、调用时限、抖动重试和熔断"""
+        from core_api import create_core_api_client
+        return create_core_api_client()
     
-    async def search_media(self, text: str, match_threshold: float = 0, match_count: int = 5) -> Dict[str, Any]:
-        """搜索匹配的媒体"""
+    @lazy_service
+    def embedding_wire_format(self):
+        """查询向量的传输格式（可选紧凑的 base64 二进制，服务端不支持时回退 JSON 数组）"""
+        from embedding_codec import create_wire_format
+        return create_wire_format()
+    
+    @lazy_service
+    def local_index(self):
+        """可选的本地向量索引，配置 FILM_MEDIA_INDEX_PATH 后不再调用远程匹配接口"""
+        path = os.getenv("FILM_MEDIA_INDEX_PATH")
+        if not path:
+            return None
+        from vector_index import load_local_index
+        self._index_mtime = file_mtime(path)
+        return load_local_index()
+    
+    def reload_local_index(self) -> int:
+        """重新加载本地索引并清空搜索结果缓存（目录快照更新后调用），返回索引条数"""
+        from vector_index import load_local_index
+        mtime = file_mtime(os.getenv("FILM_MEDIA_INDEX_PATH", ""))
+        index = load_local_index()
+        self.local_index = index
+        self._index_mtime = mtime
+        self.result_cache.clear()
+        return len(index) if index is not None else 0
+    
+    def _check_local_index(self):
+        """每隔 FILM_MEDIA_INDEX_RELOAD_INTERVAL 秒检查快照文件，有更新时在后台线程中重新加载（期间继续使用旧索引）"""
+        # 索引尚未加载或未配置时不检查
+        if vars(self).get("local_index") is None:
+            return
+        interval = float(os.getenv("FILM_MEDIA_INDEX_RELOAD_INTERVAL", 60))
+        now = time.time()
+        if interval <= 0 or now - self._index_checked_at < interval:
+            return
+        if self._index_reload is not None and not self._index_reload.done():
+            return
+        self._index_checked_at = now
+        if file_mtime(os.getenv("FILM_MEDIA_INDEX_PATH", "")) == self._index_mtime:
+            return
+        
+        def reload():
+            try:
+                count = self.reload_local_index()
+                logger.info("本地向量索引已更新，搜索结果缓存已清空", extra={"entries": count})
+            except Exception as e:
+                logger.warning("重新加载本地向量索引失败: %s", e)
+        
+        self._index_reload = asyncio.ensure_future(asyncio.to_thread(reload))
+    
+    async def match_media(self, embedding: List[float], match_threshold: float = 0, match_count: int = 5) -> Dict[str, Any]:
+        """按向量匹配媒体"""
         try:
-            # 文本转向量
-            embedding = await self.embedding_service.text_to_embedding(text)
-            if embedding is None:
-                return {"error": "文本转向量失败"}
+            # 本地索引检索（精确和 IVF 模式都是整块矩阵运算，在线程中执行，不阻塞事件循环；NumPy 计算时释放 GIL）
+            local_index = self.local_index
+            if local_index is not None:
+                with metrics.timed("match_local"):
+                    media_list = await asyncio.to_thread(
+                        local_index.search, embedding, match_threshold, match_count
+                    )
+                return {"success": True, "media_list": media_list}
             
             # 调用API
-            test_data = {
-                "query_embedding": embedding,
-                "match_threshold": match_threshold,
-                "match_count": match_count
-            }
+            from core_api import CoreApiError
             
-            response = self.core_api_client.request(
-                'POST', 
-                'api/media/match-film-media', 
-                json=test_data
-            )
+            wire_format = self.embedding_wire_format.current
+            while True:
+                test_data = {
+                    **self.embedding_wire_format.payload(embedding, wire_format),
+                    "match_threshold": match_threshold,
+                    "match_count": match_count
+                }
+                
+                try:
+                    # 匹配接口只读，失败时可以重试；重试期间一直占用 match 并发名额
+                    async with upstream_budget.slot("match"):
+                        with metrics.timed("match"):
+                            response = await self.core_api_client.request(
+                                'POST',
+                                'api/media/match-film-media',
+                                json_body=test_data,
+                                idempotent=True
+                            )
+                    break
+                except CoreApiError as e:
+                    # 服务端不支持紧凑格式时改用 JSON 数组重试
+                    if not self.embedding_wire_format.should_fallback(wire_format, e.status):
+                        raise
+                    wire_format = "json"
             
             return {"success": True, "media_list": response}
             
         except Exception as e:
             return {"error": f"搜索失败: {str(e)}"}
     
-    async def download_media(self, media_list: List[dict], task_id: str) -> Dict[str, Any]:
+    async def search_media_batch(self, items: List[dict], concurrency: int = 8, on_item_done=None) -> List[Dict[str, Any]]:
+        """批量搜索（单条搜索是只有一条的特例）
+        
+        每条经过搜索结果缓存：命中直接返回，进行中的相同搜索（向量和匹配）只执行一次；
+        各条的向量请求由合并器合并为批量调用，匹配以有限并发执行
+        
+        items: [{"text", "match_threshold", "match_count"}]
+        on_item_done: 每条完成时调用的协程函数 (index, result)
+        """
+        # 在查询结果缓存之前检查索引更新，命中缓存的搜索同样能触发重新加载
+        self._check_local_index()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run_item(index: int, item: dict):
+            async def compute():
+                try:
+                    embedding = await self.embedding_service.text_to_embedding(item["text"])
+                    if embedding is None:
+                        return {"error": "文本转向量失败"}
+                    async with semaphore:
+                        return await self.match_media(embedding, item["match_threshold"], item["match_count"])
+                except Exception as e:
+                    return {"error": f"搜索失败: {str(e)}"}
+            
+            result = await self.result_cache.get_or_compute(
+                item["text"], item["match_threshold"], item["match_count"], compute
+            )
+            results[index] = result
+            if on_item_done is not None:
+                await on_item_done(index, result)
+        
+        await asyncio.gather(*(run_item(index, item) for index, item in enumerate(items)))
+        return results
+    
+    async def download_media(self, media_list: List[dict], task_id: str, progress_callback=None) -> Dict[str, Any]:
         """下载媒体文件"""
         try:
             download_dir = os.path.join("downloads", task_id)
-            downloaded_files = await self.s3_downloader.download_media_files(media_list, download_dir)
+            downloaded_files = await self.s3_downloader.download_media_files(
+                media_list, download_dir, progress_callback or download_progress_reporter(task_id)
+            )
             
             return {
                 "success": True, 
@@ -195,125 +420,503 @@ film_media_service = FilmMediaService()
 
 def update_task_status(task_id: str, status: str, progress: int = 0, message: str = "", data: Any = None):
     """更新任务状态"""
-    task_status[task_id] = {
+    task_store.set(task_id, {
         "status": status,  # pending, processing, completed, error
         "progress": progress,
         "message": message,
         "data": data,
         "created_at": time.time()
-    }
+    })
+    task_events.publish(task_id)
 
-async def process_search_task(task_id: str, text: str, match_threshold: float, match_count: int):
-    """处理搜索任务"""
-    try:
-        update_task_status(task_id, "processing", 20, "正在将文本转换为向量...")
-        
-        # 搜索媒体
-        result = await film_media_service.search_media(text, match_threshold, match_count)
-        
-        if "error" in result:
-            update_task_status(task_id, "error", 0, result["error"])
-            return
-        
-        media_list = result.get("media_list", [])
-        update_task_status(task_id, "processing", 60, f"找到 {len(media_list)} 个匹配的媒体...")
-        
-        # 为每个媒体生成观看URL
+async def call_task_store(fn, *args, **kwargs):
+    """在事件循环中执行读写任务存储的函数：共享存储放到线程池，不阻塞同一循环上的其他任务和 SSE；内存存储直接调用"""
+    if shared_task_store:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+def attach_watch_urls(media_list: List[dict]):
+    """为每个媒体生成观看URL"""
+    if not media_list:
+        return
+    # 预签名只需要 S3 客户端，不创建下载器和媒体缓存（Lambda 等只读文件系统上同样可用）
+    s3_client = get_s3_client()
+    bucket_name = get_bucket_name()
+    with metrics.timed("presign"):
         for media in media_list:
             try:
-                # 生成观看URL
-                s3_downloader = S3Downloader()
-                s3_client = s3_downloader.s3_client
-                
-                bucket_name = os.environ.get('AWS_BUCKET', 'one2x-share')
                 key = media['key']
                 
                 # 生成预签名URL用于观看
-                watch_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': bucket_name, 'Key': key},
-                    ExpiresIn=3600
-                )
+                watch_url = presigned_url_cache.get_url(s3_client, bucket_name, key)
                 
                 media['watch_url'] = watch_url
-                print(f"为媒体 {media['id']} 生成观看URL: {watch_url[:100]}...")
+                logger.debug("生成观看URL", extra={"media_id": media['id'], "sample": 0.01})
                 
             except Exception as e:
-                print(f"生成观看URL失败: {str(e)}")
+                logger.warning("生成观看URL失败: %s", e, extra={"media_id": media.get('id')})
                 media['watch_url'] = f"/api/download-direct/{media['id']}"
+
+async def run_search_items(task_id: str, items: List[dict], on_progress=None) -> List[Dict[str, Any]]:
+    """执行一组搜索并为结果生成观看URL，单条搜索和批量搜索共用
+    
+    返回每条的结果: {"index", "text", "status", "media_list"} 或 {"index", "text", "status", "error"}
+    on_progress: 每条完成时调用的协程函数 (已完成数, 当前结果列表)
+    """
+    results: List[Dict[str, Any]] = [
+        {"index": i, "text": item["text"], "status": "pending"} for i, item in enumerate(items)
+    ]
+    finished = 0
+    
+    async def on_item_done(index: int, result: Dict[str, Any]):
+        nonlocal finished
+        finished += 1
+        if "error" in result:
+            results[index].update({"status": "error", "error": result["error"]})
+        else:
+            media_list = result.get("media_list") or []
+            attach_watch_urls(media_list)
+            results[index].update({"status": "completed", "media_list": media_list})
+        if on_progress is not None:
+            await on_progress(finished, results)
+    
+    with metrics.timed("search"):
+        await film_media_service.search_media_batch(
+            items,
+            concurrency=int(os.environ.get('BATCH_SEARCH_CONCURRENCY', 8)),
+            on_item_done=on_item_done
+        )
+    
+    # 登记媒体索引，供下载接口按ID查找
+    all_media = [media for result in results for media in result.get("media_list", [])]
+    await call_task_store(task_store.register_media, task_id, all_media)
+    return results
+
+def download_progress_reporter(task_id: str, min_interval: float = 0.5):
+    """返回把下载进度写入任务状态 data.download 的回调（限制写入频率）"""
+    last_update = 0.0
+    
+    def report(done_bytes: int, total_bytes: int, files_done: int, files_total: int):
+        nonlocal last_update
+        now = time.time()
+        if files_done < files_total and now - last_update < min_interval:
+            return
+        last_update = now
+        current = task_store.get(task_id)
+        if current is None:
+            return
+        data = dict(current.get("data") or {})
+        data["download"] = {
+            "done_bytes": done_bytes,
+            "total_bytes": total_bytes,
+            "files_done": files_done,
+            "files_total": files_total
+        }
+        update_task_status(task_id, current["status"], current["progress"], current["message"], data)
+    
+    return report
+
+async def process_search_task(task_id: str, text: str, match_threshold: float, match_count: int):
+    """处理搜索任务（批量搜索只有一条时的特例）"""
+    try:
+        await call_task_store(update_task_status, task_id, "processing", 20, "正在将文本转换为向量...")
+        
+        items = [{"text": text, "match_threshold": match_threshold, "match_count": match_count}]
+        
+        async def on_progress(finished: int, results: List[Dict[str, Any]]):
+            if results[0]["status"] == "completed":
+                await call_task_store(update_task_status, task_id, "processing", 60,
+                                      f"找到 {len(results[0]['media_list'])} 个匹配的媒体...")
+        
+        result = (await run_search_items(task_id, items, on_progress))[0]
+        
+        if result["status"] == "error":
+            await call_task_store(update_task_status, task_id, "error", 0, result["error"])
+            return
         
         # 直接返回媒体列表，不预下载文件
-        update_task_status(task_id, "completed", 100, "处理完成", {
-            "media_list": media_list
+        await call_task_store(update_task_status, task_id, "completed", 100, "处理完成", {
+            "media_list": result["media_list"]
+        })
+        
+    except Exception as e:
+        logger.exception("搜索任务失败", extra={"task_id": task_id})
+        await call_task_store(update_task_status, task_id, "error", 0, f"处理失败: {str(e)}")
+
+async def process_batch_search_task(task_id: str, items: List[dict]):
+    """处理批量搜索任务，逐条完成时更新任务状态中的部分结果"""
+    try:
+        total = len(items)
+        await call_task_store(update_task_status, task_id, "processing", 10, f"正在将 {total} 条文本转换为向量...")
+        
+        last_update = 0.0
+        
+        async def on_progress(finished: int, results: List[Dict[str, Any]]):
+            nonlocal last_update
+            # 限制状态写入频率，避免大批量时反复序列化整个结果
+            now = time.time()
+            if finished < total and now - last_update < 0.5:
+                return
+            last_update = now
+            progress = 10 + int(85 * finished / total)
+            # 写入可能在线程中进行，传入快照，避免序列化时结果仍在变化
+            await call_task_store(update_task_status, task_id, "processing", progress,
+                                  f"已完成 {finished}/{total} 条搜索...", {
+                                      "items": [dict(result) for result in results]
+                                  })
+        
+        results = await run_search_items(task_id, items, on_progress)
+        
+        failed = sum(1 for result in results if result["status"] == "error")
+        message = "处理完成" if not failed else f"处理完成，{failed} 条失败"
+        await call_task_store(update_task_status, task_id, "completed", 100, message, {
+            "items": results
         })
         
     except Exception as e:
-        update_task_status(task_id, "error", 0, f"处理失败: {str(e)}")
+        logger.exception("搜索任务失败", extra={"task_id": task_id})
+        await call_task_store(update_task_status, task_id, "error", 0, f"处理失败: {str(e)}")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板记录请求耗时（不按具体路径，避免标签过多）"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_http(endpoint, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 指标"""
+    metrics.set_task_stats(task_executor.stats())
+    body, content_type = metrics.render()
+    return Response(body, headers={'Content-Type': content_type})
 
 @app.route('/')
 def index():
     """主页"""
     return render_template('index.html')
 
+def get_missing_env_vars() -> List[str]:
+    """检查搜索所需的环境变量"""
+    required_env_vars = [
+        'AZURE_OPENAI_API_KEY_EASTUS',
+        'AZURE_OPENAI_API_ENDPOINT_EASTUS',
+        'AWS_ACCESS_KEY_ID',
+        'AWS_SECRET_ACCESS_KEY',
+        'AWS_REGION',
+        'AWS_BUCKET'
+    ]
+    return [var for var in required_env_vars if not os.environ.get(var)]
+
+class InvalidSearchRequest(ValueError):
+    """搜索请求参数不合法，消息直接返回给调用方"""
+
+def parse_search_request(data: Optional[dict]) -> tuple:
+    """解析单条搜索请求体，返回 (text, match_threshold, match_count)"""
+    text = data.get('text', '').strip()
+    match_threshold = float(data.get('match_threshold', 0))
+    match_count = int(data.get('match_count', 5))
+    if not text:
+        raise InvalidSearchRequest("请输入搜索文本")
+    return text, match_threshold, match_count
+
+def parse_batch_items(data: Optional[dict]) -> List[dict]:
+    """解析批量搜索请求体，返回 [{"text", "match_threshold", "match_count"}]"""
+    data = data or {}
+    default_threshold = float(data.get('match_threshold', 0))
+    default_count = int(data.get('match_count', 5))
+    raw_items = data.get('items')
+    if raw_items is None:
+        raw_items = [{"text": text} for text in data.get('texts', [])]
+    
+    if not raw_items:
+        raise InvalidSearchRequest("请提供搜索文本列表")
+    
+    max_items = int(os.environ.get('BATCH_SEARCH_MAX_ITEMS', 500))
+    if len(raw_items) > max_items:
+        raise InvalidSearchRequest(f"单次最多 {max_items} 条搜索文本")
+    
+    items = []
+    for i, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {"text": raw}
+        text = str(raw.get('text', '')).strip()
+        if not text:
+            raise InvalidSearchRequest(f"第 {i + 1} 条搜索文本为空")
+        items.append({
+            "text": text,
+            "match_threshold": float(raw.get('match_threshold', default_threshold)),
+            "match_count": int(raw.get('match_count', default_count))
+        })
+    return items
+
+def search_cost(items: List[dict]) -> int:
+    """搜索请求消耗的令牌数：按条数计算（限流器会截断到桶容量）"""
+    return max(1, len(items))
+
+def enqueue_task(task_id: str, coro_fn, *args, client: str = "") -> bool:
+    """创建任务并提交到执行器，队列已满时删除任务并返回 False（Flask 和 ASGI 入口共用）
+    
+    client: 客户端标识，执行器按客户端公平排队并限制单个客户端的任务数
+    """
+    update_task_status(task_id, "pending", 0, "任务已创建，等待处理...")
+    try:
+        future = task_executor.submit(coro_fn, task_id, *args, client=client)
+    except QueueFullError:
+        task_store.delete(task_id)
+        metrics.count_rejected("queue_full")
+        return False
+    metrics.set_task_stats(task_executor.stats())
+    future.add_done_callback(lambda _: metrics.set_task_stats(task_executor.stats()))
+    return True
+
+def busy_response():
+    """任务队列已满时的 429 响应"""
+    response = jsonify({"error": "服务繁忙，请稍后重试"})
+    response.status_code = 429
+    response.headers['Retry-After'] = os.environ.get('SEARCH_RETRY_AFTER', '1')
+    return response
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After 只支持整数秒，向上取整且至少 1 秒"""
+    return str(max(1, math.ceil(seconds)))
+
+def rate_limited_response(retry_after: float):
+    """客户端超出限流时的 429 响应"""
+    response = jsonify({"error": "请求过于频繁，请稍后重试"})
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response
+
+def request_client_key() -> str:
+    """当前请求的客户端标识（API Key 或 IP）"""
+    return client_rate_limiter.client_key(
+        request.headers.get('X-API-Key'), request.remote_addr, request.headers.get('X-Forwarded-For')
+    )
+
 @app.route('/api/search', methods=['POST'])
 def search_media():
     """搜索媒体接口"""
     try:
-        data = request.get_json()
-        text = data.get('text', '').strip()
-        match_threshold = float(data.get('match_threshold', 0))
-        match_count = int(data.get('match_count', 5))
+        text, match_threshold, match_count = parse_search_request(request.get_json())
         
-        if not text:
-            return jsonify({"error": "请输入搜索文本"}), 400
+        # 按客户端限流，超出时不创建任务直接返回 429
+        client = request_client_key()
+        retry_after = client_rate_limiter.check(client)
+        if retry_after:
+            return rate_limited_response(retry_after)
         
         # 检查环境变量
-        required_env_vars = [
-            'AZURE_OPENAI_API_KEY_EASTUS',
-            'AZURE_OPENAI_API_ENDPOINT_EASTUS',
-            'AWS_ACCESS_KEY_ID',
-            'AWS_SECRET_ACCESS_KEY',
-            'AWS_REGION',
-            'AWS_BUCKET'
-        ]
-        
-        missing_vars = [var for var in required_env_vars if not os.environ.get(var)]
+        missing_vars = get_missing_env_vars()
         if missing_vars:
             return jsonify({"error": f"缺少环境变量: {', '.join(missing_vars)}"}), 500
         
-        # 创建任务
+        # 创建任务并提交到后台执行器
         task_id = str(uuid.uuid4())
-        update_task_status(task_id, "pending", 0, "任务已创建，等待处理...")
+        if not enqueue_task(task_id, process_search_task, text, match_threshold, match_count, client=client):
+            return busy_response()
         
-        # 异步处理任务
-        def run_task():
-            asyncio.run(process_search_task(task_id, text, match_threshold, match_count))
+        return jsonify({"task_id": task_id})
         
-        thread = threading.Thread(target=run_task)
-        thread.start()
+    except InvalidSearchRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_media_batch():
+    """批量搜索媒体接口
+    
+    请求体: {"items": [{"text", "match_threshold", "match_count"}], "match_threshold", "match_count"}
+    也可以只传 {"texts": [...]}，阈值和数量使用请求级默认值
+    """
+    try:
+        items = parse_batch_items(request.get_json())
         
-        return jsonify({"task_id": task_id})
+        # 按客户端限流，批量搜索按条数消耗令牌
+        client = request_client_key()
+        retry_after = client_rate_limiter.check(client, search_cost(items))
+        if retry_after:
+            return rate_limited_response(retry_after)
+        
+        # 检查环境变量
+        missing_vars = get_missing_env_vars()
+        if missing_vars:
+            return jsonify({"error": f"缺少环境变量: {', '.join(missing_vars)}"}), 500
         
+        # 创建任务并提交到后台执行器
+        task_id = str(uuid.uuid4())
+        if not enqueue_task(task_id, process_batch_search_task, items, client=client):
+            return busy_response()
+        
+        return jsonify({"task_id": task_id, "count": len(items)})
+        
+    except InvalidSearchRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({"error": f"请求参数错误: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/status/<task_id>')
 def get_task_status(task_id):
     """获取任务状态"""
-    if task_id not in task_status:
+    status = task_store.get(task_id)
+    if status is None:
+        return jsonify({"error": "任务不存在"}), 404
+    
+    return jsonify(status)
+
+@app.route('/api/status/<task_id>/stream')
+def stream_task_status(task_id):
+    """推送任务状态（Server-Sent Events），任务完成或出错后关闭"""
+    if task_store.get(task_id) is None:
         return jsonify({"error": "任务不存在"}), 404
     
-    return jsonify(task_status[task_id])
+    # 内存存储的变更都会在本进程内通知；共享存储的变更可能来自其他 worker，需要定期重新读取
+    wait_timeout = float(os.environ.get('TASK_STREAM_POLL_INTERVAL', 1 if shared_task_store else 15))
+    max_duration = float(os.environ.get('TASK_STREAM_MAX_DURATION', 300))
+    
+    def generate():
+        deadline = time.time() + max_duration
+        last_payload = None
+        with task_events.subscribe(task_id) as subscription:
+            while True:
+                status = task_store.get(task_id)
+                if status is None:
+                    yield f"event: error\ndata: {json.dumps({'error': '任务不存在'}, ensure_ascii=False)}\n\n"
+                    return
+                
+                payload = json.dumps(status, ensure_ascii=False)
+                if payload != last_payload:
+                    last_payload = payload
+                    yield f"data: {payload}\n\n"
+                
+                if status.get('status') in ('completed', 'error') or time.time() >= deadline:
+                    return
+                
+                if not subscription.wait(wait_timeout):
+                    # 保持连接，避免被代理断开
+                    yield ": keepalive\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+class LeasedBody:
+    """关闭时归还 s3 并发名额的 S3 响应体"""
+    
+    def __init__(self, body, lease_id: Optional[str]):
+        self.body = body
+        self.lease_id = lease_id
+    
+    def read(self, size: int = -1) -> bytes:
+        return self.body.read(size)
+    
+    def close(self):
+        try:
+            self.body.close()
+        finally:
+            lease_id, self.lease_id = self.lease_id, None
+            upstream_budget.release("s3", lease_id)
+
+def collect_bundle_entries(task_id: str, include_s3: bool) -> List[tuple]:
+    """收集任务打包的文件：优先使用任务目录中的本地文件，可选直接从 S3 读取未缓存的媒体"""
+    download_dir = os.path.join("downloads", task_id)
+    entries = []
+    seen = set()
+    
+    def local_opener(path: str):
+        return lambda: (open(path, 'rb'), os.path.getsize(path))
+    
+    def s3_opener(key: str):
+        def opener():
+            # 读取期间占用一个 s3 并发名额，打包流读完或关闭该文件时归还
+            lease_id = upstream_budget.acquire("s3")
+            try:
+                response = get_s3_client().get_object(Bucket=get_bucket_name(), Key=key)
+            except Exception:
+                upstream_budget.release("s3", lease_id)
+                raise
+            return LeasedBody(response['Body'], lease_id), response['ContentLength']
+        return opener
+    
+    # 任务结果中的媒体
+    status = task_store.get(task_id)
+    data = (status or {}).get('data') or {}
+    media_list = list(data.get('media_list') or [])
+    for item in data.get('items') or []:
+        media_list.extend(item.get('media_list') or [])
+    for i, media in enumerate(media_list):
+        if 'key' not in media:
+            continue
+        filename = f"{media.get('id', f'media_{i+1}')}{os.path.splitext(media['key'])[1] or '.mp4'}"
+        if filename in seen:
+            continue
+        local_path = os.path.join(download_dir, filename)
+        if os.path.isfile(local_path):
+            entries.append((filename, local_opener(local_path)))
+            seen.add(filename)
+        elif include_s3:
+            entries.append((filename, s3_opener(media['key'])))
+            seen.add(filename)
+    
+    # 任务目录中的其他文件（例如任务状态已过期）
+    if os.path.isdir(download_dir):
+        for filename in sorted(os.listdir(download_dir)):
+            file_path = os.path.join(download_dir, filename)
+            if filename in seen or filename.endswith(('.part', '.part.json')) or not os.path.isfile(file_path):
+                continue
+            entries.append((filename, local_opener(file_path)))
+            seen.add(filename)
+    return entries
+
+@app.route('/api/download/<task_id>/bundle')
+def download_bundle(task_id):
+    """打包下载任务的全部媒体（流式 zip/tar）
+    
+    format: zip（默认，仅存储不压缩）或 tar
+    s3: 为 1 时，本地还没有的媒体直接从 S3 读取写入打包流
+    """
+    try:
+        bundle_format = request.args.get('format', 'zip')
+        if bundle_format not in ('zip', 'tar'):
+            return jsonify({"error": "format 只支持 zip 或 tar"}), 400
+        include_s3 = request.args.get('s3', '0') in ('1', 'true')
+        
+        entries = collect_bundle_entries(secure_filename(task_id), include_s3)
+        if not entries:
+            return jsonify({"error": "没有可下载的文件"}), 404
+        
+        if bundle_format == 'zip':
+            body, mimetype = stream_zip(entries), 'application/zip'
+        else:
+            body, mimetype = stream_tar(entries), 'application/x-tar'
+        
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="{task_id}.{bundle_format}"',
+            'X-Accel-Buffering': 'no'
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/api/download/<task_id>/<filename>')
 def download_file(task_id, filename):
     """下载文件"""
     try:
-        file_path = os.path.join("downloads", task_id, filename)
-        if not os.path.exists(file_path):
+        file_path = safe_join("downloads", task_id, filename)
+        if file_path is None or not os.path.isfile(file_path):
             return jsonify({"error": "文件不存在"}), 404
         
-        return send_file(file_path, as_attachment=True)
+        # 支持 Range（断点续传、播放器拖动）、ETag/304，可交给 nginx 发送
+        return serve_file(request, file_path, filename, as_attachment=True, settings=file_serve_settings)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -343,122 +946,53 @@ def list_downloads(task_id):
 def download_direct(media_id):
     """直接从S3下载文件"""
     try:
-        print(f"开始处理下载请求，媒体ID: {media_id}")
-        
-        # 从任务状态中查找对应的媒体信息
-        media_info = None
-        print(f"当前任务状态数量: {len(task_status)}")
-        
-        for task_id, task_data in task_status.items():
-            print(f"检查任务 {task_id}: {task_data.get('status')}")
-            if task_data.get('status') == 'completed' and task_data.get('data', {}).get('media_list'):
-                print(f"任务 {task_id} 有媒体列表: {len(task_data['data']['media_list'])} 个")
-                for media in task_data['data']['media_list']:
-                    print(f"检查媒体: {media.get('id')}")
-                    if media.get('id') == media_id:
-                        media_info = media
-                        print(f"找到匹配的媒体信息: {media_info}")
-                        break
-                if media_info:
-                    break
+        # 从媒体索引中查找对应的媒体信息
+        media_info = task_store.get_media(media_id)
         
         if not media_info:
-            print("未找到媒体信息")
+            logger.info("未找到媒体信息", extra={"media_id": media_id})
             return jsonify({"error": "媒体信息不存在"}), 404
         
         key = media_info['key']
         file_extension = os.path.splitext(key)[1] or '.mp4'
         filename = f"{media_id}{file_extension}"
         
-        print(f"准备下载文件: {key}")
-        
         # 检查AWS环境变量
         aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
         aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
         aws_region = os.environ.get('AWS_REGION', 'ap-east-1')
-        aws_bucket = os.environ.get('AWS_BUCKET', 'one2x-share')
-        
-        print(f"AWS环境变量检查:")
-        print(f"  ACCESS_KEY_ID: {'已设置' if aws_access_key else '未设置'}")
-        print(f"  SECRET_ACCESS_KEY: {'已设置' if aws_secret_key else '未设置'}")
-        print(f"  REGION: {aws_region}")
-        print(f"  BUCKET: {aws_bucket}")
+        aws_bucket = get_bucket_name()
         
         if not aws_access_key or not aws_secret_key:
+            logger.error("AWS环境变量未正确配置", extra={"region": aws_region, "bucket": aws_bucket})
             return jsonify({"error": "AWS环境变量未正确配置"}), 500
         
         # 直接从S3生成预签名URL进行下载
         try:
-            # 直接创建S3客户端，避免使用S3Downloader类
-            import boto3
-            from botocore.config import Config
-            
-            # 为ap-east-1区域配置正确的端点
-            region = os.environ.get('AWS_REGION', 'ap-east-1')
-            if region == 'ap-east-1':
-                # ap-east-1需要特殊配置
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-                    region_name=region,
-                    endpoint_url=f'https://s3.{region}.amazonaws.com',
-                    config=Config(s3={'addressing_style': 'virtual'})
-                )
-            else:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-                    region_name=region
-                )
+            # 复用共享的S3客户端
+            s3_client = get_s3_client(aws_region)
+            bucket_name = aws_bucket
             
-            bucket_name = os.environ.get('AWS_BUCKET', 'one2x-share')
-            print(f"S3客户端创建成功，bucket: {bucket_name}")
-            
-            # 生成预签名URL，有效期1小时（用于在线观看）
-            presigned_url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': bucket_name, 
-                    'Key': key
-                },
-                ExpiresIn=3600
-            )
-            
-            print(f"预签名URL生成成功: {presigned_url[:100]}...")
+            # 生成预签名URL（用于在线观看），有效期内复用缓存
+            presigned_url = presigned_url_cache.get_url(s3_client, bucket_name, key)
             
             # 重定向到预签名URL
             return redirect(presigned_url)
             
         except Exception as e:
-            print(f"S3预签名URL生成失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("S3预签名URL生成失败", extra={"media_id": media_id})
             return jsonify({"error": f"文件下载失败: {str(e)}"}), 500
         
     except Exception as e:
-        print(f"下载直接API错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("下载直接API错误", extra={"media_id": media_id})
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/download-file/<media_id>')
 def download_file_direct(media_id):
     """强制下载文件"""
     try:
-        print(f"开始处理强制下载请求，媒体ID: {media_id}")
-        
-        # 从任务状态中查找对应的媒体信息
-        media_info = None
-        for task_id, task_data in task_status.items():
-            if task_data.get('status') == 'completed' and task_data.get('data', {}).get('media_list'):
-                for media in task_data['data']['media_list']:
-                    if media.get('id') == media_id:
-                        media_info = media
-                        break
-                if media_info:
-                    break
+        # 从媒体索引中查找对应的媒体信息
+        media_info = task_store.get_media(media_id)
         
         if not media_info:
             return jsonify({"error": "媒体信息不存在"}), 404
@@ -471,53 +1005,29 @@ def download_file_direct(media_id):
         aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
         aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
         aws_region = os.environ.get('AWS_REGION', 'ap-east-1')
-        aws_bucket = os.environ.get('AWS_BUCKET', 'one2x-share')
+        aws_bucket = get_bucket_name()
         
         if not aws_access_key or not aws_secret_key:
             return jsonify({"error": "AWS环境变量未正确配置"}), 500
         
         # 生成强制下载的预签名URL
         try:
-            import boto3
-            from botocore.config import Config
-            
-            region = os.environ.get('AWS_REGION', 'ap-east-1')
-            if region == 'ap-east-1':
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-                    region_name=region,
-                    endpoint_url=f'https://s3.{region}.amazonaws.com',
-                    config=Config(s3={'addressing_style': 'virtual'})
-                )
-            else:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-                    region_name=region
-                )
+            s3_client = get_s3_client(aws_region)
             
             # 生成强制下载的预签名URL
-            presigned_url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': aws_bucket, 
-                    'Key': key,
-                    'ResponseContentDisposition': f'attachment; filename="{filename}"'
-                },
-                ExpiresIn=3600
+            presigned_url = presigned_url_cache.get_url(
+                s3_client, aws_bucket, key,
+                disposition=f'attachment; filename="{filename}"'
             )
             
             return redirect(presigned_url)
             
         except Exception as e:
-            print(f"强制下载URL生成失败: {str(e)}")
+            logger.warning("强制下载URL生成失败: %s", e, extra={"media_id": media_id})
             return jsonify({"error": f"文件下载失败: {str(e)}"}), 500
         
     except Exception as e:
-        print(f"强制下载API错误: {str(e)}")
+        logger.exception("强制下载API错误", extra={"media_id": media_id})
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI 入口（Starlette）
+与 app.py 的 Flask 接口相同（路径、参数、状态码和响应格式不变），区别在于：
+- 搜索任务在服务器自己的事件循环上执行（任务执行器 attach 到该循环），没有后台线程和跨线程提交
+- SSE 状态推送在事件循环中等待通知，不为每个连接占用一个线程
+- 只读取任务存储或本地文件的接口是同步函数，由 Starlette 放到线程池执行
+服务实例、任务存储和搜索流程与 app.py 共用，Flask 入口（gunicorn app:app）继续可用。
+
+运行: uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers 4
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from werkzeug.wrappers import Request as WerkzeugRequest
+
+import metrics
+from app import (
+    InvalidSearchRequest, call_task_store, client_rate_limiter, collect_bundle_entries, enqueue_task,
+    file_serve_settings, film_media_service, get_missing_env_vars, parse_batch_items, parse_search_request,
+    presigned_url_cache, process_batch_search_task, process_search_task, rate_limit_store, retry_after_header,
+    search_cost, shared_task_store, task_events, task_executor, task_store,
+)
+from bundle_stream import stream_tar, stream_zip
+from file_serving import serve_file
+from rate_limit import MemoryRateLimitStore
+from s3_clients import get_bucket_name, get_s3_client
+
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def busy_response() -> JSONResponse:
+    """任务队列已满时的 429 响应"""
+    return JSONResponse({"error": "服务繁忙，请稍后重试"}, status_code=429,
+                        headers={"Retry-After": os.environ.get("SEARCH_RETRY_AFTER", "1")})
+
+
+def rate_limited_response(retry_after: float) -> JSONResponse:
+    """客户端超出限流时的 429 响应"""
+    return JSONResponse({"error": "请求过于频繁，请稍后重试"}, status_code=429,
+                        headers={"Retry-After": retry_after_header(retry_after)})
+
+
+async def check_rate_limit(request: Request, cost: int = 1) -> tuple:
+    """按客户端扣除令牌，返回 (客户端标识, 需要等待的秒数)；共享后端的读写放到线程池"""
+    client = client_rate_limiter.client_key(
+        request.headers.get("x-api-key"), request.client.host if request.client else None,
+        request.headers.get("x-forwarded-for"),
+    )
+    if isinstance(rate_limit_store, MemoryRateLimitStore):
+        return client, client_rate_limiter.check(client, cost)
+    return client, await asyncio.to_thread(client_rate_limiter.check, client, cost)
+
+
+def index(request: Request):
+    """主页"""
+    return templates.TemplateResponse(request, "index.html")
+
+
+def metrics_endpoint(request: Request):
+    """Prometheus 指标"""
+    metrics.set_task_stats(task_executor.stats())
+    body, content_type = metrics.render()
+    return Response(body, headers={"Content-Type": content_type})
+
+
+async def read_json(request: Request):
+    """与 Flask 的 get_json 一致：请求体不是 JSON 时返回 None"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def search_media(request: Request):
+    """搜索媒体接口"""
+    try:
+        text, match_threshold, match_count = parse_search_request(await read_json(request))
+
+        client, retry_after = await check_rate_limit(request)
+        if retry_after:
+            return rate_limited_response(retry_after)
+
+        missing_vars = get_missing_env_vars()
+        if missing_vars:
+            return error(f"缺少环境变量: {', '.join(missing_vars)}", 500)
+
+        task_id = str(uuid.uuid4())
+        if not await call_task_store(enqueue_task, task_id, process_search_task, text, match_threshold,
+                                     match_count, client=client):
+            return busy_response()
+        return JSONResponse({"task_id": task_id})
+    except InvalidSearchRequest as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def search_media_batch(request: Request):
+    """批量搜索媒体接口（请求格式同 Flask 入口）"""
+    try:
+        items = parse_batch_items(await read_json(request))
+
+        client, retry_after = await check_rate_limit(request, search_cost(items))
+        if retry_after:
+            return rate_limited_response(retry_after)
+
+        missing_vars = get_missing_env_vars()
+        if missing_vars:
+            return error(f"缺少环境变量: {', '.join(missing_vars)}", 500)
+
+        task_id = str(uuid.uuid4())
+        if not await call_task_store(enqueue_task, task_id, process_batch_search_task, items, client=client):
+            return busy_response()
+        return JSONResponse({"task_id": task_id, "count": len(items)})
+    except InvalidSearchRequest as e:
+        return error(str(e), 400)
+    except (TypeError, ValueError, AttributeError) as e:
+        return error(f"请求参数错误: {str(e)}", 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def get_task_status(request: Request):
+    """获取任务状态"""
+    status = task_store.get(request.path_params["task_id"])
+    if status is None:
+        return error("任务不存在", 404)
+    return JSONResponse(status)
+
+
+async def stream_task_status(request: Request):
+    """推送任务状态（Server-Sent Events），任务完成或出错后关闭"""
+    task_id = request.path_params["task_id"]
+    # 共享存储（SQLite/Redis）的读取会阻塞，放到线程池；内存存储直接读取
+    async def get_status():
+        return await call_task_store(task_store.get, task_id)
+
+    if await get_status() is None:
+        return error("任务不存在", 404)
+
+    wait_timeout = float(os.environ.get("TASK_STREAM_POLL_INTERVAL", 1 if shared_task_store else 15))
+    max_duration = float(os.environ.get("TASK_STREAM_MAX_DURATION", 300))
+
+    async def generate():
+        deadline = time.time() + max_duration
+        last_payload = None
+        with task_events.subscribe(task_id) as subscription:
+            while True:
+                status = await get_status()
+                if status is None:
+                    yield f"event: error\ndata: {json.dumps({'error': '任务不存在'}, ensure_ascii=False)}\n\n"
+                    return
+
+                payload = json.dumps(status, ensure_ascii=False)
+                if payload != last_payload:
+                    last_payload = payload
+                    yield f"data: {payload}\n\n"
+
+                if status.get("status") in ("completed", "error") or time.time() >= deadline:
+                    return
+
+                if not await subscription.wait_async(wait_timeout):
+                    # 保持连接，避免被代理断开
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+def download_bundle(request: Request):
+    """打包下载任务的全部媒体（流式 zip/tar，同步生成器由 Starlette 在线程池中迭代）"""
+    task_id = request.path_params["task_id"]
+    try:
+        bundle_format = request.query_params.get("format", "zip")
+        if bundle_format not in ("zip", "tar"):
+            return error("format 只支持 zip 或 tar", 400)
+        include_s3 = request.query_params.get("s3", "0") in ("1", "true")
+
+        entries = collect_bundle_entries(secure_filename(task_id), include_s3)
+        if not entries:
+            return error("没有可下载的文件", 404)
+
+        if bundle_format == "zip":
+            body, media_type = stream_zip(entries), "application/zip"
+        else:
+            body, media_type = stream_tar(entries), "application/x-tar"
+        return StreamingResponse(body, media_type=media_type, headers={
+            "Content-Disposition": f'attachment; filename="{task_id}.{bundle_format}"',
+            "X-Accel-Buffering": "no",
+        })
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def _werkzeug_request(request: Request) -> WerkzeugRequest:
+    """用请求方法和请求头构造 werkzeug 请求，复用 serve_file 的条件请求和 Range 处理"""
+    environ = {"REQUEST_METHOD": request.method}
+    for name, value in request.headers.items():
+        environ["HTTP_" + name.upper().replace("-", "_")] = value
+    return WerkzeugRequest(environ)
+
+
+def _closing(body):
+    """迭代完成或连接断开后关闭文件"""
+    try:
+        yield from body
+    finally:
+        close = getattr(body, "close", None)
+        if close is not None:
+            close()
+
+
+def download_file(request: Request):
+    """下载文件（Range、ETag/304、X-Accel-Redirect 与 Flask 入口相同）"""
+    try:
+        filename = request.path_params["filename"]
+        file_path = safe_join("downloads", request.path_params["task_id"], filename)
+        if file_path is None or not os.path.isfile(file_path):
+            return error("文件不存在", 404)
+
+        response = serve_file(_werkzeug_request(request), file_path, filename, as_attachment=True,
+                              settings=file_serve_settings)
+        headers = dict(response.headers)
+        if response.status_code in (304, 416) or request.method == "HEAD" or not response.response:
+            return Response(b"", status_code=response.status_code, headers=headers)
+        return StreamingResponse(_closing(response.response), status_code=response.status_code, headers=headers)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def list_downloads(request: Request):
+    """列出下载的文件"""
+    task_id = request.path_params["task_id"]
+    try:
+        download_dir = os.path.join("downloads", task_id)
+        if not os.path.exists(download_dir):
+            return JSONResponse({"files": []})
+
+        files = []
+        for filename in os.listdir(download_dir):
+            file_path = os.path.join(download_dir, filename)
+            if os.path.isfile(file_path):
+                files.append({
+                    "filename": filename,
+                    "size": os.path.getsize(file_path),
+                    "download_url": f"/api/download/{task_id}/{filename}",
+                })
+        return JSONResponse({"files": files})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def _redirect_to_s3(media_id: str, attachment: bool):
+    """重定向到媒体的预签名URL，attachment 为 True 时强制下载"""
+    try:
+        media_info = task_store.get_media(media_id)
+        if not media_info:
+            return error("媒体信息不存在", 404)
+
+        key = media_info["key"]
+        filename = f"{media_id}{os.path.splitext(key)[1] or '.mp4'}"
+        if not os.environ.get("AWS_ACCESS_KEY_ID") or not os.environ.get("AWS_SECRET_ACCESS_KEY"):
+            return error("AWS环境变量未正确配置", 500)
+
+        try:
+            s3_client = get_s3_client(os.environ.get("AWS_REGION", "ap-east-1"))
+            presigned_url = presigned_url_cache.get_url(
+                s3_client, get_bucket_name(), key,
+                disposition=f'attachment; filename="{filename}"' if attachment else None,
+            )
+            # 与 Flask redirect 相同使用 302
+            return RedirectResponse(presigned_url, status_code=302)
+        except Exception as e:
+            return error(f"文件下载失败: {str(e)}", 500)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def download_direct(request: Request):
+    """直接从S3下载文件"""
+    return _redirect_to_s3(request.path_params["media_id"], attachment=False)
+
+
+def download_file_direct(request: Request):
+    """强制下载文件"""
+    return _redirect_to_s3(request.path_params["media_id"], attachment=True)
+
+
+routes = [
+    Route("/", index),
+    Route("/metrics", metrics_endpoint),
+    Route("/api/search", search_media, methods=["POST"]),
+    Route("/api/search/batch", search_media_batch, methods=["POST"]),
+    Route("/api/status/{task_id}", get_task_status),
+    Route("/api/status/{task_id}/stream", stream_task_status),
+    Route("/api/download/{task_id}/bundle", download_bundle),
+    Route("/api/download/{task_id}/{filename}", download_file),
+    Route("/api/downloads/{task_id}", list_downloads),
+    Route("/api/download-direct/{media_id}", download_direct),
+    Route("/api/download-file/{media_id}", download_file_direct),
+]
+
+# 路由函数 -> 路径模板，作为请求耗时指标的标签
+_ROUTE_PATHS = {route.endpoint: route.path for route in routes}
+
+
+class RequestMetricsMiddleware:
+    """按路由模板记录请求耗时（纯 ASGI 中间件，不缓冲流式响应）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = _ROUTE_PATHS.get(scope.get("endpoint"), "unmatched")
+            metrics.observe_http(endpoint, scope["method"], status, time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 搜索任务在服务器的事件循环上执行
+    task_executor.attach()
+    yield
+    if "embedding_service" in vars(film_media_service):
+        await film_media_service.embedding_service.batcher.close()
+    if "core_api_client" in vars(film_media_service):
+        await film_media_service.core_api_client.close()
+
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ],
+    lifespan=lifespan,
+)
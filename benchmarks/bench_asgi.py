@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flask（gunicorn gthread worker，配置见 gunicorn.conf.py）与 ASGI（uvicorn + asgi:app）对比基准
+两种模式使用相同的 worker 数，上游为本地 Azure 向量接口和 core API 替身：
+- status: 并发查询 /api/status/<id> 的每秒请求数
+- search: 并发提交 /api/search 并轮询状态直到完成，每秒完成的搜索数和延迟
+- stream: 同时打开大量 SSE 状态推送连接，统计限定时间内收到首个事件的连接数，
+  以及服务进程（含 worker）RSS 的增量折算到每个连接的内存
+
+用法: python benchmarks/bench_asgi.py [--workers 4 --concurrency 64 --duration 5 --streams 200 --json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import FakeAzureEmbeddings  # noqa: E402
+from benchmarks.fakes.core_api import FakeCoreApi  # noqa: E402
+from benchmarks.harness import AppServer, app_env, tree_rss_mb  # noqa: E402
+
+
+async def submit_search(session: aiohttp.ClientSession, base_url: str, text: str) -> str:
+    """提交搜索，返回任务ID；未被接受（例如 429）时抛出 RuntimeError"""
+    async with session.post(f"{base_url}/api/search", json={"text": text}) as response:
+        body = await response.json()
+    if response.status != 200:
+        raise RuntimeError(f"搜索未被接受: {response.status} {body}")
+    return body["task_id"]
+
+
+async def wait_task(session: aiohttp.ClientSession, base_url: str, task_id: str, timeout: float = 30) -> dict:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        async with session.get(f"{base_url}/api/status/{task_id}") as response:
+            status = await response.json()
+        if status["status"] in ("completed", "error"):
+            return status
+        await asyncio.sleep(0.02)
+    raise TimeoutError(task_id)
+
+
+async def bench_status(base_url: str, concurrency: int, duration: float) -> dict:
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        task_id = await submit_search(session, base_url, "status probe")
+        await wait_task(session, base_url, task_id)
+        count = 0
+        end = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal count
+            while time.perf_counter() < end:
+                async with session.get(f"{base_url}/api/status/{task_id}") as response:
+                    await response.read()
+                count += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return {"rps": count / (time.perf_counter() - start)}
+
+
+async def bench_search(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    end = time.perf_counter() + duration
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+
+        async def worker(worker_id: int):
+            nonlocal errors
+            n = 0
+            while time.perf_counter() < end:
+                # 每次使用不同文本，避免命中搜索结果缓存
+                text = f"search {worker_id} {n} {time.time()}"
+                n += 1
+                start = time.perf_counter()
+                try:
+                    task_id = await submit_search(session, base_url, text)
+                    status = await wait_task(session, base_url, task_id)
+                    if status["status"] != "completed":
+                        errors += 1
+                        continue
+                except (aiohttp.ClientError, RuntimeError, TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "searches_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        "errors": errors,
+    }
+
+
+async def bench_stream(base_url: str, streams: int, server_pid: int, first_event_timeout: float) -> dict:
+    """同时打开 streams 个 SSE 连接（订阅一个迟迟不完成的任务），统计收到首个事件的连接和内存增量"""
+    idle_rss = tree_rss_mb(server_pid)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+        # 上游挂起期间任务保持 processing，SSE 连接保持打开
+        task_id = await submit_search(session, base_url, f"stream {time.time()}")
+        served = 0
+        opened = []
+
+        async def open_stream():
+            nonlocal served
+            response = await session.get(f"{base_url}/api/status/{task_id}/stream")
+            opened.append(response)
+            await response.content.readline()
+            served += 1
+
+        tasks = [asyncio.ensure_future(open_stream()) for _ in range(streams)]
+        await asyncio.wait(tasks, timeout=first_event_timeout)
+        busy_rss = tree_rss_mb(server_pid)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for response in opened:
+            response.close()
+    return {
+        "served": served,
+        "requested": streams,
+        "rss_idle_mb": idle_rss,
+        "rss_busy_mb": busy_rss,
+        "kb_per_connection": (busy_rss - idle_rss) * 1024 / served if served else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--stream-timeout", type=float, default=5, help="等待 SSE 首个事件的秒数")
+    parser.add_argument("--modes", default="flask,asgi")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    azure = FakeAzureEmbeddings(latency_ms=20)
+    core_api = FakeCoreApi(latency_ms=30)
+    azure_url = azure.start_in_thread()
+    core_api_url = core_api.start_in_thread()
+    env = app_env(tempfile.mkdtemp(prefix="bench_asgi_"), azure_url, core_api_url)
+
+    results = {}
+    for mode in args.modes.split(","):
+        with AppServer(mode, args.workers, env) as server:
+            result = {"idle_rss_mb": tree_rss_mb(server.pid)}
+            result["status"] = asyncio.run(bench_status(server.base_url, args.concurrency, args.duration))
+            result["search"] = asyncio.run(bench_search(server.base_url, args.concurrency, args.duration))
+            # SSE 场景：上游挂起，任务一直处于处理中
+            core_api.latency = 60
+            try:
+                result["stream"] = asyncio.run(
+                    bench_stream(server.base_url, args.streams, server.pid, args.stream_timeout)
+                )
+            finally:
+                core_api.latency = 0.03
+        results[mode] = result
+
+    azure.stop()
+    core_api.stop()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"workers={args.workers} concurrency={args.concurrency} duration={args.duration}s streams={args.streams}")
+    for mode, result in results.items():
+        search, stream = result["search"], result["stream"]
+        per_connection = stream["kb_per_connection"]
+        print(f"{mode:>6}: status {result['status']['rps']:8.0f} req/s  "
+              f"search {search['searches_per_s']:7.1f}/s p50 {search['p50_ms'] or 0:7.1f} ms "
+              f"p95 {search['p95_ms'] or 0:7.1f} ms errors {search['errors']}")
+        print(f"{'':>8}SSE served {stream['served']}/{stream['requested']} within {args.stream_timeout:.0f}s  "
+              f"RSS {stream['rss_idle_mb']:.0f} -> {stream['rss_busy_mb']:.0f} MB  "
+              f"{'-' if per_connection is None else f'{per_connection:.1f}'} KB/connection")
+
+
+if __name__ == "__main__":
+    main()
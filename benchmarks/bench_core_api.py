@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+core API 客户端基准
+在本地 core API 替身上对比：
+- sync: 旧实现，requests.Session 同步调用放到线程池（与 CoreApiClient.request 相同）
+- async: AsyncCoreApiClient，连接池 + 时限 + 抖动重试 + 熔断
+场景：
+- healthy: 正常服务下的吞吐和延迟
+- flaky: 一部分请求返回 503，比较成功率
+- hang: 一部分请求长时间不响应，比较最慢请求的耗时
+- outage: 服务整体故障，比较失败返回的速度（熔断后直接失败）
+
+用法: python benchmarks/bench_core_api.py [--requests 500 --concurrency 32]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import fake_embedding  # noqa: E402
+from benchmarks.fakes.core_api import FakeCoreApi  # noqa: E402
+from core_api import AsyncCoreApiClient, CircuitBreaker  # noqa: E402
+
+PATH = "api/media/match-film-media"
+
+
+def make_sync_call(base_url: str):
+    session = requests.Session()
+
+    def call(body):
+        response = session.post(f"{base_url}/{PATH}", json=body, timeout=10,
+                                headers={"Cookie": "medeo-service-auth-token=token"})
+        response.raise_for_status()
+        return response.json()
+
+    return call
+
+
+async def run(mode: str, base_url: str, bodies, concurrency: int, timeout: float):
+    """返回 (成功数, 每个请求耗时列表, 总耗时)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    succeeded = 0
+    if mode == "sync":
+        call = make_sync_call(base_url)
+        client = None
+    else:
+        client = AsyncCoreApiClient(base_url, "token", timeout=timeout, deadline=timeout * 2,
+                                    breaker=CircuitBreaker(failure_threshold=10, reset_timeout=5))
+
+    async def one(body):
+        nonlocal succeeded
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if client is None:
+                    await asyncio.to_thread(call, body)
+                else:
+                    await client.request("POST", PATH, json_body=body, idempotent=True)
+                succeeded += 1
+            except Exception:
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    elapsed = time.perf_counter() - start
+    if client is not None:
+        await client.close()
+    return succeeded, latencies, elapsed
+
+
+def report(scenario: str, mode: str, result, total: int):
+    succeeded, latencies, elapsed = result
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{scenario:>8} {mode:>5}: {succeeded:4d}/{total} ok  {total / elapsed:7.1f} req/s  "
+          f"p50 {p50:7.1f} ms  p99 {p99:8.1f} ms  max {latencies[-1] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--timeout-rate", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=1.0, help="async 客户端单次尝试超时（秒）")
+    args = parser.parse_args()
+
+    bodies = [
+        {"query_embedding": fake_embedding(f"query {i}", 512), "match_threshold": 0, "match_count": 5}
+        for i in range(args.requests)
+    ]
+    scenarios = {
+        "healthy": dict(),
+        "flaky": dict(error_rate=args.error_rate),
+        "hang": dict(timeout_rate=args.timeout_rate, hang_seconds=5),
+        "outage": dict(),
+    }
+    for scenario, options in scenarios.items():
+        for mode in ("sync", "async"):
+            fake = FakeCoreApi(latency_ms=args.latency_ms, **options)
+            fake.down = scenario == "outage"
+            base_url = fake.start_in_thread()
+            try:
+                result = asyncio.run(run(mode, base_url, bodies, args.concurrency, args.timeout))
+            finally:
+                fake.stop()
+            report(scenario, mode, result, len(bodies))
+        print(f"{'':>8} upstream requests (last run): {fake.requests}")
+
+
+if __name__ == "__main__":
+    main()
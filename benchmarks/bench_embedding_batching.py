@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量请求合并基准
+在本地 Azure 向量接口替身上，对比逐条 aembed_query 与 EmbeddingBatcher 合并请求时，
+不同并发度下的吞吐量
+
+替身服务默认每次请求 50ms、最多 8 个并发（模拟限流排队）
+
+用法: python benchmarks/bench_embedding_batching.py [--concurrency 1 8 32 128]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_openai import AzureOpenAIEmbeddings  # noqa: E402
+
+from benchmarks.fakes.azure_embeddings import FakeAzureEmbeddings  # noqa: E402
+from embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+def make_embeddings(endpoint: str) -> AzureOpenAIEmbeddings:
+    return AzureOpenAIEmbeddings(
+        azure_deployment="text-embedding-3-small",
+        openai_api_key="fake-key",
+        azure_endpoint=endpoint,
+        openai_api_version="2024-02-01",
+        dimensions=512,
+        # 替身服务直接接收文本，跳过 tiktoken 分词
+        check_embedding_ctx_length=False,
+    )
+
+
+async def run(embed, concurrency: int, requests_per_worker: int) -> float:
+    """返回每秒完成的请求数"""
+    async def worker(worker_id: int):
+        for i in range(requests_per_worker):
+            await embed(f"场景描述 {worker_id}-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return concurrency * requests_per_worker / (time.perf_counter() - start)
+
+
+async def main_async(args, endpoint: str):
+    print(f"{'concurrency':>11} {'unbatched_rps':>14} {'batched_rps':>12} {'avg_batch':>10}")
+    for concurrency in args.concurrency:
+        embeddings = make_embeddings(endpoint)
+        unbatched = await run(embeddings.aembed_query, concurrency, args.requests)
+        batcher = EmbeddingBatcher(embeddings.aembed_documents,
+                                   window=args.window_ms / 1000, max_batch_size=args.max_batch_size)
+        batched = await run(batcher.embed, concurrency, args.requests)
+        print(f"{concurrency:>11} {unbatched:>14.1f} {batched:>12.1f} "
+              f"{batcher.stats()['avg_batch_size']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=10, help="每个并发 worker 的请求数")
+    parser.add_argument("--window-ms", type=float, default=10)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    fake = FakeAzureEmbeddings(latency_ms=args.latency_ms, max_concurrency=args.max_concurrency)
+    endpoint = fake.start_in_thread()
+    try:
+        asyncio.run(main_async(args, endpoint))
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量缓存基准
+- 内存：用 tracemalloc 和 RSS 实测内存 LRU 每条目的占用（键、float32 向量字节和 OrderedDict 节点）
+- 命中率：按 Zipf 分布重复查询文本，未命中时写入缓存，报告内存/磁盘命中和总命中率；
+  第二轮用新的内存缓存和同一个磁盘文件模拟 worker 重启
+
+用法: python benchmarks/bench_embedding_cache.py [--entries 10000 --dimensions 512 --queries 50000 --json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_task_store import rss_mb  # noqa: E402
+from embedding_cache import EmbeddingCache, SQLiteEmbeddingStore  # noqa: E402
+
+
+def random_vector(dimensions: int):
+    return [random.random() for _ in range(dimensions)]
+
+
+def measure_memory(entries: int, dimensions: int) -> dict:
+    """填满内存缓存前后的内存差值"""
+    cache = EmbeddingCache("bench", dimensions, maxsize=entries)
+    vector = random_vector(dimensions)
+    rss_before = rss_mb()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(entries):
+        cache.set(f"text {i}", vector)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_mb()
+    return {
+        "entries": len(cache._memory),
+        "vector_bytes": dimensions * 4,
+        "traced_bytes_per_entry": (after - before) / entries,
+        "rss_bytes_per_entry": (rss_after - rss_before) * 1024 * 1024 / entries,
+    }
+
+
+def zipf_texts(vocabulary: int, queries: int, s: float):
+    """按 Zipf 分布抽取查询文本，少数热门文本占大部分查询"""
+    weights = [1 / (rank ** s) for rank in range(1, vocabulary + 1)]
+    return [f"query {i}" for i in random.choices(range(vocabulary), weights=weights, k=queries)]
+
+
+def run_queries(cache: EmbeddingCache, texts, dimensions: int) -> dict:
+    vector = random_vector(dimensions)
+    for text in texts:
+        if cache.get(text) is None:
+            cache.set(text, vector)
+    return cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=10000, help="测量内存时的条目数")
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--cache-size", type=int, default=2000, help="命中率测试的内存缓存条目数")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="不同查询文本数")
+    parser.add_argument("--queries", type=int, default=50000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf 分布指数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    results = {"memory": measure_memory(args.entries, args.dimensions)}
+
+    texts = zipf_texts(args.vocabulary, args.queries, args.zipf)
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_embedding_cache_"), "embedding_cache.sqlite3")
+    for run in ("cold", "restart"):
+        cache = EmbeddingCache("bench", args.dimensions, maxsize=args.cache_size,
+                               disk_store=SQLiteEmbeddingStore(path))
+        results[run] = run_queries(cache, texts, args.dimensions)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    memory = results["memory"]
+    print(f"memory: {memory['entries']} entries x {args.dimensions} dims (vector {memory['vector_bytes']} B), "
+          f"tracemalloc {memory['traced_bytes_per_entry']:.0f} B/entry, RSS {memory['rss_bytes_per_entry']:.0f} B/entry")
+    print(f"hit ratio: cache_size={args.cache_size} vocabulary={args.vocabulary} queries={args.queries} zipf={args.zipf}")
+    for run in ("cold", "restart"):
+        stats = results[run]
+        print(f"{run:>8}: memory hits {stats['memory_hits']}, disk hits {stats['disk_hits']}, "
+              f"misses {stats['misses']}, hit ratio {stats['hit_ratio']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
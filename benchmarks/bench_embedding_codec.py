@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询向量传输格式基准
+对比 match 接口请求体中 query_embedding 的几种格式：
+- json: 浮点数列表（当前格式）
+- f32 / f16: embedding_codec 的 base64 二进制
+输出每种格式的请求体大小、编码（整个请求体 json.dumps）和解码耗时，以及解码后的最大误差
+
+用法: python benchmarks/bench_embedding_codec.py [--dimensions 512 --rounds 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import fake_embedding  # noqa: E402
+from embedding_codec import decode_embedding, encode_embedding  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    # 与服务中一样，向量是 Python float 列表
+    embeddings = [fake_embedding(f"query {i}", args.dimensions) for i in range(64)]
+    reference = np.asarray(embeddings, dtype=np.float32)
+
+    for fmt in ("json", "f32", "f16"):
+        body_bytes = 0
+        start = time.perf_counter()
+        for i in range(args.rounds):
+            body_bytes += len(json.dumps({
+                "query_embedding": encode_embedding(embeddings[i % len(embeddings)], fmt),
+                "match_threshold": 0,
+                "match_count": 5,
+            }))
+        encode_us = (time.perf_counter() - start) / args.rounds * 1e6
+
+        bodies = [json.dumps({"query_embedding": encode_embedding(e, fmt)}) for e in embeddings]
+        start = time.perf_counter()
+        for i in range(args.rounds):
+            decoded = decode_embedding(json.loads(bodies[i % len(bodies)])["query_embedding"])
+        decode_us = (time.perf_counter() - start) / args.rounds * 1e6
+
+        error = max(
+            float(np.abs(decode_embedding(json.loads(body)["query_embedding"]) - reference[i]).max())
+            for i, body in enumerate(bodies)
+        )
+        size = body_bytes / args.rounds
+        print(f"{fmt:>5}: {size:8.0f} B  encode {encode_us:7.1f} us  decode {decode_us:7.1f} us  "
+              f"max error {error:.2e}  ({decoded.shape[0]} dims)")
+
+
+if __name__ == "__main__":
+    main()
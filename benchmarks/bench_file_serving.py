@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地文件下载基准
+在本地 HTTP 服务上对比 Flask send_file（旧实现）和 file_serving.serve_file：
+- 先校验部分内容的正确性：单段/后缀/多段 Range、416、If-Range、304
+- full: 完整下载吞吐
+- seek: 随机位置读取 1 MB（播放器拖动）的请求速率
+- resume: 已下载 90% 后续传的传输字节数
+
+用法: python benchmarks/bench_file_serving.py [--size-mb 256 --requests 200]
+"""
+
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_serving import serve_file  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def start_server(directory: str):
+    import logging
+    from flask import Flask, request, send_file
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    app = Flask(__name__)
+
+    @app.route("/old/<name>")
+    def old(name):
+        return send_file(os.path.join(directory, name), as_attachment=True)
+
+    @app.route("/new/<name>")
+    def new(name):
+        return serve_file(request, os.path.join(directory, name), name)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch(port: int, path: str, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def parse_multipart(response, body: bytes):
+    """解析 multipart/byteranges，返回 [(Content-Range, 内容)]"""
+    boundary = response.getheader("Content-Type").split("boundary=")[1].encode()
+    parts = []
+    for part in body.split(b"--" + boundary)[1:-1]:
+        head, _, content = part.partition(b"\r\n\r\n")
+        content_range = [line for line in head.split(b"\r\n") if line.startswith(b"Content-Range")][0]
+        parts.append((content_range.split(b": ")[1].decode(), content[:-2]))
+    return parts
+
+
+def check_correctness(port: int, name: str, data: bytes):
+    size = len(data)
+    path = f"/new/{name}"
+
+    response, body = fetch(port, path)
+    assert response.status == 200 and body == data
+    etag = response.getheader("ETag")
+    last_modified = response.getheader("Last-Modified")
+    assert etag and not etag.startswith("W/") and response.getheader("Accept-Ranges") == "bytes"
+
+    response, body = fetch(port, path, {"Range": "bytes=100-199"})
+    assert response.status == 206 and body == data[100:200]
+    assert response.getheader("Content-Range") == f"bytes 100-199/{size}"
+
+    response, body = fetch(port, path, {"Range": "bytes=-500"})
+    assert response.status == 206 and body == data[-500:]
+
+    response, body = fetch(port, path, {"Range": f"bytes={size - 10}-"})
+    assert response.status == 206 and body == data[-10:]
+
+    response, body = fetch(port, path, {"Range": "bytes=0-9, 50-59, 5-14, -5"})
+    assert response.status == 206
+    parts = parse_multipart(response, body)
+    assert int(response.getheader("Content-Length")) == len(body)
+    assert parts == [
+        (f"bytes 0-14/{size}", data[0:15]),
+        (f"bytes 50-59/{size}", data[50:60]),
+        (f"bytes {size - 5}-{size - 1}/{size}", data[-5:]),
+    ]
+
+    response, _ = fetch(port, path, {"Range": f"bytes={size}-"})
+    assert response.status == 416 and response.getheader("Content-Range") == f"bytes */{size}"
+
+    response, body = fetch(port, path, {"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status == 206 and body == data[:10]
+    response, body = fetch(port, path, {"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status == 200 and body == data
+
+    response, body = fetch(port, path, {"If-None-Match": etag})
+    assert response.status == 304 and body == b""
+    response, _ = fetch(port, path, {"If-Modified-Since": last_modified})
+    assert response.status == 304
+    print("correctness: ok")
+
+
+def bench_full(port: int, prefix: str, name: str, size: int, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        _, body = fetch(port, f"/{prefix}/{name}")
+        assert len(body) == size
+    return size * rounds / MB / (time.perf_counter() - start)
+
+
+def bench_seek(port: int, prefix: str, name: str, size: int, requests: int) -> float:
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(requests):
+        offset = rng.randrange(0, size - MB)
+        response, body = fetch(port, f"/{prefix}/{name}", {"Range": f"bytes={offset}-{offset + MB - 1}"})
+        assert response.status == 206 and len(body) == MB
+    return requests / (time.perf_counter() - start)
+
+
+def bench_resume(port: int, prefix: str, name: str, size: int):
+    offset = int(size * 0.9)
+    response, _ = fetch(port, f"/{prefix}/{name}")
+    response, body = fetch(port, f"/{prefix}/{name}", {
+        "Range": f"bytes={offset}-", "If-Range": response.getheader("ETag"),
+    })
+    return response.status, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-serve-")
+    size = int(args.size_mb * MB)
+    name = "media.mp4"
+    with open(os.path.join(directory, name), "wb") as f:
+        block = os.urandom(MB)
+        for _ in range(size // MB):
+            f.write(block)
+        f.write(block[: size % MB])
+    small_name = "small.mp4"
+    small = os.urandom(64 * 1024)
+    with open(os.path.join(directory, small_name), "wb") as f:
+        f.write(small)
+
+    server = start_server(directory)
+    try:
+        check_correctness(server.port, small_name, small)
+        for prefix in ("old", "new"):
+            full = bench_full(server.port, prefix, name, size, args.rounds)
+            seek = bench_seek(server.port, prefix, name, size, args.requests)
+            status, resumed = bench_resume(server.port, prefix, name, size)
+            print(f"{prefix:>4}: full {full:8.1f} MB/s  seek {seek:7.1f} req/s  "
+                  f"resume {status} {resumed / MB:.1f}/{size / MB:.0f} MB")
+    finally:
+        server.shutdown()
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体查找微基准
+对比 task_status 线性扫描与 MediaRegistry 按 ID 查找的延迟
+
+用法: python benchmarks/bench_media_registry.py [--media-per-task 5] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_registry import MediaRegistry  # noqa: E402
+
+TASK_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+
+
+def build_tasks(task_count: int, media_per_task: int):
+    """构造已完成任务及其媒体列表"""
+    task_status = {}
+    registry = MediaRegistry()
+    media_ids = []
+    for _ in range(task_count):
+        task_id = str(uuid.uuid4())
+        media_list = []
+        for _ in range(media_per_task):
+            media_id = str(uuid.uuid4())
+            media_list.append({"id": media_id, "key": f"film/{media_id}.mp4", "similarity": 0.5})
+            media_ids.append(media_id)
+        task_status[task_id] = {"status": "completed", "data": {"media_list": media_list}}
+        registry.register_task(task_id, media_list)
+    return task_status, registry, media_ids
+
+
+def linear_lookup(task_status: dict, media_id: str):
+    """旧实现：遍历所有任务和媒体"""
+    for task_data in task_status.values():
+        if task_data.get('status') == 'completed' and task_data.get('data', {}).get('media_list'):
+            for media in task_data['data']['media_list']:
+                if media.get('id') == media_id:
+                    return media
+    return None
+
+
+def measure(fn, targets) -> float:
+    """返回单次查找平均耗时（微秒）"""
+    start = time.perf_counter()
+    for target in targets:
+        fn(target)
+    return (time.perf_counter() - start) / len(targets) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--media-per-task", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--linear-max-tasks", type=int, default=10_000,
+                        help="线性扫描只测到该任务数，避免耗时过长")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8} {'linear_us':>12} {'registry_us':>12}")
+    for task_count in TASK_COUNTS:
+        task_status, registry, media_ids = build_tasks(task_count, args.media_per_task)
+        targets = [random.choice(media_ids) for _ in range(args.lookups)]
+        registry_us = measure(registry.get, targets)
+        if task_count <= args.linear_max_tasks:
+            linear_targets = targets[: max(1, args.lookups // max(1, task_count // 100))]
+            linear_us = measure(lambda m: linear_lookup(task_status, m), linear_targets)
+            linear_text = f"{linear_us:12.2f}"
+        else:
+            linear_text = f"{'-':>12}"
+        print(f"{task_count:>8} {linear_text} {registry_us:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+限流与准入控制基准
+多 worker 服务（限流状态使用共享 SQLite 后端），一个客户端以高并发持续提交 /api/search（每次不同文本），
+同时若干普通客户端按固定速率搜索并等待结果。分别在关闭和开启限流/上游预算时运行，报告：
+- 洪泛客户端被接受和被 429 拒绝的请求数、429 响应延迟
+- 普通客户端的搜索完成延迟 p50/p95 和失败数
+- 上游替身（向量接口、core API）的请求数和峰值并发
+
+用法: python benchmarks/bench_rate_limit.py [--mode flask --workers 4 --duration 10 --flood-concurrency 32 --json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import FakeAzureEmbeddings  # noqa: E402
+from benchmarks.fakes.core_api import FakeCoreApi  # noqa: E402
+from benchmarks.harness import AppServer, app_env, summarize  # noqa: E402
+
+UNLIMITED = {
+    "RATE_LIMIT_RATE": "0", "SEARCH_MAX_PER_CLIENT": "0",
+    "UPSTREAM_EMBEDDINGS_CONCURRENCY": "0", "UPSTREAM_MATCH_CONCURRENCY": "0", "UPSTREAM_S3_CONCURRENCY": "0",
+}
+
+
+async def wait_task(session: aiohttp.ClientSession, base_url: str, task_id: str, timeout: float = 60) -> dict:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        async with session.get(f"{base_url}/api/status/{task_id}") as response:
+            status = await response.json()
+        if status["status"] in ("completed", "error"):
+            return status
+        await asyncio.sleep(0.05)
+    raise TimeoutError(task_id)
+
+
+async def warm_up(base_url: str, count: int):
+    """预热：让每个 worker 创建好各上游客户端（每次用不同的 API Key，不受限流影响）"""
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        semaphore = asyncio.Semaphore(8)
+
+        async def search(i: int):
+            async with semaphore:
+                async with session.post(f"{base_url}/api/search", json={"text": f"warmup {i} {time.time()}"},
+                                        headers={"X-API-Key": f"warmup-{i}"}) as response:
+                    task_id = (await response.json())["task_id"]
+                await wait_task(session, base_url, task_id)
+
+        await asyncio.gather(*(search(i) for i in range(count)))
+
+
+async def run_load(base_url: str, duration: float, flood_concurrency: int, clients: int,
+                   client_rate: float) -> dict:
+    end = time.perf_counter() + duration
+    flood = {"accepted": 0, "rejected": 0, "errors": 0, "reject_latencies": []}
+    normal = {"latencies": [], "errors": 0, "rejected": 0}
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def flooder(worker_id: int):
+            n = 0
+            while time.perf_counter() < end:
+                n += 1
+                start = time.perf_counter()
+                try:
+                    async with session.post(f"{base_url}/api/search", json={"text": f"flood {worker_id} {n}"},
+                                            headers={"X-API-Key": "flooder"}) as response:
+                        await response.read()
+                        status = response.status
+                except aiohttp.ClientError:
+                    flood["errors"] += 1
+                    continue
+                if status == 200:
+                    flood["accepted"] += 1
+                elif status == 429:
+                    flood["rejected"] += 1
+                    flood["reject_latencies"].append(time.perf_counter() - start)
+                else:
+                    flood["errors"] += 1
+
+        async def search_once(client_id: int, n: int):
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/api/search", json={"text": f"normal {client_id} {n}"},
+                                        headers={"X-API-Key": f"client-{client_id}"}) as response:
+                    body = await response.json()
+                if response.status == 429:
+                    normal["rejected"] += 1
+                    return
+                status = await wait_task(session, base_url, body["task_id"])
+                if status["status"] != "completed":
+                    normal["errors"] += 1
+                    return
+            except (aiohttp.ClientError, KeyError, TimeoutError):
+                normal["errors"] += 1
+                return
+            normal["latencies"].append(time.perf_counter() - start)
+
+        async def client(client_id: int):
+            # 按固定速率发起搜索，不等待上一次完成
+            tasks = []
+            n = 0
+            while time.perf_counter() < end:
+                tasks.append(asyncio.ensure_future(search_once(client_id, n)))
+                n += 1
+                await asyncio.sleep(1 / client_rate)
+            await asyncio.gather(*tasks)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(flooder(i) for i in range(flood_concurrency)),
+                             *(client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    rejects = summarize(flood.pop("reject_latencies"), elapsed)
+    return {
+        "flood": dict(flood, reject_p50_ms=rejects["p50_ms"], reject_p95_ms=rejects["p95_ms"]),
+        "normal": dict(summarize(normal["latencies"], elapsed, normal["errors"]), rejected=normal["rejected"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", default="flask", choices=("flask", "asgi"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--flood-concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=4, help="普通客户端数")
+    parser.add_argument("--client-rate", type=float, default=1, help="每个普通客户端每秒搜索数")
+    parser.add_argument("--rate", default="5", help="开启限流时每个客户端每秒令牌数")
+    parser.add_argument("--burst", default="10")
+    parser.add_argument("--embeddings-concurrency", default="4")
+    parser.add_argument("--match-concurrency", default="8")
+    parser.add_argument("--warmup", type=int, default=32, help="预热搜索数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    azure = FakeAzureEmbeddings(latency_ms=20)
+    core_api = FakeCoreApi(latency_ms=30)
+    azure_url = azure.start_in_thread()
+    core_api_url = core_api.start_in_thread()
+
+    configs = {
+        "unlimited": UNLIMITED,
+        "limited": {
+            "RATE_LIMIT_RATE": args.rate, "RATE_LIMIT_BURST": args.burst, "SEARCH_MAX_PER_CLIENT": "100",
+            "UPSTREAM_EMBEDDINGS_CONCURRENCY": args.embeddings_concurrency,
+            "UPSTREAM_MATCH_CONCURRENCY": args.match_concurrency,
+        },
+    }
+    results = {}
+    for name, overrides in configs.items():
+        workdir = tempfile.mkdtemp(prefix="bench_rate_limit_")
+        env = app_env(workdir, azure_url, core_api_url, RATE_LIMIT_BACKEND="sqlite",
+                      RATE_LIMIT_URL=os.path.join(workdir, "rate_limit.sqlite3"), **overrides)
+        with AppServer(args.mode, args.workers, env) as server:
+            asyncio.run(warm_up(server.base_url, args.warmup))
+            azure.requests = azure.peak_in_flight = 0
+            core_api.requests = core_api.peak_in_flight = 0
+            result = asyncio.run(run_load(server.base_url, args.duration, args.flood_concurrency,
+                                          args.clients, args.client_rate))
+            # 等待已接受的洪泛任务执行完，再读取上游统计
+            deadline = time.time() + 120
+            while (azure.in_flight or core_api.in_flight) and time.time() < deadline:
+                time.sleep(0.5)
+        result["upstream"] = {
+            "embeddings_requests": azure.requests, "embeddings_peak": azure.peak_in_flight,
+            "match_requests": core_api.requests, "match_peak": core_api.peak_in_flight,
+        }
+        results[name] = result
+
+    azure.stop()
+    core_api.stop()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    def ms(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"{args.mode} workers={args.workers} duration={args.duration}s flood_concurrency={args.flood_concurrency} "
+          f"clients={args.clients}x{args.client_rate}/s")
+    for name, result in results.items():
+        flood, normal, upstream = result["flood"], result["normal"], result["upstream"]
+        print(f"{name:>10}: flood accepted {flood['accepted']} rejected {flood['rejected']} "
+              f"(429 p50 {ms(flood['reject_p50_ms'])} ms p95 {ms(flood['reject_p95_ms'])} ms)")
+        print(f"{'':>12}normal {normal['requests']} ok, {normal['errors']} errors, {normal['rejected']} rejected, "
+              f"p50 {ms(normal['p50_ms'])} ms p95 {ms(normal['p95_ms'])} ms")
+        print(f"{'':>12}upstream embeddings {upstream['embeddings_requests']} req peak {upstream['embeddings_peak']}, "
+              f"match {upstream['match_requests']} req peak {upstream['match_peak']}")
+
+
+if __name__ == "__main__":
+    main()
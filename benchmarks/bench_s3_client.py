@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+S3 客户端复用基准
+对比每次请求新建 boto3 客户端与使用共享客户端池时，单次“生成预签名URL + HEAD 对象”请求的延迟
+
+默认启动本地 moto S3 服务（pip install "moto[server]"），也可用 --endpoint-url 指向其他 S3 兼容服务
+
+用法: python benchmarks/bench_s3_client.py [--requests 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+
+import s3_clients  # noqa: E402
+
+BUCKET = "bench-bucket"
+KEY = "film/sample.mp4"
+
+
+def new_client(endpoint_url: str):
+    """旧实现：每次请求创建客户端"""
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+        aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+        region_name=os.environ['AWS_REGION'],
+        endpoint_url=endpoint_url,
+    )
+
+
+def one_request(client):
+    client.generate_presigned_url('get_object', Params={'Bucket': BUCKET, 'Key': KEY}, ExpiresIn=3600)
+    client.head_object(Bucket=BUCKET, Key=KEY)
+
+
+def run(label: str, get_client, requests: int):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        one_request(get_client())
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:>10}: mean {statistics.mean(latencies):7.2f} ms  "
+          f"p50 {statistics.median(latencies):7.2f} ms  p99 {p99:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoint-url")
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ['AWS_REGION'] = 'us-east-1'
+
+    server = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+    os.environ['S3_ENDPOINT_URL'] = endpoint_url
+
+    try:
+        setup = new_client(endpoint_url)
+        setup.create_bucket(Bucket=BUCKET)
+        setup.put_object(Bucket=BUCKET, Key=KEY, Body=b"\0" * 1024)
+
+        run("per-request", lambda: new_client(endpoint_url), args.requests)
+        run("shared", s3_clients.get_s3_client, args.requests)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+S3 下载基准
+在本地 moto S3 服务上准备一批小文件和大文件，对比：
+- sequential: 旧实现，逐个调用 s3_client.download_file
+- concurrent: S3Downloader 使用的 ResumableDownloader，多文件并发 + 大文件分片并发
+并验证中断后续传（只补下缺失的分片）
+
+用法: python benchmarks/bench_s3_download.py [--small 20 --small-mb 2 --large 2 --large-mb 1024]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from s3_transfer import MB, ResumableDownloader, TransferSettings  # noqa: E402
+
+BUCKET = "bench-bucket"
+
+
+def start_s3(endpoint_url):
+    import boto3
+    server = None
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+    client = boto3.client("s3", endpoint_url=endpoint_url, region_name="us-east-1",
+                          aws_access_key_id="testing", aws_secret_access_key="testing")
+    return server, client
+
+
+def upload(client, key: str, size: int):
+    """分块生成并上传测试对象，避免一次占用过多内存"""
+    from boto3.s3.transfer import TransferConfig
+    path = os.path.join(tempfile.gettempdir(), "bench-upload.bin")
+    block = os.urandom(MB)
+    with open(path, "wb") as f:
+        for _ in range(size // MB):
+            f.write(block)
+        f.write(block[: size % MB])
+    client.upload_file(path, BUCKET, key, Config=TransferConfig(multipart_chunksize=64 * MB))
+    os.remove(path)
+
+
+def run_sequential(client, keys, target_dir):
+    for key in keys:
+        client.download_file(BUCKET, key, os.path.join(target_dir, os.path.basename(key)))
+
+
+async def run_concurrent(downloader, keys, target_dir, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(key):
+        async with semaphore:
+            await asyncio.to_thread(downloader.download, BUCKET, key, os.path.join(target_dir, os.path.basename(key)))
+
+    await asyncio.gather(*(one(key) for key in keys))
+
+
+def check_resume(downloader, key, target_dir):
+    """下载两个分片后模拟中断，再次下载时只补下剩余分片，返回 (文件大小, 续传前已完成字节)"""
+    path = os.path.join(target_dir, "resume-" + os.path.basename(key))
+    fetched = {"bytes": 0}
+    original_fetch = downloader.s3_client.get_object
+    calls = {"count": 0}
+
+    def flaky_get_object(**kwargs):
+        calls["count"] += 1
+        if calls["count"] > 2:
+            raise ConnectionError("模拟中断")
+        return original_fetch(**kwargs)
+
+    downloader.s3_client.get_object = flaky_get_object
+    try:
+        downloader.download(BUCKET, key, path)
+    except ConnectionError:
+        pass
+    finally:
+        downloader.s3_client.get_object = original_fetch
+    resumed = {"first": None}
+
+    def on_bytes(count: int):
+        # 第一次回调是续传前已完成的字节数
+        if resumed["first"] is None:
+            resumed["first"] = count
+        fetched["bytes"] += count
+
+    downloader.download(BUCKET, key, path, on_bytes=on_bytes)
+    return os.path.getsize(path), resumed["first"] or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--small", type=int, default=20)
+    parser.add_argument("--small-mb", type=float, default=2)
+    parser.add_argument("--large", type=int, default=2)
+    parser.add_argument("--large-mb", type=float, default=1024)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunk-mb", type=float, default=16)
+    parser.add_argument("--per-file-concurrency", type=int, default=8)
+    parser.add_argument("--endpoint-url")
+    args = parser.parse_args()
+
+    server, client = start_s3(args.endpoint_url)
+    target_root = tempfile.mkdtemp(prefix="bench-s3-")
+    try:
+        client.create_bucket(Bucket=BUCKET)
+        keys = []
+        for i in range(args.small):
+            keys.append(f"film/small-{i}.mp4")
+            upload(client, keys[-1], int(args.small_mb * MB))
+        for i in range(args.large):
+            keys.append(f"film/large-{i}.mp4")
+            upload(client, keys[-1], int(args.large_mb * MB))
+        total_mb = args.small * args.small_mb + args.large * args.large_mb
+
+        settings = TransferSettings(chunk_size=int(args.chunk_mb * MB),
+                                    per_file_concurrency=args.per_file_concurrency)
+        downloader = ResumableDownloader(client, settings)
+
+        for mode in ("sequential", "concurrent"):
+            target_dir = os.path.join(target_root, mode)
+            os.makedirs(target_dir)
+            start = time.perf_counter()
+            if mode == "sequential":
+                run_sequential(client, keys, target_dir)
+            else:
+                asyncio.run(run_concurrent(downloader, keys, target_dir, args.concurrency))
+            elapsed = time.perf_counter() - start
+            print(f"{mode:>10}: {elapsed:7.2f} s  {total_mb / elapsed:8.1f} MB/s")
+            shutil.rmtree(target_dir)
+
+        if args.large:
+            size, resumed = check_resume(downloader, keys[-1], target_root)
+            print(f"    resume: {size / MB:.0f} MB total, {resumed / MB:.0f} MB reused after interruption")
+    finally:
+        shutil.rmtree(target_root, ignore_errors=True)
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动基准
+在全新的子进程中导入入口模块，记录：
+- import: 导入耗时（秒）和导入后的 RSS 峰值（MB）
+- first /: 导入后首个 / 请求的耗时
+- 自身耗时最多的模块（来自 python -X importtime）
+入口：
+- lambda: lambda_handler（Mangum 包装，未安装 mangum 时跳过）
+- gunicorn: app:app（gunicorn worker 导入的模块）
+
+用法: python benchmarks/bench_startup.py [--runs 5 --top 10 --json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "lambda": "lambda_handler",
+    "gunicorn": "app",
+}
+
+# 子进程：导入入口模块，再用测试客户端请求一次 /，输出 JSON
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+module = __import__({module!r})
+imported = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+from app import app
+status = app.test_client().get("/").status_code
+first_request = time.perf_counter() - start
+heavy = [name for name in ("numpy", "boto3", "aiohttp", "langchain_openai", "openai") if name in sys.modules]
+print(json.dumps({{"import": imported, "first_request": first_request, "status": status,
+                  "rss_mb": rss / 1024, "heavy_modules": heavy}}))
+"""
+
+
+def run_child(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", _CHILD.format(module=module)]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+
+
+def top_imports(stderr: str, top: int):
+    """解析 -X importtime 输出，返回自身耗时最多的模块 [(模块, 毫秒)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = {}
+    for name, module in ENTRY_POINTS.items():
+        samples = []
+        for _ in range(args.runs):
+            child = run_child(module)
+            if child.returncode != 0:
+                break
+            samples.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        if not samples:
+            reason = (child.stderr.strip().splitlines() or ["unknown error"])[-1]
+            results[name] = {"skipped": reason}
+            continue
+        profile = run_child(module, importtime=True)
+        results[name] = {
+            "module": module,
+            "import_s": statistics.median(s["import"] for s in samples),
+            "first_request_s": statistics.median(s["first_request"] for s in samples),
+            "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+            "heavy_modules": samples[-1]["heavy_modules"],
+            "top_imports_ms": top_imports(profile.stderr, args.top),
+        }
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:>9}: skipped ({result['skipped']})")
+            continue
+        print(f"{name:>9}: import {result['import_s'] * 1000:7.1f} ms  first / {result['first_request_s'] * 1000:6.1f} ms  "
+              f"RSS {result['rss_mb']:6.1f} MB  heavy modules loaded: {', '.join(result['heavy_modules']) or '-'}")
+        for module, ms in result["top_imports_ms"]:
+            print(f"{'':>11}{ms:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务执行方式负载测试
+模拟 N 个同时到达的搜索请求，每个请求向本地向量接口替身发一次 HTTP 请求：
+- thread: 旧实现，每个请求一个线程 + asyncio.run + 每个事件循环新建 HTTP 会话
+- executor: TaskExecutor 常驻事件循环 + 共享 HTTP 会话 + 有界并发
+报告峰值线程数和请求完成延迟的 p50/p99
+
+用法: python benchmarks/bench_task_executor.py [--requests 500] [--max-concurrency 64]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import FakeAzureEmbeddings  # noqa: E402
+from task_executor import TaskExecutor  # noqa: E402
+
+PAYLOAD = {"input": ["一个人在跑步的场景"], "dimensions": 512}
+
+
+class ThreadSampler:
+    """后台采样进程内线程数"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.002)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return statistics.median(latencies) * 1000, p99 * 1000
+
+
+def run_threads(url: str, requests: int):
+    """旧实现：每个请求一个线程和一个事件循环"""
+    latencies = []
+    lock = threading.Lock()
+
+    async def search(session_url: str):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(session_url, json=PAYLOAD) as response:
+                await response.read()
+
+    def worker(submitted: float):
+        asyncio.run(search(url))
+        with lock:
+            latencies.append(time.perf_counter() - submitted)
+
+    threads = []
+    for _ in range(requests):
+        thread = threading.Thread(target=worker, args=(time.perf_counter(),))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def run_executor(url: str, requests: int, max_concurrency: int):
+    """新实现：共享事件循环和 HTTP 会话"""
+    executor = TaskExecutor(max_concurrency=max_concurrency, max_queue=requests)
+    session = executor.run(_make_session())
+    latencies = []
+
+    async def search(submitted: float):
+        async with session.post(url, json=PAYLOAD) as response:
+            await response.read()
+        latencies.append(time.perf_counter() - submitted)
+
+    futures = [executor.submit(search, time.perf_counter()) for _ in range(requests)]
+    for future in futures:
+        future.result()
+    executor.run(session.close())
+    executor.shutdown()
+    return latencies
+
+
+async def _make_session():
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--server-concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    fake = FakeAzureEmbeddings(latency_ms=args.latency_ms, max_concurrency=args.server_concurrency)
+    url = fake.start_in_thread() + "/openai/deployments/text-embedding-3-small/embeddings"
+    try:
+        print(f"{'mode':>9} {'peak_threads':>13} {'p50_ms':>8} {'p99_ms':>8} {'wall_s':>7}")
+        for mode in ("thread", "executor"):
+            start = time.perf_counter()
+            with ThreadSampler() as sampler:
+                if mode == "thread":
+                    latencies = run_threads(url, args.requests)
+                else:
+                    latencies = run_executor(url, args.requests, args.max_concurrency)
+            wall = time.perf_counter() - start
+            p50, p99 = percentiles(latencies)
+            print(f"{mode:>9} {sampler.peak:>13} {p50:>8.1f} {p99:>8.1f} {wall:>7.2f}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
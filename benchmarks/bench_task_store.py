@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务存储负载测试
+连续写入大量任务（每个任务经历 pending -> processing -> completed），
+定期输出常驻内存和存储中的任务数，验证内存不随任务总数增长
+
+用法:
+  python benchmarks/bench_task_store.py --backend memory --tasks 1000000
+  python benchmarks/bench_task_store.py --backend sqlite --tasks 200000
+  python benchmarks/bench_task_store.py --backend redis   # 需要 fakeredis 或 --redis-url
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import MemoryTaskStore, RedisTaskStore, SQLiteTaskStore  # noqa: E402
+
+
+def rss_mb() -> float:
+    """当前常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        import resource
+        # 非 Linux 平台退化为峰值内存
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_store(args):
+    if args.backend == "memory":
+        return MemoryTaskStore(max_size=args.max_size, ttl=args.ttl)
+    if args.backend == "sqlite":
+        path = args.sqlite_path or os.path.join(tempfile.mkdtemp(), "task_store.sqlite3")
+        return SQLiteTaskStore(path, max_size=args.max_size, ttl=args.ttl)
+    if args.redis_url:
+        return RedisTaskStore.from_url(args.redis_url, max_size=args.max_size, ttl=args.ttl)
+    import fakeredis
+    return RedisTaskStore(fakeredis.FakeRedis(), max_size=args.max_size, ttl=args.ttl)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["memory", "sqlite", "redis"], default="memory")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--max-size", type=int, default=10_000)
+    parser.add_argument("--ttl", type=float, default=3600)
+    parser.add_argument("--media-per-task", type=int, default=5)
+    parser.add_argument("--report-every", type=int, default=100_000)
+    parser.add_argument("--sqlite-path")
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    store = create_store(args)
+    start = time.perf_counter()
+    print(f"{'tasks':>9} {'stored':>8} {'rss_mb':>8} {'tasks/s':>10}")
+    for i in range(1, args.tasks + 1):
+        task_id = str(uuid.uuid4())
+        now = time.time()
+        store.set(task_id, {"status": "pending", "progress": 0, "message": "任务已创建，等待处理...",
+                            "data": None, "created_at": now})
+        store.set(task_id, {"status": "processing", "progress": 60, "message": "找到匹配的媒体...",
+                            "data": None, "created_at": now})
+        media_list = [
+            {"id": f"{task_id}-{j}", "key": f"film/{task_id}-{j}.mp4", "similarity": 0.5}
+            for j in range(args.media_per_task)
+        ]
+        store.register_media(task_id, media_list)
+        store.set(task_id, {"status": "completed", "progress": 100, "message": "处理完成",
+                            "data": {"media_list": media_list}, "created_at": now})
+        if i % args.report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{i:>9} {len(store):>8} {rss_mb():>8.1f} {i / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地向量索引基准
+对不同规模的合成目录，报告精确检索和 IVF 近似检索的 QPS，以及 IVF 相对精确检索的 recall@k
+
+合成向量按若干主题簇生成，查询取自目录向量加噪声，更接近真实文本向量的分布
+
+用法: python benchmarks/bench_vector_index.py [--sizes 10000 100000 1000000] [--k 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import LocalVectorIndex  # noqa: E402
+
+DIMENSIONS = 512
+
+
+def synthetic_catalog(n: int, rng: np.random.Generator, topics: int = 256) -> np.ndarray:
+    """按主题簇生成目录向量（分块生成以控制峰值内存）"""
+    centers = rng.standard_normal((topics, DIMENSIONS)).astype(np.float32)
+    matrix = np.empty((n, DIMENSIONS), dtype=np.float32)
+    for start in range(0, n, 65536):
+        rows = min(65536, n - start)
+        labels = rng.integers(0, topics, rows)
+        matrix[start:start + rows] = centers[labels] + 0.8 * rng.standard_normal((rows, DIMENSIONS), dtype=np.float32)
+    return matrix
+
+
+def qps(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'mode':>10} {'qps':>9} {'recall@k':>9} {'build_s':>8}")
+    for size in args.sizes:
+        catalog = synthetic_catalog(size, rng)
+        picks = rng.integers(0, size, args.queries)
+        queries = catalog[picks] + 0.5 * rng.standard_normal((args.queries, DIMENSIONS), dtype=np.float32)
+        index = LocalVectorIndex([str(i) for i in range(size)], [f"film/{i}.mp4" for i in range(size)], catalog)
+        del catalog
+
+        exact = [set(np.asarray(index.ids)[index.search_indices(q, args.k, mode="exact")[0]]) for q in queries]
+        exact_qps = qps(lambda q: index.search_indices(q, args.k, mode="exact"), queries)
+        print(f"{size:>9} {'exact':>10} {exact_qps:>9.1f} {1.0:>9.3f} {0:>8.1f}")
+
+        start = time.perf_counter()
+        index.build_ivf()
+        build_seconds = time.perf_counter() - start
+        ids = np.asarray(index.ids)
+        for nprobe in args.nprobe:
+            found = [set(ids[index.search_indices(q, args.k, mode="ivf", nprobe=nprobe)[0]]) for q in queries]
+            recall = np.mean([len(f & e) / args.k for f, e in zip(found, exact)])
+            ivf_qps = qps(lambda q: index.search_indices(q, args.k, mode="ivf", nprobe=nprobe), queries)
+            print(f"{size:>9} {'ivf/' + str(nprobe):>10} {ivf_qps:>9.1f} {recall:>9.3f} {build_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
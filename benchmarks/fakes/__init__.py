@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""基准测试使用的本地替身服务"""
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 Azure OpenAI 向量接口替身
+实现 POST /openai/deployments/<deployment>/embeddings，按输入文本生成确定性的单位向量，
+可配置单次请求延迟、每条文本的额外延迟、并发上限和错误率
+
+用法: python -m benchmarks.fakes.azure_embeddings --port 8901 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import threading
+
+import numpy as np
+from aiohttp import web
+
+
+def fake_embedding(text, dimensions: int) -> list:
+    """根据文本哈希生成确定性的单位向量"""
+    seed = int.from_bytes(hashlib.sha256(str(text).encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+class FakeAzureEmbeddings:
+    """向量接口替身"""
+
+    def __init__(self, latency_ms: float = 50, per_item_ms: float = 0.2,
+                 max_concurrency: int = 8, error_rate: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.inputs = 0
+        # 同时处理中的请求数及其峰值
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._semaphore = None
+        self._runner = None
+        self._loop = None
+        self.base_url = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body.get("input")
+        if isinstance(inputs, (str, int)) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = int(body.get("dimensions") or 1536)
+        self.requests += 1
+        self.inputs += len(inputs)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response({"error": {"code": "429", "message": "Rate limit"}}, status=429)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # 并发上限模拟服务端排队
+            async with self._semaphore:
+                await asyncio.sleep(self.latency + self.per_item * len(inputs))
+        finally:
+            self.in_flight -= 1
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+            for i, text in enumerate(inputs)
+        ]
+        return web.json_response({
+            "object": "list",
+            "data": data,
+            "model": request.match_info["deployment"],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        })
+
+    async def _on_startup(self, app: web.Application):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.on_startup.append(self._on_startup)
+        app.router.add_post("/openai/deployments/{deployment}/embeddings", self.handle)
+        return app
+
+    async def start_async(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在后台线程中启动，返回服务地址"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start_async(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--per-item-ms", type=float, default=0.2)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeAzureEmbeddings(args.latency_ms, args.per_item_ms, args.max_concurrency, args.error_rate)
+    web.run_app(fake.make_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
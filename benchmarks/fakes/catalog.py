@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+合成媒体库
+core API 替身和 S3 替身共用：core API 按向量返回媒体（id / key），S3 按 key 返回确定性的对象内容，
+同一个 seed 生成的媒体库在两个替身之间一致
+"""
+
+import hashlib
+from typing import Iterator, Optional
+
+import numpy as np
+
+BLOCK_SIZE = 64 * 1024
+
+
+class MediaCatalog:
+    """size 条媒体，每条有单位向量、S3 key 和对象大小（object_size 上下浮动 size_jitter 比例）"""
+
+    def __init__(self, size: int = 1000, dimensions: int = 512, seed: int = 0,
+                 object_size: int = 1024 * 1024, size_jitter: float = 0.5):
+        rng = np.random.default_rng(seed)
+        vectors = rng.standard_normal((size, dimensions)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.media = [
+            {"id": f"media-{i}", "key": f"film/media-{i}.mp4", "description": f"fake media {i}"}
+            for i in range(size)
+        ]
+        jitter = rng.uniform(-size_jitter, size_jitter, size) if size_jitter else np.zeros(size)
+        self.sizes = [max(1, int(object_size * (1 + j))) for j in jitter]
+        self._index = {media["key"]: i for i, media in enumerate(self.media)}
+        # 对象内容为同一个随机块按 key 错开后重复，不占用与对象大小成比例的内存
+        self._block = rng.bytes(BLOCK_SIZE)
+
+    def object_size(self, key: str) -> Optional[int]:
+        index = self._index.get(key)
+        return None if index is None else self.sizes[index]
+
+    def etag(self, key: str) -> str:
+        return '"' + hashlib.md5(f"{key}:{self.object_size(key)}".encode()).hexdigest() + '"'
+
+    def iter_bytes(self, key: str, start: int, stop: int, chunk_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+        """对象 [start, stop) 的内容"""
+        shift = self._index[key] * 4099 % BLOCK_SIZE
+        position = start
+        while position < stop:
+            offset = (position + shift) % BLOCK_SIZE
+            count = min(chunk_size, BLOCK_SIZE - offset, stop - position)
+            yield self._block[offset:offset + count]
+            position += count
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 core API 替身
+实现 POST /api/media/match-film-media，在随机生成的媒体库中按余弦相似度返回匹配结果，
+可配置延迟、错误率（503）、超时率（长时间不响应）和整体故障开关；
+query_embedding 接受 JSON 数组和 embedding_codec 紧凑格式（compact=False 时对紧凑格式返回 415）
+
+用法: python -m benchmarks.fakes.core_api --port 8902 --latency-ms 30 --error-rate 0.1
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+from typing import Optional
+
+import numpy as np
+from aiohttp import web
+
+from benchmarks.fakes.catalog import MediaCatalog
+from embedding_codec import decode_embedding
+
+
+class FakeCoreApi:
+    """core API 替身"""
+
+    def __init__(self, latency_ms: float = 30, error_rate: float = 0.0, timeout_rate: float = 0.0,
+                 hang_seconds: float = 30, catalog_size: int = 1000, dimensions: int = 512, seed: int = 0,
+                 compact: bool = True, catalog: Optional[MediaCatalog] = None):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.compact = compact
+        # 为 True 时所有请求返回 503，模拟整体故障
+        self.down = False
+        self.requests = 0
+        self.errors = 0
+        # 同时处理中的请求数及其峰值
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # 与 S3 替身共用同一个媒体库时，返回的 key 都能下载
+        self.catalog = catalog or MediaCatalog(catalog_size, dimensions, seed)
+        self.vectors = self.catalog.vectors
+        self.media = self.catalog.media
+        self._runner = None
+        self._loop = None
+        self.base_url = None
+
+    def match(self, embedding, match_threshold: float, match_count: int) -> list:
+        query = decode_embedding(embedding)
+        if query.shape[0] != self.vectors.shape[1]:
+            query = np.resize(query, self.vectors.shape[1])
+        scores = self.vectors @ query
+        order = np.argsort(-scores)[:match_count]
+        return [
+            dict(self.media[i], similarity=float(scores[i]))
+            for i in order if scores[i] > match_threshold
+        ]
+
+    async def handle_match(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        if not self.compact and not isinstance(body.get("query_embedding"), list):
+            return web.json_response({"error": "query_embedding must be an array"}, status=415)
+        if self.down or (self.error_rate and random.random() < self.error_rate):
+            self.errors += 1
+            return web.json_response({"error": "Service Unavailable"}, status=503)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.timeout_rate and random.random() < self.timeout_rate:
+                await asyncio.sleep(self.hang_seconds)
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return web.json_response(self.match(
+            body["query_embedding"], float(body.get("match_threshold", 0)), int(body.get("match_count", 5))
+        ))
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/media/match-film-media", self.handle_match)
+        return app
+
+    async def start_async(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在后台线程中启动，返回服务地址"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start_async(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    args = parser.parse_args()
+    fake = FakeCoreApi(args.latency_ms, args.error_rate, args.timeout_rate, catalog_size=args.catalog_size)
+    web.run_app(fake.make_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
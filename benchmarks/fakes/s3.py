@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 S3 替身
+实现 boto3 下载用到的 HeadObject / GetObject（路径风格 /<bucket>/<key>，支持 Range 和 If-Match），
+对象内容来自合成媒体库，可配置首字节延迟、错误率（503 SlowDown）和带宽上限。
+预签名URL的查询参数不做校验。应用通过 S3_ENDPOINT_URL 指向替身。
+
+用法: python -m benchmarks.fakes.s3 --port 8903 --latency-ms 20 --bandwidth-mbps 200
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+from typing import Optional, Tuple
+
+from aiohttp import web
+
+from benchmarks.fakes.catalog import MediaCatalog
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def _error(status: int, code: str, message: str, head: bool = False) -> web.Response:
+    body = None if head else (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{code}</Code><Message>{message}</Message></Error>'
+    )
+    return web.Response(status=status, text=body, content_type="application/xml")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """单段 Range，返回 [起始, 结束)；无法满足时返回 (0, 0)"""
+    if not header or not header.startswith("bytes="):
+        return None
+    first, _, last = header[len("bytes="):].partition("-")
+    if not first:
+        length = int(last)
+        return (max(0, size - length), size) if length else (0, 0)
+    start = int(first)
+    stop = min(size, int(last) + 1) if last else size
+    if start >= size or stop <= start:
+        return 0, 0
+    return start, stop
+
+
+class FakeS3:
+    """S3 替身"""
+
+    def __init__(self, catalog: Optional[MediaCatalog] = None, bucket: str = "bench", latency_ms: float = 20,
+                 error_rate: float = 0.0, bandwidth_mbps: float = 0):
+        self.catalog = catalog or MediaCatalog()
+        self.bucket = bucket
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        # 每个连接的带宽上限（MB/s），0 表示不限
+        self.bandwidth = bandwidth_mbps * 1024 * 1024
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._runner = None
+        self._loop = None
+        self.base_url = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        head = request.method == "HEAD"
+        if request.match_info["bucket"] != self.bucket:
+            return _error(404, "NoSuchBucket", "The specified bucket does not exist", head)
+        key = request.match_info["key"]
+        size = self.catalog.object_size(key)
+        if size is None:
+            return _error(404, "NoSuchKey", "The specified key does not exist.", head)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return _error(503, "SlowDown", "Please reduce your request rate.", head)
+        etag = self.catalog.etag(key)
+        if_match = request.headers.get("If-Match")
+        if if_match and if_match != etag:
+            return _error(412, "PreconditionFailed", "At least one of the preconditions you specified did not hold.",
+                          head)
+        await asyncio.sleep(self.latency)
+
+        headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED, "Accept-Ranges": "bytes",
+                   "Content-Type": "video/mp4"}
+        if head:
+            return web.Response(headers=dict(headers, **{"Content-Length": str(size)}))
+
+        byte_range = parse_range(request.headers.get("Range"), size)
+        status = 200
+        start, stop = 0, size
+        if byte_range is not None:
+            start, stop = byte_range
+            if stop == 0:
+                return _error(416, "InvalidRange", "The requested range is not satisfiable")
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = stop - start
+        await response.prepare(request)
+        for chunk in self.catalog.iter_bytes(key, start, stop):
+            await response.write(chunk)
+            self.bytes_sent += len(chunk)
+            if self.bandwidth:
+                await asyncio.sleep(len(chunk) / self.bandwidth)
+        await response.write_eof()
+        return response
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("HEAD", "/{bucket}/{key:.+}", self.handle)
+        app.router.add_get("/{bucket}/{key:.+}", self.handle, allow_head=False)
+        return app
+
+    async def start_async(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在后台线程中启动，返回服务地址"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start_async(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.base_url
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8903)
+    parser.add_argument("--bucket", default="bench")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=0)
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    parser.add_argument("--object-kb", type=int, default=1024)
+    args = parser.parse_args()
+    catalog = MediaCatalog(args.catalog_size, object_size=args.object_kb * 1024)
+    fake = FakeS3(catalog, args.bucket, args.latency_ms, args.error_rate, args.bandwidth_mbps)
+    web.run_app(fake.make_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试公用工具
+- AppServer: 在子进程中启动应用（gunicorn + Flask 或 uvicorn + ASGI），上游指向本地替身服务
+- tree_rss_mb / RssSampler: 服务进程（含 worker）的 RSS 和峰值
+- summarize: 延迟列表的吞吐量和 p50/p95/p99
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 服务入口：替身服务直接接收文本，跳过 tiktoken 分词（分词需要联网下载词表）
+_ENTRY = """
+import app as flask_app
+flask_app.film_media_service.embedding_service.embeddings.check_embedding_ctx_length = False
+from {module} import app
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tree_rss_mb(pid: int) -> float:
+    """进程及其子进程的 RSS 之和（MB），读取 /proc"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+class RssSampler:
+    """后台定期采样进程树 RSS，记录峰值：with RssSampler(pid) as rss: ...; rss.peak_mb"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.start_mb = self.peak_mb = self.end_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, tree_rss_mb(self.pid))
+
+    def __enter__(self) -> "RssSampler":
+        self.start_mb = self.peak_mb = tree_rss_mb(self.pid)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = tree_rss_mb(self.pid)
+        self.peak_mb = max(self.peak_mb, self.end_mb)
+
+    def result(self) -> Dict[str, float]:
+        return {"rss_start_mb": self.start_mb, "rss_peak_mb": self.peak_mb, "rss_end_mb": self.end_mb}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, Optional[float]]:
+    """成功请求的吞吐量（每秒）和延迟分位数（毫秒）"""
+    values = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else value * 1000
+
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(values) / elapsed if elapsed > 0 else None,
+        "p50_ms": ms(percentile(values, 0.50)),
+        "p95_ms": ms(percentile(values, 0.95)),
+        "p99_ms": ms(percentile(values, 0.99)),
+    }
+
+
+def app_env(workdir: str, azure_url: str, core_api_url: str, s3_url: Optional[str] = None,
+            bucket: str = "bench", **overrides) -> Dict[str, str]:
+    """应用子进程的环境变量：上游指向替身服务，多 worker 共享 SQLite 任务存储
+
+    所有请求来自同一个 IP，默认关闭客户端限流和单客户端任务数上限，测量的是搜索本身；
+    需要测试限流时通过 overrides 开启（见 bench_rate_limit.py）
+    """
+    env = dict(
+        os.environ,
+        AZURE_OPENAI_API_KEY_EASTUS="bench", AZURE_OPENAI_API_ENDPOINT_EASTUS=azure_url,
+        OPENAI_API_VERSION="2024-02-01",
+        AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench", AWS_REGION="us-east-1", AWS_BUCKET=bucket,
+        MEDEO_CORE_API_BASE_URL=core_api_url,
+        EMBEDDING_CACHE_PATH=os.path.join(workdir, "embeddings.sqlite3"),
+        MEDIA_CACHE_DIR=os.path.join(workdir, "media_cache"),
+        TASK_STORE_BACKEND="sqlite", TASK_STORE_URL=os.path.join(workdir, "task_store.sqlite3"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "prometheus"),
+        LOG_LEVEL="WARNING",
+        RATE_LIMIT_RATE="0", SEARCH_MAX_PER_CLIENT="0",
+        PYTHONPATH=os.pathsep.join([workdir, ROOT]),
+    )
+    env.pop("FILM_MEDIA_INDEX_PATH", None)
+    if s3_url:
+        env["S3_ENDPOINT_URL"] = s3_url
+    env.update(overrides)
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    for mode, module in (("flask", "app"), ("asgi", "asgi")):
+        with open(os.path.join(workdir, f"bench_{mode}_entry.py"), "w") as f:
+            f.write(_ENTRY.format(module=module))
+    return env
+
+
+class AppServer:
+    """子进程中的应用服务
+
+    mode: flask（gunicorn，按 gunicorn.conf.py 使用 gthread worker）或 asgi（uvicorn）
+    env: app_env 生成的环境变量
+    """
+
+    def __init__(self, mode: str, workers: int, env: Dict[str, str]):
+        self.mode = mode
+        self.workers = workers
+        self.env = env
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.process: Optional[subprocess.Popen] = None
+        # 服务输出写入临时文件（管道不读取会写满阻塞），启动失败时输出末尾
+        self._log = tempfile.TemporaryFile()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def command(self) -> List[str]:
+        if self.mode == "flask":
+            return [sys.executable, "-m", "gunicorn", "-w", str(self.workers), "-b", f"127.0.0.1:{self.port}",
+                    "bench_flask_entry:app"]
+        return [sys.executable, "-m", "uvicorn", "bench_asgi_entry:app", "--host", "127.0.0.1",
+                "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning",
+                "--no-access-log"]
+
+    def start(self, timeout: float = 60) -> "AppServer":
+        """启动并等待所有 worker 都能响应 /"""
+        self.process = subprocess.Popen(self.command(), cwd=ROOT, env=self.env, stdout=self._log,
+                                        stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.time() + timeout
+        ready = 0
+        while ready < self.workers * 2:
+            if self.process.poll() is not None:
+                self._log.seek(0)
+                raise RuntimeError(f"{self.mode} 服务启动失败: {self._log.read().decode()[-500:]}")
+            if time.time() > deadline:
+                self.stop()
+                raise RuntimeError(f"{self.mode} 服务 {timeout:.0f}s 内未就绪")
+            try:
+                with urllib.request.urlopen(self.base_url + "/", timeout=5) as response:
+                    ready = ready + 1 if response.status == 200 else 0
+            except (OSError, urllib.error.URLError):
+                ready = 0
+                time.sleep(0.2)
+        return self
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        os.killpg(self.process.pid, signal.SIGTERM)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+
+    def __enter__(self) -> "AppServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
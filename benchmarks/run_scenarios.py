@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端负载场景
+在子进程中启动应用，Azure 向量接口、core API 和 S3 全部指向本地替身（共用同一个合成媒体库），
+依次执行以下场景，记录每个场景的吞吐量、p50/p95/p99 延迟和服务进程（含 worker）RSS：
+- search_cold: 一组不同文本的搜索（向量缓存、搜索结果缓存均为空），提交到完成的延迟
+- search_warm: 再次搜索同一组文本（命中缓存）
+- search_burst: 同时提交大量新搜索，统计完成延迟和被拒绝（429）的数量
+- status_storm: 大量并发轮询任务状态
+- download_fanout: 并发打包下载任务媒体（s3=1，从 S3 替身流式读取）
+
+结果可写成 JSON（--output），并与上一次的结果对比（--baseline），吞吐下降或 p95 上升超过阈值的场景标记为回退。
+
+用法: python benchmarks/run_scenarios.py [--server flask|asgi --workers 4 --output run.json --baseline last.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes.azure_embeddings import FakeAzureEmbeddings  # noqa: E402
+from benchmarks.fakes.catalog import MediaCatalog  # noqa: E402
+from benchmarks.fakes.core_api import FakeCoreApi  # noqa: E402
+from benchmarks.fakes.s3 import FakeS3  # noqa: E402
+from benchmarks.harness import ROOT, AppServer, RssSampler, app_env, summarize, tree_rss_mb  # noqa: E402
+
+SCENARIOS = ("search_cold", "search_warm", "search_burst", "status_storm", "download_fanout")
+
+
+class Client:
+    """调用应用接口，搜索提交后轮询状态直到完成"""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, poll_interval: float, timeout: float = 60):
+        self.session = session
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    async def search(self, text: str, match_count: int) -> Tuple[str, Optional[str], float]:
+        """返回 (结果: completed / error / rejected / timeout, 任务ID, 耗时)"""
+        start = time.perf_counter()
+        async with self.session.post(f"{self.base_url}/api/search",
+                                     json={"text": text, "match_count": match_count}) as response:
+            if response.status == 429:
+                return "rejected", None, time.perf_counter() - start
+            task_id = (await response.json()).get("task_id")
+        if task_id is None:
+            return "error", None, time.perf_counter() - start
+        deadline = start + self.timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            async with self.session.get(f"{self.base_url}/api/status/{task_id}") as response:
+                status = await response.json()
+            if status.get("status") in ("completed", "error"):
+                return status["status"], task_id, time.perf_counter() - start
+        return "timeout", task_id, time.perf_counter() - start
+
+
+async def run_searches(client: Client, texts: List[str], match_count: int, concurrency: Optional[int]) -> Dict:
+    """执行一组搜索，concurrency 为 None 时全部同时提交"""
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    completed_tasks: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency or len(texts))
+
+    async def one(text: str):
+        async with semaphore:
+            try:
+                outcome, task_id, elapsed = await client.search(text, match_count)
+            except aiohttp.ClientError:
+                outcome, task_id, elapsed = "error", None, 0.0
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if outcome == "completed":
+            latencies.append(elapsed)
+            completed_tasks.append(task_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    result = summarize(latencies, time.perf_counter() - start, errors=len(texts) - len(latencies))
+    result["outcomes"] = outcomes
+    result["task_ids"] = completed_tasks
+    return result
+
+
+async def run_status_storm(client: Client, task_id: str, concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    end = time.perf_counter() + duration
+
+    async def poller():
+        nonlocal errors
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            try:
+                async with client.session.get(f"{client.base_url}/api/status/{task_id}") as response:
+                    await response.read()
+                    ok = response.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(poller() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_download_fanout(client: Client, task_ids: List[str], downloads: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    total_bytes = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(task_id: str):
+        nonlocal errors, total_bytes
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with client.session.get(f"{client.base_url}/api/download/{task_id}/bundle",
+                                              params={"format": "zip", "s3": "1"}) as response:
+                    if response.status != 200:
+                        errors += 1
+                        return
+                    async for chunk in response.content.iter_chunked(256 * 1024):
+                        total_bytes += len(chunk)
+            except aiohttp.ClientError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(task_ids[i % len(task_ids)]) for i in range(downloads)))
+    result = summarize(latencies, time.perf_counter() - start, errors)
+    result["mb_per_s"] = total_bytes / 1024 / 1024 / result["elapsed_s"]
+    return result
+
+
+async def warm_up(base_url: str, count: int, concurrency: int):
+    """预热：让每个 worker 创建好各上游客户端，冷/热场景只比较缓存状态"""
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        client = Client(session, base_url, 0.02)
+        await run_searches(client, [f"warmup {i} {time.time()}" for i in range(count)], 1, concurrency)
+
+
+async def run_scenario(name: str, args, base_url: str, state: Dict) -> Dict:
+    timeout = aiohttp.ClientTimeout(total=300)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        client = Client(session, base_url, args.poll_ms / 1000)
+        if name in ("search_cold", "search_warm"):
+            texts = [f"scenario text {i}" for i in range(args.texts)]
+            result = await run_searches(client, texts, args.match_count, args.concurrency)
+            state.setdefault("task_ids", result["task_ids"])
+        elif name == "search_burst":
+            texts = [f"burst text {i} {time.time()}" for i in range(args.burst)]
+            result = await run_searches(client, texts, args.match_count, None)
+        elif name == "status_storm":
+            task_ids = state.get("task_ids") or (await run_searches(client, ["status probe"], 1, 1))["task_ids"]
+            if not task_ids:
+                raise RuntimeError("没有可用于轮询的任务")
+            result = await run_status_storm(client, task_ids[0], args.concurrency, args.duration)
+        elif name == "download_fanout":
+            task_ids = state.get("task_ids") or (await run_searches(
+                client, [f"download {i}" for i in range(4)], args.match_count, 4
+            ))["task_ids"]
+            if not task_ids:
+                raise RuntimeError("没有可下载的任务")
+            result = await run_download_fanout(client, task_ids, args.downloads, args.concurrency)
+        else:
+            raise ValueError(f"未知场景: {name}")
+    result.pop("task_ids", None)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与上一次结果对比，返回回退的场景说明"""
+    regressions = []
+    for name, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or "error" in result or "error" in previous:
+            continue
+        notes = []
+        old, new = previous.get("throughput_per_s"), result.get("throughput_per_s")
+        if old and new is not None and new < old * (1 - threshold):
+            notes.append(f"throughput {old:.1f} -> {new:.1f}/s")
+        old, new = previous.get("p95_ms"), result.get("p95_ms")
+        if old and new is not None and new > old * (1 + threshold):
+            notes.append(f"p95 {old:.1f} -> {new:.1f} ms")
+        if notes:
+            regressions.append(f"{name}: {', '.join(notes)}")
+    return regressions
+
+
+def print_table(results: Dict, baseline: Optional[Dict]):
+    meta = results["meta"]
+    print(f"server={meta['server']} workers={meta['workers']} commit={meta['commit'] or '-'}")
+    print(f"{'scenario':>16} {'ok':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'RSS peak':>9} {'vs base':>8}")
+    for name, result in results["scenarios"].items():
+        if "error" in result:
+            print(f"{name:>16} failed: {result['error']}")
+            continue
+        delta = ""
+        previous = (baseline or {}).get("scenarios", {}).get(name) or {}
+        if previous.get("throughput_per_s") and result["throughput_per_s"] is not None:
+            delta = f"{(result['throughput_per_s'] / previous['throughput_per_s'] - 1) * 100:+.0f}%"
+
+        def fmt(value):
+            return "-" if value is None else f"{value:.1f}"
+
+        print(f"{name:>16} {result['requests']:>6} {result['errors']:>5} {fmt(result['throughput_per_s']):>8} "
+              f"{fmt(result['p50_ms']):>8} {fmt(result['p95_ms']):>8} {fmt(result['p99_ms']):>8} "
+              f"{result['rss_peak_mb']:>7.0f}MB {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32, help="搜索、轮询和下载的并发客户端数")
+    parser.add_argument("--texts", type=int, default=200, help="冷/热搜索的文本数")
+    parser.add_argument("--burst", type=int, default=300, help="同时提交的搜索数")
+    parser.add_argument("--duration", type=float, default=5, help="状态轮询持续秒数")
+    parser.add_argument("--downloads", type=int, default=32, help="打包下载次数")
+    parser.add_argument("--match-count", type=int, default=5)
+    parser.add_argument("--poll-ms", type=float, default=50, help="客户端轮询任务状态的间隔")
+    parser.add_argument("--warmup", type=int, default=32, help="场景开始前的预热搜索数")
+    # 替身服务
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    parser.add_argument("--object-kb", type=int, default=1024, help="媒体对象平均大小")
+    parser.add_argument("--azure-latency-ms", type=float, default=50)
+    parser.add_argument("--azure-error-rate", type=float, default=0.0)
+    parser.add_argument("--core-latency-ms", type=float, default=30)
+    parser.add_argument("--core-error-rate", type=float, default=0.0)
+    parser.add_argument("--s3-latency-ms", type=float, default=20)
+    parser.add_argument("--s3-error-rate", type=float, default=0.0)
+    parser.add_argument("--s3-bandwidth-mbps", type=float, default=0, help="S3 每连接带宽上限，0 为不限")
+    # 输出
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="上一次的结果 JSON，用于对比")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定回退的变化比例")
+    args = parser.parse_args()
+
+    catalog = MediaCatalog(args.catalog_size, object_size=args.object_kb * 1024)
+    azure = FakeAzureEmbeddings(latency_ms=args.azure_latency_ms, error_rate=args.azure_error_rate)
+    core_api = FakeCoreApi(latency_ms=args.core_latency_ms, error_rate=args.core_error_rate, catalog=catalog)
+    s3 = FakeS3(catalog, latency_ms=args.s3_latency_ms, error_rate=args.s3_error_rate,
+                bandwidth_mbps=args.s3_bandwidth_mbps)
+    env = app_env(tempfile.mkdtemp(prefix="bench_scenarios_"), azure.start_in_thread(), core_api.start_in_thread(),
+                  s3.start_in_thread(), bucket=s3.bucket)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "server": args.server,
+            "workers": args.workers,
+            "args": {key: value for key, value in vars(args).items() if key not in ("json", "output", "baseline")},
+        },
+        "scenarios": {},
+    }
+    state: Dict = {}
+    with AppServer(args.server, args.workers, env) as server:
+        if args.warmup:
+            asyncio.run(warm_up(server.base_url, args.warmup, args.workers * 2))
+        results["meta"]["rss_idle_mb"] = tree_rss_mb(server.pid)
+        for name in args.scenarios.split(","):
+            try:
+                with RssSampler(server.pid) as rss:
+                    result = asyncio.run(run_scenario(name, args, server.base_url, state))
+                result.update(rss.result())
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+            results["scenarios"][name] = result
+    results["upstream"] = {
+        "azure_requests": azure.requests,
+        "core_api_requests": core_api.requests,
+        "s3_requests": s3.requests,
+        "s3_bytes": s3.bytes_sent,
+    }
+    for fake in (azure, core_api, s3):
+        fake.stop()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["regressions"] = compare(results, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print_table(results, baseline)
+    for line in results.get("regressions", []):
+        print(f"regression: {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打包流式输出
+把一组文件边读边写成 zip（仅存储，不压缩）或 tar 流，以生成器的形式逐块返回：
+不在磁盘上生成归档文件，内存占用只与分块大小有关，与归档总大小无关
+"""
+
+import tarfile
+import time
+import zipfile
+from typing import BinaryIO, Callable, Iterable, Iterator, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+# 打包条目：(归档内文件名, 打开函数)；打开函数返回 (可读对象, 大小)，在轮到该条目时才调用
+BundleEntry = Tuple[str, Callable[[], Tuple[BinaryIO, int]]]
+
+
+class _StreamBuffer:
+    """只追加的写缓冲，没有 tell/seek，zipfile 会按不可寻址的流写入"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _read_chunks(fileobj: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def stream_zip(entries: Iterable[BundleEntry], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """生成 zip 流（ZIP_STORED，支持 zip64）"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, opener in entries:
+            fileobj, size = opener()
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            with archive.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as dest:
+                for chunk in _read_chunks(fileobj, chunk_size):
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # 中央目录
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def stream_tar(entries: Iterable[BundleEntry], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """生成 tar 流（PAX 格式，支持大文件和非 ASCII 文件名）"""
+    written = 0
+    for arcname, opener in entries:
+        fileobj, size = opener()
+        info = tarfile.TarInfo(arcname)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        written += len(header)
+        yield header
+        remaining = size
+        for chunk in _read_chunks(fileobj, chunk_size):
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            written += len(chunk)
+            yield chunk
+        if remaining > 0:
+            raise IOError(f"{arcname} 内容不完整: 缺少 {remaining} 字节")
+        padding = -size % tarfile.BLOCKSIZE
+        if padding:
+            written += padding
+            yield tarfile.NUL * padding
+    # 结束标记：两个空块，再补齐到记录大小
+    end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+    written += len(end)
+    yield end + tarfile.NUL * (-written % tarfile.RECORDSIZE)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+core API 异步客户端
+取代在线程中调用同步 CoreApiClient.request 的做法：
+- 每个事件循环一个 aiohttp 会话，keep-alive 连接池跨请求复用
+- 每次调用有总时限（包含重试），单次尝试的超时不超过剩余时间
+- 幂等请求遇到连接错误、超时、429/502/503/504 时按指数退避加随机抖动重试，优先遵循 Retry-After
+- 熔断器：连续失败达到阈值后在冷却时间内直接失败，冷却后放行少量试探请求
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+import metrics
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class CoreApiError(Exception):
+    """core API 返回错误状态"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"core API 错误 {status}: {message}")
+        self.status = status
+
+
+class CoreApiTimeoutError(CoreApiError):
+    """超过调用时限"""
+
+    def __init__(self, deadline: float):
+        super().__init__(0, f"超过调用时限 {deadline:.1f}s")
+
+
+class CircuitOpenError(CoreApiError):
+    """熔断中，直接失败"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(0, f"core API 熔断中，{retry_after:.1f}s 后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败熔断器
+
+    failure_threshold: 连续失败多少次后熔断
+    reset_timeout: 熔断持续时间（秒），之后进入半开状态
+    half_open_max: 半开状态下同时放行的试探请求数，试探成功后恢复
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, half_open_max: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+
+    def before_call(self):
+        """请求前调用，熔断中抛出 CircuitOpenError"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN:
+                raise CircuitOpenError(self.reset_timeout - (time.monotonic() - self._opened_at))
+            if self._state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max:
+                    raise CircuitOpenError(0)
+                self._probes += 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+
+class AsyncCoreApiClient:
+    """带连接池、时限、重试和熔断的 core API 客户端
+
+    timeout: 单次尝试的超时（秒）
+    deadline: 一次调用（包含重试和退避）的总时限（秒）
+    max_retries: 最多重试次数
+    backoff_base / backoff_max: 退避基数和上限（秒），实际等待在 [0, min(上限, 基数 * 2^n)] 内随机
+    pool_size: 每个事件循环的最大连接数
+    """
+
+    def __init__(self, base_url: str, token: str, timeout: float = 10, deadline: float = 20,
+                 max_retries: int = 2, backoff_base: float = 0.2, backoff_max: float = 2,
+                 pool_size: int = 100, keepalive_timeout: float = 30,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+            weakref.WeakKeyDictionary()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _session(self) -> aiohttp.ClientSession:
+        """当前事件循环的会话（aiohttp 会话不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "Content-Type": "application/json",
+                    "Cookie": f"medeo-service-auth-token={self.token}",
+                },
+            )
+            self._sessions[loop] = session
+        return session
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, api_path: str, json_body: Any = None, params: Optional[dict] = None,
+                      deadline: Optional[float] = None, idempotent: Optional[bool] = None) -> Any:
+        """发送请求并返回解析后的 JSON（响应为空时返回 None）
+
+        idempotent: 是否可以重试，默认 GET/HEAD/PUT/DELETE 可重试；只读的 POST 接口需要显式传入 True
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+        deadline = self.deadline if deadline is None else deadline
+        url = f"{self.base_url}/{api_path.strip('/')}"
+        session = self._session()
+        expires_at = time.monotonic() + deadline
+        attempt = 0
+
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.rejected += 1
+                metrics.count_core_api("rejected")
+                raise
+            retry_after = None
+            succeeded = False
+            try:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    raise CoreApiTimeoutError(deadline)
+
+                self.requests += 1
+                try:
+                    async with session.request(
+                        method, url, json=json_body, params=params,
+                        timeout=aiohttp.ClientTimeout(total=min(self.timeout, remaining)),
+                    ) as response:
+                        text = await response.text()
+                        if response.status < 400:
+                            succeeded = True
+                            metrics.count_core_api("success")
+                            return _parse_body(text)
+                        error = CoreApiError(response.status, text[:200] or response.reason)
+                        retryable = response.status in RETRYABLE_STATUS
+                        # 4xx 是请求本身的问题，不计入熔断
+                        succeeded = response.status < 500 and response.status != 429
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = CoreApiError(0, f"{type(e).__name__}: {e}")
+                    retryable = True
+            finally:
+                # 每次通过 before_call 的尝试都要记录结果，否则半开状态的试探名额不会释放；
+                # 取消、超过时限和其他任何异常都按失败处理
+                if succeeded:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+
+            self.failures += 1
+            delay = self._backoff(attempt, retry_after)
+            if not idempotent or not retryable or attempt >= self.max_retries \
+                    or time.monotonic() + delay >= expires_at:
+                metrics.count_core_api("error")
+                raise error
+            attempt += 1
+            self.retries += 1
+            metrics.count_core_api("retry")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """关闭当前事件循环的会话"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """请求、重试、失败和熔断统计"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "breaker": self.breaker.state,
+        }
+
+
+def _parse_body(text: str) -> Any:
+    """与 CoreApiClient 一致：空响应返回 None，否则按 JSON 解析，不是 JSON 时返回原文"""
+    if not text.strip():
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def create_core_api_client() -> AsyncCoreApiClient:
+    """根据环境变量创建 core API 客户端
+
+    MEDEO_CORE_API_BASE_URL / MEDEO_CORE_API_AUTH_TOKEN: 服务地址和令牌
+    CORE_API_TIMEOUT: 单次尝试超时（秒）
+    CORE_API_DEADLINE: 单次调用总时限（秒）
+    CORE_API_MAX_RETRIES: 最多重试次数
+    CORE_API_POOL_SIZE: 连接池大小
+    CORE_API_BREAKER_THRESHOLD / CORE_API_BREAKER_RESET: 熔断的连续失败次数和持续时间（秒）
+    """
+    return AsyncCoreApiClient(
+        base_url=os.getenv("MEDEO_CORE_API_BASE_URL", "https://medeo-core-api.test-us.one2x.ai"),
+        token=os.getenv("MEDEO_CORE_API_AUTH_TOKEN", "token"),
+        timeout=float(os.getenv("CORE_API_TIMEOUT", 10)),
+        deadline=float(os.getenv("CORE_API_DEADLINE", 20)),
+        max_retries=int(os.getenv("CORE_API_MAX_RETRIES", 2)),
+        pool_size=int(os.getenv("CORE_API_POOL_SIZE", 100)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("CORE_API_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("CORE_API_BREAKER_RESET", 30)),
+        ),
+    )
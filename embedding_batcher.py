@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量请求微批处理
+在一个很短的时间窗口内收集并发的单条文本请求，合并成一次 aembed_documents 调用，
+再把结果分发回各个等待方；同一批次内相同的文本只请求一次
+"""
+
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+EmbedDocuments = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class _Batch:
+    """一个待发送的批次：文本 -> 等待结果的 future"""
+
+    __slots__ = ("futures", "timer")
+
+    def __init__(self):
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """向量请求合并器
+
+    embed_documents: 批量向量化函数，例如 AzureOpenAIEmbeddings.aembed_documents
+    window: 收集窗口（秒），第一条请求到达后等待这么久再发送
+    max_batch_size: 单批最多文本数，达到后立即发送
+
+    批次按事件循环隔离，只有运行在同一个事件循环上的请求才会被合并。
+    发送中的批次任务保存在 _tasks 中（防止被垃圾回收），关闭时用 close() 取消并等待。
+    """
+
+    def __init__(self, embed_documents: EmbedDocuments, window: float = 0.01, max_batch_size: int = 64):
+        self.embed_documents = embed_documents
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._batches: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Batch]" = weakref.WeakKeyDictionary()
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.texts_sent = 0
+        self.requests = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """提交一条文本，等待所在批次返回结果"""
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+
+        batch = self._batches.get(loop)
+        if batch is None:
+            batch = _Batch()
+            self._batches[loop] = batch
+            batch.timer = loop.call_later(self.window, self._flush, loop, batch)
+
+        future = batch.futures.get(text)
+        if future is None:
+            future = loop.create_future()
+            batch.futures[text] = future
+            if len(batch.futures) >= self.max_batch_size:
+                self._flush(loop, batch)
+
+        # shield: 某个调用方被取消时不影响共享同一结果的其他调用方
+        return await asyncio.shield(future)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: _Batch):
+        """发送批次"""
+        if self._batches.get(loop) is batch:
+            del self._batches[loop]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        if batch.futures:
+            task = loop.create_task(self._send(batch.futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, futures: Dict[str, asyncio.Future]):
+        texts = list(futures)
+        self.batches_sent += 1
+        self.texts_sent += len(texts)
+        try:
+            embeddings = await self.embed_documents(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"向量数量不匹配: 请求 {len(texts)} 条，返回 {len(embeddings)} 条")
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, embedding in zip(texts, embeddings):
+            future = futures[text]
+            if not future.done():
+                future.set_result(embedding)
+
+    async def close(self):
+        """取消当前事件循环上未发送的批次和发送中的任务，并等待任务结束"""
+        loop = asyncio.get_running_loop()
+        batch = self._batches.pop(loop, None)
+        if batch is not None:
+            if batch.timer is not None:
+                batch.timer.cancel()
+            for future in batch.futures.values():
+                future.cancel()
+        tasks = [task for task in self._tasks if task.get_loop() is loop]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        """合并统计"""
+        return {
+            "requests": self.requests,
+            "batches_sent": self.batches_sent,
+            "texts_sent": self.texts_sent,
+            "avg_batch_size": self.texts_sent / self.batches_sent if self.batches_sent else 0.0,
+        }
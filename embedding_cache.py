@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量缓存
+两级缓存：
+- 内存 LRU，向量以 float32 字节保存
+- SQLite/WAL 磁盘缓存，多个 worker 共享，重启后仍然有效
+缓存键由规范化文本、模型名和向量维度组成，更换模型或维度后旧条目自然失效
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：Unicode NFKC、去除首尾空白、合并连续空白、忽略大小写"""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split()).casefold()
+
+
+def pack_embedding(embedding: Sequence[float]) -> bytes:
+    """向量打包为 float32 字节"""
+    return array("f", embedding).tobytes()
+
+
+def unpack_embedding(data: bytes) -> List[float]:
+    """float32 字节还原为向量"""
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class SQLiteEmbeddingStore:
+    """磁盘缓存层"""
+
+    # 每写入多少次做一次容量和过期清理
+    PURGE_INTERVAL = 512
+
+    def __init__(self, path: str, max_entries: int = 200000, ttl: float = 30 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings(created_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT vector FROM embeddings WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, vector: bytes):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+            (key, vector, time.time()),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self.purge()
+
+    def purge(self):
+        """删除过期条目，并把条目数压回上限以内"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def __len__(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+
+class EmbeddingCache:
+    """两级向量缓存"""
+
+    def __init__(self, model: str, dimensions: int, maxsize: int = 10000,
+                 disk_store: Optional[SQLiteEmbeddingStore] = None):
+        self.model = model
+        self.dimensions = dimensions
+        self.maxsize = maxsize
+        self.disk_store = disk_store
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str) -> str:
+        """缓存键：模型、维度和规范化文本的哈希"""
+        raw = f"{self.model}\x00{self.dimensions}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """查询缓存，磁盘命中时回填内存"""
+        key = self.make_key(text)
+        data = self._get_memory(key)
+        if data is None and self.disk_store is not None:
+            data = self._get_disk(key)
+        return self._result(data)
+
+    async def aget(self, text: str) -> Optional[List[float]]:
+        """在事件循环中查询缓存：内存层直接读取，磁盘层在线程中读取，不阻塞事件循环"""
+        key = self.make_key(text)
+        data = self._get_memory(key)
+        if data is None and self.disk_store is not None:
+            data = await asyncio.to_thread(self._get_disk, key)
+        return self._result(data)
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                metrics.count_cache("embedding", "memory_hit")
+        return data
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        try:
+            data = self.disk_store.get(key)
+        except sqlite3.Error as e:
+            logger.warning("读取向量磁盘缓存失败: %s", e)
+            return None
+        if data is not None:
+            self._remember(key, data)
+            self.disk_hits += 1
+            metrics.count_cache("embedding", "disk_hit")
+        return data
+
+    def _result(self, data: Optional[bytes]) -> Optional[List[float]]:
+        if data is None:
+            self.misses += 1
+            metrics.count_cache("embedding", "miss")
+            return None
+        return unpack_embedding(data)
+
+    def set(self, text: str, embedding: Sequence[float]):
+        """写入两级缓存"""
+        data = self._prepare(text, embedding)
+        if data is not None and self.disk_store is not None:
+            self._set_disk(*data)
+
+    async def aset(self, text: str, embedding: Sequence[float]):
+        """在事件循环中写入缓存：磁盘层在线程中写入"""
+        data = self._prepare(text, embedding)
+        if data is not None and self.disk_store is not None:
+            await asyncio.to_thread(self._set_disk, *data)
+
+    def _prepare(self, text: str, embedding: Sequence[float]) -> Optional[tuple]:
+        """写入内存层，返回 (键, 向量字节) 供写入磁盘层；维度不符时不缓存"""
+        if len(embedding) != self.dimensions:
+            return None
+        key = self.make_key(text)
+        data = pack_embedding(embedding)
+        self._remember(key, data)
+        return key, data
+
+    def _set_disk(self, key: str, data: bytes):
+        try:
+            self.disk_store.set(key, data)
+        except sqlite3.Error as e:
+            logger.warning("写入向量磁盘缓存失败: %s", e)
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def __contains__(self, text: str) -> bool:
+        return self.make_key(text) in self._memory
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数和命中率（单条实际内存占用见 benchmarks/bench_embedding_cache.py）"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def create_embedding_cache(model: str, dimensions: int) -> EmbeddingCache:
+    """根据环境变量创建向量缓存
+
+    EMBEDDING_CACHE_SIZE: 内存缓存条目数
+    EMBEDDING_CACHE_PATH: 磁盘缓存文件，设为空字符串时只使用内存缓存
+    EMBEDDING_CACHE_TTL: 磁盘缓存保留秒数
+    """
+    maxsize = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+    path = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("downloads", "embedding_cache.sqlite3"))
+    disk_store = None
+    if path:
+        try:
+            disk_store = SQLiteEmbeddingStore(
+                path, ttl=float(os.getenv("EMBEDDING_CACHE_TTL", 30 * 86400))
+            )
+        except (OSError, sqlite3.Error) as e:
+            # 只读文件系统（如 Lambda 非 /tmp 目录）时退化为纯内存缓存
+            logger.warning("向量磁盘缓存不可用，仅使用内存缓存: %s", e)
+    return EmbeddingCache(model, dimensions, maxsize=maxsize, disk_store=disk_store)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询向量的紧凑传输格式
+JSON 数组表示 512 维向量约 10 KB，编码也耗 CPU；紧凑格式为 base64 编码的二进制：
+    8 字节头（魔数 b"QE"、版本、数据类型、维度 uint32，小端） + 小端 float32/float16 数据
+512 维 float32 约 2.7 KB，float16 约 1.4 KB。
+服务端和本地索引都可以用 decode_embedding 同时接受 JSON 数组和紧凑格式。
+"""
+
+import base64
+import logging
+import os
+import struct
+import threading
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QE"
+VERSION = 1
+_HEADER = struct.Struct("<2sBBI")
+
+# 格式名 -> (头中的类型码, 小端 dtype)
+FORMATS = {
+    "f32": (1, np.dtype("<f4")),
+    "f16": (2, np.dtype("<f2")),
+}
+_DTYPES = {code: dtype for code, dtype in FORMATS.values()}
+
+# 服务端不支持紧凑格式时返回的状态码
+REJECTED_STATUS = {400, 415, 422}
+
+
+def encode_embedding(embedding: Union[Sequence[float], np.ndarray], fmt: str = "json") -> Union[list, str]:
+    """编码向量：json 返回浮点数列表，f32/f16 返回带版本头的 base64 字符串"""
+    if fmt == "json":
+        return embedding.tolist() if isinstance(embedding, np.ndarray) else list(embedding)
+    code, dtype = FORMATS[fmt]
+    data = np.asarray(embedding, dtype=dtype)
+    return base64.b64encode(_HEADER.pack(MAGIC, VERSION, code, data.shape[0]) + data.tobytes()).decode("ascii")
+
+
+def decode_embedding(value: Union[list, str, bytes]) -> np.ndarray:
+    """解码 JSON 数组或紧凑格式，返回 float32 向量"""
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=np.float32)
+    raw = base64.b64decode(value, validate=True)
+    if len(raw) < _HEADER.size:
+        raise ValueError("向量数据过短")
+    magic, version, code, dimensions = _HEADER.unpack_from(raw)
+    if magic != MAGIC or version != VERSION or code not in _DTYPES:
+        raise ValueError(f"不支持的向量格式: {magic!r} v{version} type {code}")
+    dtype = _DTYPES[code]
+    if len(raw) != _HEADER.size + dimensions * dtype.itemsize:
+        raise ValueError("向量长度与头部维度不一致")
+    return np.frombuffer(raw, dtype=dtype, offset=_HEADER.size).astype(np.float32)
+
+
+class EmbeddingWireFormat:
+    """match 接口查询向量的传输格式协商
+
+    preferred: 首选格式（json / f32 / f16）；紧凑格式被服务端拒绝（400/415/422）后
+    回退到 JSON 数组并在本进程内记住，之后不再尝试
+    """
+
+    def __init__(self, preferred: str = "json"):
+        if preferred != "json" and preferred not in FORMATS:
+            raise ValueError(f"不支持的向量格式: {preferred}")
+        self.preferred = preferred
+        self._lock = threading.Lock()
+        self._fallback = False
+
+    @property
+    def current(self) -> str:
+        return "json" if self._fallback else self.preferred
+
+    def payload(self, embedding: Sequence[float], fmt: Optional[str] = None) -> Dict[str, Any]:
+        """请求体中的查询向量字段"""
+        return {"query_embedding": encode_embedding(embedding, fmt or self.current)}
+
+    def should_fallback(self, fmt: str, status: int) -> bool:
+        """紧凑格式请求失败后判断是否需要用 JSON 数组重试，需要时记住回退"""
+        if fmt == "json" or status not in REJECTED_STATUS:
+            return False
+        with self._lock:
+            if not self._fallback:
+                logger.warning("match 接口不支持 %s 向量格式（状态码 %s），回退到 JSON 数组", fmt, status)
+            self._fallback = True
+        return True
+
+
+def create_wire_format() -> EmbeddingWireFormat:
+    """CORE_API_EMBEDDING_FORMAT: json（默认）/ f32 / f16"""
+    return EmbeddingWireFormat(os.getenv("CORE_API_EMBEDDING_FORMAT", "json").lower())
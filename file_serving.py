@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地文件下载响应
+支持断点续传和播放器拖动进度：
+- Range 请求：单段返回 206，多段返回 multipart/byteranges，无法满足返回 416
+- 强 ETag（inode + 修改时间 + 大小）和 Last-Modified，If-None-Match / If-Modified-Since 返回 304，
+  If-Range 不匹配时返回完整文件
+- 可选交给前置代理发送文件内容（nginx X-Accel-Redirect 或 X-Sendfile），由代理使用零拷贝 sendfile
+"""
+
+import mimetypes
+import os
+import uuid
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from werkzeug.http import http_date, is_resource_modified, parse_if_range_header
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import wrap_file
+
+CHUNK_SIZE = 256 * 1024
+
+# 合并后超过该段数的 Range 请求按完整文件返回，避免大量小段拖慢响应
+MAX_RANGES = 16
+
+
+class FileServeSettings:
+    """文件发送方式，可通过环境变量调整"""
+
+    def __init__(self, mode: str = "direct", root: str = "downloads", accel_prefix: str = "/protected-downloads/",
+                 max_age: int = 3600):
+        self.mode = mode
+        self.root = root
+        self.accel_prefix = accel_prefix
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls) -> "FileServeSettings":
+        """FILE_SERVE_MODE (direct / x-accel-redirect / x-sendfile) / FILE_SERVE_ACCEL_PREFIX / FILE_SERVE_MAX_AGE"""
+        return cls(
+            mode=os.getenv("FILE_SERVE_MODE", "direct").lower(),
+            accel_prefix=os.getenv("FILE_SERVE_ACCEL_PREFIX", "/protected-downloads/"),
+            max_age=int(os.getenv("FILE_SERVE_MAX_AGE", 3600)),
+        )
+
+
+def file_etag(st: os.stat_result) -> str:
+    """强 ETag：文件只通过原子重命名写入，inode + 修改时间 + 大小即可唯一标识内容"""
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def parse_byte_ranges(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """解析 Range 头，返回按顺序合并后的 [(起始, 结束)]（结束不含）
+
+    头格式不合法时返回 None（按完整文件返回），所有段都无法满足时返回空列表（416）
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = (p.strip() for p in part.partition("-"))
+        if not dash or not (first or last) or not all(p.isdigit() for p in (first, last) if p):
+            return None
+        if not first:
+            # 后缀范围：最后 N 字节
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(0, size - length), size))
+            continue
+        start = int(first)
+        stop = size if not last else int(last) + 1
+        if last and stop <= start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(stop, size)))
+
+    # 合并重叠或相邻的段
+    merged: List[Tuple[int, int]] = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _read_range(path: str, start: int, stop: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart_body(path: str, ranges: List[Tuple[int, int]], size: int, mimetype: str,
+                    boundary: str) -> Tuple[Iterator[bytes], int]:
+    """multipart/byteranges 响应体及其长度"""
+    headers = [
+        (f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+         f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode("latin-1")
+        for start, stop in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    length = sum(len(h) for h in headers) + sum(stop - start for start, stop in ranges) + len(closing)
+
+    def body():
+        for header, (start, stop) in zip(headers, ranges):
+            yield header
+            yield from _read_range(path, start, stop)
+        yield closing
+
+    return body(), length
+
+
+def _content_disposition(download_name: str, as_attachment: bool) -> str:
+    kind = "attachment" if as_attachment else "inline"
+    try:
+        download_name.encode("ascii")
+        return f'{kind}; filename="{download_name}"'
+    except UnicodeEncodeError:
+        return f"{kind}; filename*=UTF-8''{quote(download_name)}"
+
+
+def serve_file(request: Request, path: str, download_name: Optional[str] = None, as_attachment: bool = True,
+               settings: Optional[FileServeSettings] = None) -> Response:
+    """发送本地文件，处理条件请求和 Range 请求"""
+    settings = settings or FileServeSettings()
+    st = os.stat(path)
+    size = st.st_size
+    etag = file_etag(st)
+    download_name = download_name or os.path.basename(path)
+    mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    response = Response(mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = int(st.st_mtime)
+    response.cache_control.private = True
+    response.cache_control.max_age = settings.max_age
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Content-Disposition"] = _content_disposition(download_name, as_attachment)
+
+    if request.method in ("GET", "HEAD") and not is_resource_modified(
+        request.environ, etag=etag, last_modified=http_date(st.st_mtime)
+    ):
+        response.status_code = 304
+        return response
+
+    if settings.mode in ("x-accel-redirect", "x-sendfile"):
+        # 文件内容、Range 由前置代理处理
+        if settings.mode == "x-accel-redirect":
+            relative = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.root))
+            response.headers["X-Accel-Redirect"] = settings.accel_prefix.rstrip("/") + "/" + quote(
+                relative.replace(os.sep, "/")
+            )
+        else:
+            response.headers["X-Sendfile"] = os.path.abspath(path)
+        response.content_length = 0
+        return response
+
+    ranges = parse_byte_ranges(request.headers.get("Range"), size)
+    if ranges is not None and request.headers.get("If-Range"):
+        # If-Range：资源未变化才返回部分内容，否则返回完整文件
+        if_range = parse_if_range_header(request.headers["If-Range"])
+        if if_range.etag is not None:
+            matched = if_range.etag == etag
+        else:
+            matched = if_range.date is not None and int(if_range.date.timestamp()) == int(st.st_mtime)
+        if not matched:
+            ranges = None
+    if ranges is not None and len(ranges) > MAX_RANGES:
+        ranges = None
+
+    if ranges is None:
+        response.content_length = size
+        if request.method != "HEAD":
+            response.response = wrap_file(request.environ, open(path, "rb"), CHUNK_SIZE)
+            response.direct_passthrough = True
+        return response
+
+    if not ranges:
+        response.status_code = 416
+        response.headers["Content-Range"] = f"bytes */{size}"
+        response.content_length = 0
+        return response
+
+    response.status_code = 206
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        response.content_length = stop - start
+        if request.method != "HEAD":
+            response.response = _read_range(path, start, stop)
+        return response
+
+    boundary = uuid.uuid4().hex
+    body, length = _multipart_body(path, ranges, size, mimetype, boundary)
+    response.headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+    response.content_length = length
+    if request.method != "HEAD":
+        response.response = body
+    return response
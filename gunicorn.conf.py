@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置（gunicorn 启动时自动加载当前目录下的 gunicorn.conf.py）
+绑定地址和 worker 数仍由 Procfile / Dockerfile 的命令行参数指定。
+
+前端为每个搜索打开 SSE 状态推送，每个连接最长占用一个请求处理单元 TASK_STREAM_MAX_DURATION 秒；
+同步 worker 下 4 个打开的搜索就会挡住其他所有请求，因此使用 gthread worker，
+每个 worker 用 GUNICORN_THREADS 个线程处理请求。
+
+多 worker 时每个 worker 有独立的 Prometheus 指标，这里设置 PROMETHEUS_MULTIPROC_DIR，
+worker 把指标写入该目录，/metrics 汇总所有 worker。
+"""
+
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "film_media_prometheus"))
+
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+
+def on_starting(server):
+    """启动时清空上次运行留下的指标文件"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker 退出后不再计入 livesum 类型的指标"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟创建的服务属性
+Lambda 冷启动和 gunicorn worker 启动时不创建向量客户端、S3 客户端等重量级依赖，
+首次访问时才创建并缓存；只访问 / 或状态查询的请求不会触发创建
+"""
+
+import threading
+from typing import Any, Callable
+
+
+class lazy_service:
+    """首次访问时调用 factory(instance) 创建并缓存的属性
+
+    创建过程加锁，并发的首次访问只创建一次；创建失败时不缓存，下次访问重试。
+    可以直接赋值替换（例如替换为测试替身）。
+    """
+
+    def __init__(self, factory: Callable[[Any], Any]):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance.__dict__
+        if self.name not in values:
+            with self._lock:
+                if self.name not in values:
+                    values[self.name] = self.factory(instance)
+        return values[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
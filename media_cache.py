@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地媒体缓存
+按 S3 key + ETag 内容寻址保存下载的媒体，多个任务共用同一份文件：
+- 任务目录 downloads/<task_id>/ 中只放指向缓存对象的硬链接（不支持时退化为符号链接或复制）
+- 缓存总大小超过预算时按最近使用时间淘汰（下载时累计大小，超出预算或定期清理时才扫描目录）
+- 同一对象的并发请求只下载一次（进程内加锁，跨 worker 使用文件锁）
+- 后台清理线程删除遗留的 .part 临时文件、downloads/temp 残留和过期的任务目录
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只做进程内去重
+    fcntl = None
+
+import metrics
+from s3_transfer import ResumableDownloader
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """内容寻址的媒体缓存
+
+    root: 缓存目录，对象保存在 root/objects/<前两位>/<哈希><扩展名>
+    max_bytes: 缓存对象总大小上限
+    """
+
+    def __init__(self, root: str, downloader: ResumableDownloader, max_bytes: int = 20 * 1024 ** 3):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.downloader = downloader
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # 路径 -> [锁, 使用者数]，最后一个使用者退出时移除
+        self._key_locks: Dict[str, list] = {}
+        # 缓存对象总大小，首次需要时扫描一次，之后随下载和淘汰累加；
+        # 其他 worker 写入的对象在下一次淘汰扫描时计入
+        self._usage: Optional[int] = None
+        self._sweeper: Optional[threading.Thread] = None
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def object_path(self, key: str, etag: str) -> str:
+        """对象在缓存中的路径"""
+        digest = hashlib.sha256(f"{key}\x00{etag}".encode("utf-8")).hexdigest()
+        extension = os.path.splitext(key)[1] or ".mp4"
+        return os.path.join(self.objects_dir, digest[:2], digest + extension)
+
+    @contextmanager
+    def _single_flight(self, path: str) -> Iterator[None]:
+        """同一对象同时只有一个下载：进程内线程锁 + 跨进程文件锁"""
+        with self._lock:
+            entry = self._key_locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                    return
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".lock", "w") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[path]
+
+    def fetch(self, bucket: str, key: str, head: Optional[dict] = None, on_bytes=None) -> str:
+        """返回对象的本地缓存路径，不存在时下载（同步，在线程中调用）"""
+        head = head or self.downloader.s3_client.head_object(Bucket=bucket, Key=key)
+        path = self.object_path(key, head.get("ETag", ""))
+        if self._touch(path):
+            self.hits += 1
+            metrics.count_cache("media", "hit")
+            if on_bytes:
+                on_bytes(head["ContentLength"])
+            return path
+
+        with self._single_flight(path):
+            # 等锁期间可能已被其他线程或 worker 下载完成
+            if self._touch(path):
+                self.hits += 1
+                metrics.count_cache("media", "hit")
+                if on_bytes:
+                    on_bytes(head["ContentLength"])
+                return path
+            self.misses += 1
+            metrics.count_cache("media", "miss")
+            self.downloader.download(bucket, key, path, on_bytes, head)
+
+        self._add_usage(path)
+        return path
+
+    def _add_usage(self, path: str):
+        """累计新下载对象的大小，超出预算时才扫描目录淘汰"""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._usage is not None:
+                self._usage += size
+                over_budget = self._usage > self.max_bytes
+            else:
+                over_budget = True
+        if over_budget:
+            self.evict()
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """存在则更新访问时间（用于 LRU），返回是否存在
+
+        只更新 atime：修改时间保持不变，任务目录中硬链接的 ETag 才不会因缓存命中而变化
+        """
+        try:
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def link_into(self, cached_path: str, target_path: str):
+        """在任务目录中创建指向缓存对象的链接"""
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        if os.path.lexists(target_path):
+            os.remove(target_path)
+        try:
+            os.link(cached_path, target_path)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(cached_path), target_path)
+            except OSError:
+                shutil.copyfile(cached_path, target_path)
+
+    def _entries(self):
+        """遍历缓存对象：(最近使用时间 atime, 大小, 路径)"""
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if filename.endswith((".part", ".json", ".lock", ".tmp")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_atime, st.st_size, path
+
+    def usage(self) -> int:
+        """缓存对象总大小（扫描目录）"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """超出预算时按最近使用时间淘汰，返回释放的缓存字节数
+
+        扫描缓存目录并同步累计的总大小；已有其他线程在淘汰时直接返回。
+        任务目录中的硬链接仍然引用被淘汰对象的数据，
+        这部分空间在任务目录被清理后才真正释放。
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return 0
+        try:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in entries:
+                if total - freed <= self.max_bytes:
+                    break
+                # 正在下载或读取的对象跳过
+                with self._lock:
+                    in_use = path in self._key_locks
+                if in_use:
+                    continue
+                try:
+                    os.remove(path)
+                    freed += size
+                except FileNotFoundError:
+                    continue
+            with self._lock:
+                self._usage = total - freed
+            return freed
+        finally:
+            self._evict_lock.release()
+
+    def sweep(self, downloads_dir: str = "downloads", part_ttl: float = 6 * 3600,
+              task_dir_ttl: Optional[float] = None) -> int:
+        """清理遗留文件，返回删除的文件/目录数
+
+        - 超过 part_ttl 未更新的 .part/.part.json/.lock 文件
+        - downloads/temp 下超过 part_ttl 的残留
+        - 设置 task_dir_ttl 时，删除超过该时间未更新的任务目录
+        """
+        now = time.time()
+        removed = 0
+        cache_root = os.path.abspath(self.root)
+
+        for dirpath, _, filenames in os.walk(downloads_dir):
+            for filename in filenames:
+                if not filename.endswith((".part", ".part.json", ".lock", ".tmp")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if now - os.path.getmtime(path) > part_ttl:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+
+        temp_dir = os.path.join(downloads_dir, "temp")
+        if os.path.isdir(temp_dir):
+            for name in os.listdir(temp_dir):
+                path = os.path.join(temp_dir, name)
+                try:
+                    if now - os.path.getmtime(path) > part_ttl:
+                        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+
+        if task_dir_ttl is not None and os.path.isdir(downloads_dir):
+            for name in os.listdir(downloads_dir):
+                path = os.path.join(downloads_dir, name)
+                if name == "temp" or os.path.abspath(path) == cache_root or not os.path.isdir(path):
+                    continue
+                try:
+                    if now - os.path.getmtime(path) > task_dir_ttl:
+                        shutil.rmtree(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def start_sweeper(self, interval: float = 600, **sweep_kwargs):
+        """启动后台清理线程（重复调用无效）"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep(**sweep_kwargs)
+                    self.evict()
+                except Exception as e:
+                    logger.warning("媒体缓存清理失败: %s", e)
+
+        self._sweeper = threading.Thread(target=run, name="media-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计和占用"""
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.usage(), "max_bytes": self.max_bytes}
+
+
+def create_media_cache(downloader: ResumableDownloader) -> Optional[MediaCache]:
+    """根据环境变量创建媒体缓存并启动后台清理，缓存目录不可写时返回 None
+
+    MEDIA_CACHE_DIR: 缓存目录
+    MEDIA_CACHE_MAX_GB: 缓存预算
+    MEDIA_CACHE_SWEEP_INTERVAL: 清理间隔（秒）
+    MEDIA_CACHE_PART_TTL: 临时文件保留秒数
+    MEDIA_CACHE_TASK_DIR_TTL: 任务目录保留秒数，不设置则不清理任务目录
+    """
+    try:
+        cache = MediaCache(
+            os.getenv("MEDIA_CACHE_DIR", os.path.join("downloads", ".cache")),
+            downloader,
+            max_bytes=int(float(os.getenv("MEDIA_CACHE_MAX_GB", 20)) * 1024 ** 3),
+        )
+    except OSError as e:
+        # 只读文件系统（如 Lambda 非 /tmp 目录）时不使用缓存，直接下载到任务目录
+        logger.warning("媒体缓存不可用，直接下载: %s", e)
+        return None
+    task_dir_ttl = os.getenv("MEDIA_CACHE_TASK_DIR_TTL")
+    cache.start_sweeper(
+        interval=float(os.getenv("MEDIA_CACHE_SWEEP_INTERVAL", 600)),
+        part_ttl=float(os.getenv("MEDIA_CACHE_PART_TTL", 6 * 3600)),
+        task_dir_ttl=float(task_dir_ttl) if task_dir_ttl else None,
+    )
+    return cache
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体索引
+按媒体 ID 保存 S3 key 和元数据，替代对 task_status 的线性扫描
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# 不进入索引的字段（每次生成都会变化，或只用于展示）
+_EXCLUDED_FIELDS = ("watch_url",)
+
+
+class MediaRegistry:
+    """媒体注册表
+
+    由 process_search_task 在任务完成时登记媒体，任务被清理时一并移除。
+    同一个媒体可能属于多个任务，只有最后一个所属任务被移除时才删除索引。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._media: Dict[str, Dict[str, Any]] = {}
+        self._owners: Dict[str, Set[str]] = {}
+        self._task_media: Dict[str, List[str]] = {}
+
+    def register_task(self, task_id: str, media_list: Iterable[dict]) -> int:
+        """登记任务的媒体列表，返回登记的媒体数量"""
+        media_ids = []
+        with self._lock:
+            for media in media_list:
+                media_id = media.get('id')
+                if media_id is None or 'key' not in media:
+                    continue
+                media_id = str(media_id)
+                self._media[media_id] = {
+                    k: v for k, v in media.items() if k not in _EXCLUDED_FIELDS
+                }
+                self._owners.setdefault(media_id, set()).add(task_id)
+                media_ids.append(media_id)
+            if media_ids:
+                self._task_media.setdefault(task_id, []).extend(media_ids)
+        return len(media_ids)
+
+    def get(self, media_id: str) -> Optional[Dict[str, Any]]:
+        """按媒体 ID 查找，O(1)"""
+        return self._media.get(str(media_id))
+
+    def evict_task(self, task_id: str) -> int:
+        """移除任务登记的媒体，返回实际删除的索引数量"""
+        removed = 0
+        with self._lock:
+            for media_id in self._task_media.pop(task_id, ()):
+                owners = self._owners.get(media_id)
+                if owners is None:
+                    continue
+                owners.discard(task_id)
+                if not owners:
+                    del self._owners[media_id]
+                    self._media.pop(media_id, None)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._media.clear()
+            self._owners.clear()
+            self._task_media.clear()
+
+    def __len__(self) -> int:
+        return len(self._media)
+
+    def __contains__(self, media_id) -> bool:
+        return str(media_id) in self._media
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus 指标
+搜索流程各阶段耗时（向量、匹配、预签名、下载、等待上游名额）、缓存命中、core API 调用结果、
+限流拒绝次数、S3 下载字节数，以及任务队列深度和执行中的任务数，由 /metrics 输出。
+
+gunicorn 多 worker 部署时设置 PROMETHEUS_MULTIPROC_DIR（gunicorn.conf.py 会自动设置），
+各 worker 把指标写入该目录下的文件，/metrics 汇总所有 worker 的数据。
+未安装 prometheus_client 时所有记录函数为空操作。
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+except ImportError:  # 可选依赖
+    prometheus_client = None
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+if prometheus_client is not None:
+    _STAGE_SECONDS = Histogram(
+        "film_media_stage_seconds", "搜索流程各阶段耗时", ["stage"], buckets=STAGE_BUCKETS
+    )
+    _CACHE_REQUESTS = Counter(
+        "film_media_cache_requests_total", "缓存查询次数", ["cache", "result"]
+    )
+    _CORE_API_REQUESTS = Counter(
+        "film_media_core_api_requests_total", "core API 请求结果", ["outcome"]
+    )
+    _REJECTED = Counter(
+        "film_media_rejected_total", "被限流或等待上游名额超时的请求数", ["reason"]
+    )
+    _S3_DOWNLOAD_BYTES = Counter("film_media_s3_download_bytes_total", "S3 下载字节数")
+    _S3_DOWNLOAD_SECONDS = Histogram(
+        "film_media_s3_download_seconds", "单个文件下载耗时（含缓存命中）", ["result"], buckets=STAGE_BUCKETS
+    )
+    _HTTP_SECONDS = Histogram(
+        "film_media_http_request_seconds", "HTTP 请求耗时", ["endpoint", "method", "status"], buckets=STAGE_BUCKETS
+    )
+    # 多进程下按 worker 求和（livesum：退出的 worker 不计入）
+    _TASKS_RUNNING = Gauge("film_media_tasks_running", "执行中的搜索任务数", multiprocess_mode="livesum")
+    _TASKS_QUEUED = Gauge("film_media_tasks_queued", "排队中的搜索任务数", multiprocess_mode="livesum")
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST if prometheus_client is not None else "text/plain"
+
+
+def enabled() -> bool:
+    return prometheus_client is not None
+
+
+def observe(stage: str, seconds: float):
+    """记录一个阶段的耗时"""
+    if prometheus_client is not None:
+        _STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """记录代码块耗时：with timed("embedding"): ...（异步代码中同样可用）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def count_cache(cache: str, result: str, amount: int = 1):
+    """缓存查询结果：result 为 hit / miss / joined 等"""
+    if prometheus_client is not None and amount:
+        _CACHE_REQUESTS.labels(cache, result).inc(amount)
+
+
+def count_core_api(outcome: str):
+    """core API 请求结果：success / error / retry / rejected"""
+    if prometheus_client is not None:
+        _CORE_API_REQUESTS.labels(outcome).inc()
+
+
+def count_rejected(reason: str):
+    """限流和准入拒绝：rate_limit / queue_full / upstream_<上游名>"""
+    if prometheus_client is not None:
+        _REJECTED.labels(reason).inc()
+
+
+def add_download_bytes(count: int):
+    if prometheus_client is not None:
+        _S3_DOWNLOAD_BYTES.inc(count)
+
+
+def observe_download(seconds: float, success: bool):
+    if prometheus_client is not None:
+        _S3_DOWNLOAD_SECONDS.labels("success" if success else "error").observe(seconds)
+
+
+def observe_http(endpoint: str, method: str, status: int, seconds: float):
+    if prometheus_client is not None:
+        _HTTP_SECONDS.labels(endpoint, method, str(status)).observe(seconds)
+
+
+def set_task_stats(stats: Dict[str, int]):
+    """更新本进程执行中和排队中的任务数（TaskExecutor.stats()）"""
+    if prometheus_client is not None:
+        _TASKS_RUNNING.set(stats.get("running", 0))
+        _TASKS_QUEUED.set(stats.get("queued", 0))
+
+
+def render() -> Tuple[bytes, str]:
+    """生成 /metrics 响应内容，多进程模式下汇总所有 worker"""
+    if prometheus_client is None:
+        return b"# prometheus_client is not installed\n", CONTENT_TYPE
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), CONTENT_TYPE
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预签名URL缓存
+同一对象在有效期内重复请求时复用已签名的URL，剩余有效期不足时重新签名
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import metrics
+
+
+class PresignedUrlCache:
+    """按 (bucket, key, disposition) 缓存预签名URL 的 LRU/TTL 缓存
+
+    expires_in: 签名有效期（秒）
+    min_remaining: 缓存的URL剩余有效期低于该值时重新签名，
+                   保证返回给客户端的URL至少还能用这么久
+    """
+
+    def __init__(self, maxsize: int = 10000, expires_in: int = 3600, min_remaining: int = 900):
+        if min_remaining >= expires_in:
+            raise ValueError("min_remaining 必须小于 expires_in")
+        self.maxsize = maxsize
+        self.expires_in = expires_in
+        self.min_remaining = min_remaining
+        self._lock = threading.Lock()
+        self._urls: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_url(self, s3_client, bucket: str, key: str, disposition: Optional[str] = None) -> str:
+        """获取预签名URL
+
+        disposition 为 None 时生成在线观看URL，
+        否则作为 ResponseContentDisposition（例如 attachment; filename="x.mp4"）
+        """
+        cache_key = (bucket, key, disposition)
+        now = time.time()
+        with self._lock:
+            entry = self._urls.get(cache_key)
+            if entry is not None and entry[1] - now > self.min_remaining:
+                self._urls.move_to_end(cache_key)
+                self.hits += 1
+                metrics.count_cache("presign", "hit")
+                return entry[0]
+            self.misses += 1
+        metrics.count_cache("presign", "miss")
+
+        params = {'Bucket': bucket, 'Key': key}
+        if disposition:
+            params['ResponseContentDisposition'] = disposition
+        url = s3_client.generate_presigned_url(
+            'get_object',
+            Params=params,
+            ExpiresIn=self.expires_in
+        )
+
+        with self._lock:
+            self._urls[cache_key] = (url, now + self.expires_in)
+            self._urls.move_to_end(cache_key)
+            while len(self._urls) > self.maxsize:
+                self._urls.popitem(last=False)
+        return url
+
+    def invalidate(self, bucket: str, key: str):
+        """删除某个对象的所有缓存URL（对象被覆盖或删除时调用）"""
+        with self._lock:
+            for cache_key in [k for k in self._urls if k[0] == bucket and k[1] == key]:
+                del self._urls[cache_key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._urls.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._urls),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+限流与上游并发预算
+- ClientRateLimiter: 按 API Key（X-API-Key）或客户端 IP 的令牌桶，超出时接口直接返回 429 和 Retry-After
+- UpstreamBudget: 每个上游（embeddings / match / s3）的全局并发名额，调用前获取、结束后归还，
+  名额用尽时等待，超过最长等待时间抛出 UpstreamBusyError
+令牌桶和名额保存在共享状态后端中，与任务存储一样支持三种后端：
+- memory: 进程内存（默认，每个 worker 各自计数）
+- sqlite: 本机共享的 SQLite/WAL 文件，适合单机多 worker
+- redis: Redis 协议后端，适合多机部署
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import metrics
+
+UPSTREAMS = ("embeddings", "match", "s3")
+
+
+class UpstreamBusyError(Exception):
+    """等待上游并发名额超时"""
+
+
+class RateLimitStore:
+    """令牌桶和并发名额的状态存储接口"""
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        """从令牌桶取 cost 个令牌，成功返回 0，否则返回令牌足够前需要等待的秒数（不扣令牌）"""
+        raise NotImplementedError
+
+    def acquire_lease(self, name: str, lease_id: str, limit: int, ttl: float) -> bool:
+        """占用一个并发名额，当前名额数已达 limit 时返回 False；ttl 秒后名额自动失效（防止 worker 崩溃后泄漏）"""
+        raise NotImplementedError
+
+    def release_lease(self, name: str, lease_id: str):
+        """归还并发名额"""
+        raise NotImplementedError
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, burst: float, cost: float):
+    """令牌桶补充和扣减，返回 (剩余令牌, 需要等待的秒数)"""
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """进程内存后端"""
+
+    # 最多保留的令牌桶数，超出时淘汰最久未使用的（被淘汰的客户端重新从满桶开始）
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._leases: Dict[str, Dict[str, float]] = {}
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens, wait = _refill(tokens, updated_at, now, rate, burst, cost)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def acquire_lease(self, name: str, lease_id: str, limit: int, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            leases = self._leases.setdefault(name, {})
+            for expired in [lid for lid, expires_at in leases.items() if expires_at < now]:
+                del leases[expired]
+            if len(leases) >= limit:
+                return False
+            leases[lease_id] = now + ttl
+            return True
+
+    def release_lease(self, name: str, lease_id: str):
+        with self._lock:
+            self._leases.get(name, {}).pop(lease_id, None)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """SQLite/WAL 后端，同一台机器上的多个 worker 共享一个文件"""
+
+    # 每写入多少次清理一次长时间未使用的令牌桶
+    PURGE_INTERVAL = 1024
+    IDLE_TTL = 3600
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT NOT NULL,
+                    lease_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (name, lease_id)
+                );
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _refill(row[0], row[1], now, rate, burst, cost) if row else _refill(
+                burst, now, now, rate, burst, cost
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - self.IDLE_TTL,))
+        return wait
+
+    def acquire_lease(self, name: str, lease_id: str, limit: int, ttl: float) -> bool:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE name = ? AND expires_at < ?", (name, now))
+            (count,) = conn.execute("SELECT COUNT(*) FROM leases WHERE name = ?", (name,)).fetchone()
+            if count >= limit:
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, lease_id, expires_at) VALUES (?, ?, ?)", (name, lease_id, now + ttl)
+            )
+            return True
+
+    def release_lease(self, name: str, lease_id: str):
+        self._conn().execute("DELETE FROM leases WHERE name = ? AND lease_id = ?", (name, lease_id))
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Redis 协议后端
+
+    令牌桶保存为哈希（tokens, updated_at），并发名额保存为有序集合（成员为名额 ID，分数为失效时间），
+    读改写通过 WATCH/MULTI 乐观事务保证原子，时间取 Redis 服务器时间，多台机器之间不受时钟偏差影响。
+    client 只需实现 transaction/time/hmget/hset/expire/zadd/zcard/zrem/zremrangebyscore，可用本地 fake 替代。
+    """
+
+    def __init__(self, client, prefix: str = "film-media:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisRateLimitStore":
+        """根据连接地址创建，需要安装 redis"""
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    @staticmethod
+    def _now(pipe) -> float:
+        seconds, microseconds = pipe.time()
+        return seconds + microseconds / 1e6
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        bucket_key = f"{self.prefix}bucket:{key}"
+        # 桶从空到满所需时间之后桶已满，可以直接过期
+        idle_ttl = max(1, int(burst / rate) + 1)
+
+        def update(pipe) -> float:
+            now = self._now(pipe)
+            tokens, updated_at = pipe.hmget(bucket_key, "tokens", "updated_at")
+            if tokens is None or updated_at is None:
+                tokens, updated_at = burst, now
+            tokens, wait = _refill(float(tokens), float(updated_at), now, rate, burst, cost)
+            pipe.multi()
+            pipe.hset(bucket_key, mapping={"tokens": tokens, "updated_at": now})
+            pipe.expire(bucket_key, idle_ttl)
+            return wait
+
+        return self.client.transaction(update, bucket_key, value_from_callable=True)
+
+    def acquire_lease(self, name: str, lease_id: str, limit: int, ttl: float) -> bool:
+        lease_key = f"{self.prefix}leases:{name}"
+
+        def update(pipe) -> bool:
+            now = self._now(pipe)
+            pipe.zremrangebyscore(lease_key, 0, now)
+            if pipe.zcard(lease_key) >= limit:
+                return False
+            pipe.multi()
+            pipe.zadd(lease_key, {lease_id: now + ttl})
+            pipe.expire(lease_key, max(1, int(ttl) + 1))
+            return True
+
+        return self.client.transaction(update, lease_key, value_from_callable=True)
+
+    def release_lease(self, name: str, lease_id: str):
+        self.client.zrem(f"{self.prefix}leases:{name}", lease_id)
+
+
+class ClientRateLimiter:
+    """按客户端的令牌桶限流
+
+    rate: 每秒补充的令牌数（每次搜索消耗 1 个，批量搜索按条数消耗，最多一整桶），0 表示不限流
+    burst: 桶容量，即允许的突发请求数
+    trusted_proxies: 服务前面的可信代理层数，大于 0 时从 X-Forwarded-For 取客户端 IP
+    """
+
+    def __init__(self, store: RateLimitStore, rate: float = 0, burst: float = 20, trusted_proxies: int = 0):
+        self.store = store
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.trusted_proxies = trusted_proxies
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def client_key(self, api_key: Optional[str], remote_addr: Optional[str],
+                   forwarded_for: Optional[str] = None) -> str:
+        """客户端标识：有 API Key 时用其哈希（不保存原文），否则用客户端 IP"""
+        if api_key:
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+        if self.trusted_proxies and forwarded_for:
+            hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+            # 最右侧的 trusted_proxies 个地址由可信代理追加，再往左一个是客户端
+            if hops:
+                return "ip:" + hops[max(0, len(hops) - self.trusted_proxies)]
+        return f"ip:{remote_addr or 'unknown'}"
+
+    def check(self, client: str, cost: float = 1) -> float:
+        """扣除客户端令牌，允许时返回 0，否则返回建议的重试等待秒数"""
+        if not self.enabled:
+            return 0.0
+        wait = self.store.take(f"client:{client}", self.rate, self.burst, min(float(cost), self.burst))
+        if wait:
+            metrics.count_rejected("rate_limit")
+        return wait
+
+
+class UpstreamBudget:
+    """各上游的全局并发名额
+
+    limits: 上游名称 -> 最大并发数，未配置或为 0 的上游不限制
+    max_wait: 等待名额的最长秒数
+    lease_ttl: 名额最长持有时间，超过后视为泄漏自动回收，应大于单次调用的最长耗时
+    """
+
+    def __init__(self, store: RateLimitStore, limits: Dict[str, int], max_wait: float = 10,
+                 lease_ttl: float = 600):
+        self.store = store
+        self.limits = {name: limit for name, limit in limits.items() if limit > 0}
+        self.max_wait = max_wait
+        self.lease_ttl = lease_ttl
+        # 共享后端（SQLite/Redis）的调用会阻塞，异步等待时放到线程池
+        self._blocking = not isinstance(store, MemoryRateLimitStore)
+
+    def _try_acquire(self, name: str, lease_id: str) -> bool:
+        return self.store.acquire_lease(name, lease_id, self.limits[name], self.lease_ttl)
+
+    @staticmethod
+    def _backoff(delay: float) -> float:
+        """轮询间隔从 5ms 翻倍到 100ms，加抖动避免多个等待方同时重试"""
+        return min(0.1, delay * 2) * random.uniform(0.5, 1.0) if delay else 0.005
+
+    def acquire(self, name: str) -> Optional[str]:
+        """同步获取名额（在线程中调用），返回名额 ID；不限制的上游返回 None"""
+        if name not in self.limits:
+            return None
+        lease_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        delay = 0.0
+        while not self._try_acquire(name, lease_id):
+            if time.perf_counter() - start >= self.max_wait:
+                metrics.count_rejected(f"upstream_{name}")
+                raise UpstreamBusyError(f"上游 {name} 繁忙，等待并发名额超时")
+            delay = self._backoff(delay)
+            time.sleep(delay)
+        metrics.observe(f"wait_{name}", time.perf_counter() - start)
+        return lease_id
+
+    async def acquire_async(self, name: str) -> Optional[str]:
+        """异步获取名额，等待期间不阻塞事件循环"""
+        if name not in self.limits:
+            return None
+        lease_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        delay = 0.0
+        while True:
+            if self._blocking:
+                acquired = await asyncio.to_thread(self._try_acquire, name, lease_id)
+            else:
+                acquired = self._try_acquire(name, lease_id)
+            if acquired:
+                break
+            if time.perf_counter() - start >= self.max_wait:
+                metrics.count_rejected(f"upstream_{name}")
+                raise UpstreamBusyError(f"上游 {name} 繁忙，等待并发名额超时")
+            delay = self._backoff(delay)
+            await asyncio.sleep(delay)
+        metrics.observe(f"wait_{name}", time.perf_counter() - start)
+        return lease_id
+
+    def release(self, name: str, lease_id: Optional[str]):
+        if lease_id is not None:
+            self.store.release_lease(name, lease_id)
+
+    @contextmanager
+    def hold(self, name: str) -> Iterator[None]:
+        """同步占用名额：with budget.hold("s3"): ..."""
+        lease_id = self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name, lease_id)
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        """异步占用名额：async with budget.slot("match"): ..."""
+        lease_id = await self.acquire_async(name)
+        try:
+            yield
+        finally:
+            if self._blocking and lease_id is not None:
+                await asyncio.to_thread(self.release, name, lease_id)
+            else:
+                self.release(name, lease_id)
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """根据环境变量创建限流状态存储
+
+    RATE_LIMIT_BACKEND: memory / sqlite / redis
+    RATE_LIMIT_URL: sqlite 文件路径或 redis 连接地址
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteRateLimitStore(os.getenv("RATE_LIMIT_URL", os.path.join("downloads", "rate_limit.sqlite3")))
+    if backend == "redis":
+        return RedisRateLimitStore.from_url(os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        raise ValueError(f"不支持的限流存储后端: {backend}")
+    return MemoryRateLimitStore()
+
+
+def create_client_rate_limiter(store: RateLimitStore) -> ClientRateLimiter:
+    """根据环境变量创建客户端限流器
+
+    RATE_LIMIT_RATE: 每个客户端每秒补充的令牌数，0（默认）表示不限流
+    RATE_LIMIT_BURST: 令牌桶容量
+    RATE_LIMIT_TRUSTED_PROXIES: 可信代理层数，从 X-Forwarded-For 取客户端 IP
+
+    默认不开启：服务在反向代理或负载均衡之后且未设置 RATE_LIMIT_TRUSTED_PROXIES 时，
+    所有请求的 IP 都是代理的地址，会共用同一个令牌桶
+    """
+    return ClientRateLimiter(
+        store,
+        rate=float(os.getenv("RATE_LIMIT_RATE", 0)),
+        burst=float(os.getenv("RATE_LIMIT_BURST", 20)),
+        trusted_proxies=int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 0)),
+    )
+
+
+def create_upstream_budget(store: RateLimitStore) -> UpstreamBudget:
+    """根据环境变量创建上游并发预算
+
+    UPSTREAM_EMBEDDINGS_CONCURRENCY / UPSTREAM_MATCH_CONCURRENCY / UPSTREAM_S3_CONCURRENCY:
+        各上游的全局并发上限，0 表示不限制
+    UPSTREAM_MAX_WAIT: 等待名额的最长秒数
+    UPSTREAM_LEASE_TTL: 名额最长持有秒数
+    """
+    defaults = {"embeddings": 16, "match": 32, "s3": 32}
+    return UpstreamBudget(
+        store,
+        {name: int(os.getenv(f"UPSTREAM_{name.upper()}_CONCURRENCY", defaults[name])) for name in UPSTREAMS},
+        max_wait=float(os.getenv("UPSTREAM_MAX_WAIT", 10)),
+        lease_ttl=float(os.getenv("UPSTREAM_LEASE_TTL", 600)),
+    )
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+S3 客户端池
+按区域和端点配置缓存 boto3 客户端，进程内共享，避免每次请求重新加载服务模型和解析凭证
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_REGION = "ap-east-1"
+DEFAULT_BUCKET = "one2x-share"
+
+_clients: Dict[Tuple, Any] = {}
+_lock = threading.Lock()
+
+
+def get_bucket_name() -> str:
+    """当前配置的存储桶"""
+    return os.environ.get('AWS_BUCKET', DEFAULT_BUCKET)
+
+
+def _client_config(addressing_style: Optional[str]):
+    """连接池和重试配置，可通过环境变量调整"""
+    from botocore.config import Config
+
+    options = {
+        "max_pool_connections": int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50)),
+        "tcp_keepalive": True,
+        "connect_timeout": float(os.getenv("S3_CONNECT_TIMEOUT", 5)),
+        "read_timeout": float(os.getenv("S3_READ_TIMEOUT", 60)),
+        "retries": {"max_attempts": int(os.getenv("S3_MAX_ATTEMPTS", 3)), "mode": "standard"},
+    }
+    if addressing_style:
+        options["s3"] = {"addressing_style": addressing_style}
+    return Config(**options)
+
+
+def get_s3_client(region: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """获取共享的 S3 客户端（线程安全）
+
+    boto3 客户端本身是线程安全的，可以在请求和线程之间复用；
+    但创建过程会用到非线程安全的 Session，因此创建时加锁。
+    """
+    region = region or os.environ.get('AWS_REGION', DEFAULT_REGION)
+    endpoint_url = endpoint_url or os.environ.get('S3_ENDPOINT_URL')
+    addressing_style = None
+    if endpoint_url is None and region == 'ap-east-1':
+        # ap-east-1需要特殊配置
+        endpoint_url = f'https://s3.{region}.amazonaws.com'
+        addressing_style = 'virtual'
+
+    access_key = os.environ.get('AWS_ACCESS_KEY_ID')
+    secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    cache_key = (region, endpoint_url, addressing_style, access_key, secret_key)
+
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            # boto3 导入较慢，首次创建客户端时才导入（缩短冷启动）
+            import boto3
+
+            session = boto3.session.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region,
+            )
+            client = session.client(
+                's3',
+                endpoint_url=endpoint_url,
+                config=_client_config(addressing_style),
+            )
+            _clients[cache_key] = client
+    return client
+
+
+def clear_s3_clients():
+    """清空客户端缓存（凭证轮换或测试时使用）"""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+S3 可续传下载
+- 先写入 <目标>.part，完成后原子重命名为目标文件
+- 小文件用一次 Range GET 流式下载，中断后从 .part 已有长度继续
+- 大文件按分片并发 Range GET 写入对应偏移，已完成的分片记录在 <目标>.part.json，
+  中断后只补下缺失的分片
+- 对象 ETag 变化时丢弃旧的 .part，重新下载
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import metrics
+
+MB = 1024 * 1024
+
+# 进度回调：本次新写入的字节数
+BytesCallback = Callable[[int], None]
+
+
+class TransferSettings:
+    """下载参数，可通过环境变量调整"""
+
+    def __init__(self, multipart_threshold: int = 64 * MB, chunk_size: int = 16 * MB,
+                 per_file_concurrency: int = 8, io_chunk_size: int = 1 * MB):
+        self.multipart_threshold = multipart_threshold
+        self.chunk_size = chunk_size
+        self.per_file_concurrency = per_file_concurrency
+        self.io_chunk_size = io_chunk_size
+
+    @classmethod
+    def from_env(cls) -> "TransferSettings":
+        """S3_MULTIPART_THRESHOLD_MB / S3_MULTIPART_CHUNKSIZE_MB / S3_PER_FILE_CONCURRENCY"""
+        return cls(
+            multipart_threshold=int(float(os.getenv("S3_MULTIPART_THRESHOLD_MB", 64)) * MB),
+            chunk_size=int(float(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", 16)) * MB),
+            per_file_concurrency=int(os.getenv("S3_PER_FILE_CONCURRENCY", 8)),
+        )
+
+
+class ResumableDownloader:
+    """基于 Range GET 的可续传下载器（同步，线程安全，可在线程池中并发调用）"""
+
+    def __init__(self, s3_client, settings: Optional[TransferSettings] = None):
+        self.s3_client = s3_client
+        self.settings = settings or TransferSettings.from_env()
+
+    def download(self, bucket: str, key: str, local_path: str,
+                 on_bytes: Optional[BytesCallback] = None, head: Optional[dict] = None) -> int:
+        """下载对象到 local_path，返回对象大小；失败时抛出异常，已下载部分保留以便续传"""
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        head = head or self.s3_client.head_object(Bucket=bucket, Key=key)
+        size = head["ContentLength"]
+        etag = head.get("ETag", "")
+        part_path = local_path + ".part"
+        state_path = part_path + ".json"
+
+        state = self._load_state(state_path)
+        if state.get("etag") != etag or state.get("size") != size:
+            # 没有记录或对象已变化，从头开始
+            for path in (part_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            state = {"etag": etag, "size": size, "chunk_size": self.settings.chunk_size, "done": []}
+            self._save_state(state_path, state)
+
+        if on_bytes:
+            # 续传时先计入已下载的部分
+            resumed = self._resumed_bytes(part_path, state)
+            if resumed:
+                on_bytes(resumed)
+
+        if size > self.settings.multipart_threshold:
+            self._download_chunks(bucket, key, part_path, state_path, state, on_bytes)
+        else:
+            self._download_stream(bucket, key, part_path, size, etag, on_bytes)
+
+        os.replace(part_path, local_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return size
+
+    def _download_stream(self, bucket: str, key: str, part_path: str, size: int, etag: str,
+                         on_bytes: Optional[BytesCallback]):
+        """单次流式下载，从 .part 已有长度续传"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > size:
+            offset = 0
+            os.remove(part_path)
+        if offset == size and size > 0:
+            return
+        params = {"Bucket": bucket, "Key": key}
+        if etag:
+            params["IfMatch"] = etag
+        if offset:
+            params["Range"] = f"bytes={offset}-"
+        body = self.s3_client.get_object(**params)["Body"]
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in body.iter_chunks(self.settings.io_chunk_size):
+                f.write(chunk)
+                metrics.add_download_bytes(len(chunk))
+                if on_bytes:
+                    on_bytes(len(chunk))
+
+    def _download_chunks(self, bucket: str, key: str, part_path: str, state_path: str, state: dict,
+                         on_bytes: Optional[BytesCallback]):
+        """分片并发下载，只补下缺失的分片"""
+        size = state["size"]
+        chunk_size = state["chunk_size"]
+        chunk_count = (size + chunk_size - 1) // chunk_size
+        done = set(state["done"])
+        missing = [i for i in range(chunk_count) if i not in done]
+        if not missing:
+            return
+
+        # 预分配文件，各分片写入各自的偏移
+        with open(part_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+
+        lock = threading.Lock()
+
+        def fetch(index: int):
+            start = index * chunk_size
+            end = min(size, start + chunk_size) - 1
+            body = self.s3_client.get_object(
+                Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=state["etag"]
+            )["Body"]
+            with open(part_path, "r+b") as f:
+                f.seek(start)
+                for chunk in body.iter_chunks(self.settings.io_chunk_size):
+                    f.write(chunk)
+                    metrics.add_download_bytes(len(chunk))
+                    if on_bytes:
+                        on_bytes(len(chunk))
+            with lock:
+                state["done"].append(index)
+                self._save_state(state_path, state)
+
+        workers = max(1, min(self.settings.per_file_concurrency, len(missing)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-chunk") as pool:
+            # 任一分片失败时抛出，已完成的分片已记录
+            for future in [pool.submit(fetch, i) for i in missing]:
+                future.result()
+
+    def _resumed_bytes(self, part_path: str, state: dict) -> int:
+        """已经下载完成的字节数"""
+        size = state["size"]
+        if size > self.settings.multipart_threshold:
+            chunk_size = state["chunk_size"]
+            return sum(min(chunk_size, size - i * chunk_size) for i in set(state["done"]))
+        if os.path.exists(part_path):
+            return min(os.path.getsize(part_path), size)
+        return 0
+
+    @staticmethod
+    def _load_state(state_path: str) -> dict:
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_state(state_path: str, state: dict):
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
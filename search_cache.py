@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索结果缓存
+按 (规范化文本, 匹配阈值) 缓存匹配结果，在有效期内：
+- 请求条数不超过已缓存条数时直接截取（例如 count=5 使用缓存的 count=20 结果）
+- 缓存结果少于当时请求的条数，说明已是该阈值下的全部结果，任意条数都可直接返回
+- 相同的搜索正在执行时，后到的请求等待同一次计算，不重复调用向量和匹配接口
+返回的是副本，调用方可以直接修改（例如添加 watch_url）
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from embedding_cache import normalize_text
+
+
+class _Entry:
+    __slots__ = ("count", "media_list", "expires_at")
+
+    def __init__(self, count: int, media_list: List[dict], expires_at: float):
+        self.count = count
+        self.media_list = media_list
+        self.expires_at = expires_at
+
+    def covers(self, count: int) -> bool:
+        return count <= self.count or len(self.media_list) < self.count
+
+
+def _copy_result(media_list: List[dict], count: int) -> Dict[str, Any]:
+    return {"success": True, "media_list": [dict(media) for media in media_list[:count]]}
+
+
+class SearchResultCache:
+    """带 TTL 的 LRU 搜索结果缓存，支持子集命中和同请求合并
+
+    maxsize: 最多缓存的 (文本, 阈值) 组合数
+    ttl: 结果有效期（秒），为 0 时不缓存，只合并进行中的相同请求
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, float], _Entry]" = OrderedDict()
+        # 进行中的计算：(文本, 阈值) -> [(条数, Future)]
+        self._inflight: Dict[Tuple[str, float], List[Tuple[int, asyncio.Future]]] = {}
+        # 每次失效加一，失效前开始的计算结果不再写入缓存
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    @staticmethod
+    def _key(text: str, match_threshold: float) -> Tuple[str, float]:
+        return normalize_text(text), float(match_threshold)
+
+    def get(self, text: str, match_threshold: float, match_count: int) -> Optional[Dict[str, Any]]:
+        """查找缓存结果，未命中返回 None"""
+        key = self._key(text, match_threshold)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None or not entry.covers(match_count):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        metrics.count_cache("search", "hit")
+        return _copy_result(entry.media_list, match_count)
+
+    def set(self, text: str, match_threshold: float, match_count: int, result: Dict[str, Any]):
+        """写入成功的匹配结果（错误结果不缓存）"""
+        if self.ttl <= 0 or "error" in result:
+            return
+        key = self._key(text, match_threshold)
+        media_list = [dict(media) for media in result.get("media_list") or []]
+        now = time.time()
+        with self._lock:
+            current = self._entries.get(key)
+            # 已有未过期且能覆盖该条数的结果时保留
+            if current is not None and current.expires_at > now and current.covers(match_count):
+                return
+            self._entries[key] = _Entry(match_count, media_list, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def get_or_compute(self, text: str, match_threshold: float, match_count: int,
+                             compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """命中缓存直接返回；否则加入进行中的相同搜索，或执行 compute 并缓存结果"""
+        cached = self.get(text, match_threshold, match_count)
+        if cached is not None:
+            return cached
+
+        key = self._key(text, match_threshold)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for count, future in self._inflight.get(key, []):
+                if count >= match_count and future.get_loop() is loop:
+                    self.joined += 1
+                    metrics.count_cache("search", "joined")
+                    break
+            else:
+                future = None
+                self.misses += 1
+                metrics.count_cache("search", "miss")
+                own = loop.create_future()
+                self._inflight.setdefault(key, []).append((match_count, own))
+                generation = self._generation
+
+        if future is not None:
+            result = await asyncio.shield(future)
+            if "error" in result:
+                return dict(result)
+            return _copy_result(result["media_list"], match_count)
+
+        try:
+            result = await compute()
+        except BaseException as e:
+            own.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            own.exception()
+            raise
+        else:
+            own.set_result(result)
+            if generation == self._generation:
+                self.set(text, match_threshold, match_count, result)
+        finally:
+            with self._lock:
+                waiting = self._inflight.get(key, [])
+                waiting[:] = [pair for pair in waiting if pair[1] is not own]
+                if not waiting:
+                    self._inflight.pop(key, None)
+        if "error" in result:
+            return result
+        return _copy_result(result.get("media_list") or [], match_count)
+
+    def invalidate(self, text: str, match_threshold: Optional[float] = None):
+        """删除某个文本的缓存结果，不指定阈值时删除所有阈值；进行中的计算结果不再写入缓存"""
+        normalized = normalize_text(text)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in set(self._entries) | set(self._inflight) if k[0] == normalized]:
+                if match_threshold is None or key[1] == float(match_threshold):
+                    self._entries.pop(key, None)
+                    self._inflight.pop(key, None)
+
+    def clear(self):
+        """清空缓存（媒体库或索引更新后调用）
+
+        之后的请求不再加入失效前开始的计算，这些计算的结果也不写入缓存
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses + self.joined
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "hit_ratio": (self.hits + self.joined) / total if total else 0.0,
+        }
+
+
+def create_search_cache() -> SearchResultCache:
+    """根据环境变量创建搜索结果缓存
+
+    SEARCH_CACHE_SIZE: 最多缓存的 (文本, 阈值) 组合数
+    SEARCH_CACHE_TTL: 结果有效期（秒），0 表示不缓存
+    """
+    return SearchResultCache(
+        maxsize=int(os.getenv("SEARCH_CACHE_SIZE", 2048)),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", 300)),
+    )
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务状态变更通知
+update_task_status 写入后发布通知，状态推送（SSE）接口订阅对应任务并阻塞等待，
+不需要轮询任务存储；ASGI 模式下用 wait_async 在事件循环中等待，不占用线程
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class _Channel:
+    """单个任务的通知通道"""
+
+    __slots__ = ("condition", "version", "subscribers", "waiters")
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.subscribers = 0
+        # 异步等待者 (事件循环, asyncio.Event)
+        self.waiters = set()
+
+
+class Subscription:
+    """任务订阅，记录已看到的版本号，避免漏掉两次读取之间的变更"""
+
+    def __init__(self, channel: _Channel):
+        self._channel = channel
+        self._seen = channel.version
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待下一次变更，有变更返回 True，超时返回 False"""
+        channel = self._channel
+        with channel.condition:
+            changed = channel.condition.wait_for(lambda: channel.version != self._seen, timeout)
+            self._seen = channel.version
+        return changed
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """wait 的异步版本"""
+        channel = self._channel
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with channel.condition:
+            if channel.version == self._seen:
+                channel.waiters.add(waiter)
+            else:
+                waiter[1].set()
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with channel.condition:
+                channel.waiters.discard(waiter)
+                changed = channel.version != self._seen
+                self._seen = channel.version
+        return changed
+
+
+class TaskEventBus:
+    """进程内的任务变更通知
+
+    只有存在订阅者的任务才会分配通道，发布时只唤醒该任务的订阅者。
+    跨进程的变更（共享的 SQLite/Redis 任务存储）无法在这里收到通知，
+    订阅方需要设置等待超时并重新读取存储。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels: Dict[str, _Channel] = {}
+
+    def publish(self, task_id: str):
+        """通知任务状态已变更"""
+        channel = self._channels.get(task_id)
+        if channel is None:
+            return
+        with channel.condition:
+            channel.version += 1
+            channel.condition.notify_all()
+            for loop, event in channel.waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    @contextmanager
+    def subscribe(self, task_id: str) -> Iterator[Subscription]:
+        """订阅任务变更，退出时释放通道"""
+        with self._lock:
+            channel = self._channels.get(task_id)
+            if channel is None:
+                channel = self._channels[task_id] = _Channel()
+            channel.subscribers += 1
+        try:
+            yield Subscription(channel)
+        finally:
+            with self._lock:
+                channel.subscribers -= 1
+                if channel.subscribers == 0:
+                    self._channels.pop(task_id, None)
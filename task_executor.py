@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务执行器
+一个常驻的后台事件循环线程执行所有搜索任务，取代每个请求新建线程并调用 asyncio.run：
+- 事件循环长期存在，aiohttp/httpx 连接池可以跨请求复用
+- 同时执行的任务数受 max_concurrency 限制，排队任务数受 max_queue 限制
+- 排队的任务按客户端轮流放行（公平排队），单个客户端的大量请求不会挡住其他客户端；
+  每个客户端排队和执行中的任务数受 max_per_client 限制
+- 队列满时 submit 抛出 QueueFullError，由接口返回 429
+- ASGI 模式下用 attach 改为在服务器自己的事件循环上执行，不再启动后台线程
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+
+class TaskExecutor:
+    """有界的后台协程执行器"""
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 1000, blocking_workers: int = 32,
+                 max_per_client: int = 0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.blocking_workers = blocking_workers
+        # 单个客户端排队和执行中的任务数上限，0 表示不限制
+        self.max_per_client = max_per_client
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._pending = 0
+        self._running = 0
+        self._attached = False
+        self._client_pending: Dict[str, int] = {}
+        # 以下只在事件循环线程中访问：空闲名额、各客户端的等待队列、轮到放行的客户端顺序
+        self._free = max_concurrency
+        self._waiting: Dict[str, Deque[asyncio.Future]] = {}
+        self._turns: Deque[str] = deque()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环（首次使用时启动）"""
+        self._ensure_started()
+        return self._loop
+
+    def _ensure_started(self):
+        # gunicorn 预加载后 fork 出的 worker 不会继承线程，需要在当前进程重新启动
+        if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            ready = threading.Event()
+            loop = asyncio.new_event_loop()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.set_default_executor(
+                    concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.blocking_workers, thread_name_prefix="task-blocking"
+                    )
+                )
+                ready.set()
+                loop.run_forever()
+
+            thread = threading.Thread(target=run, name="task-executor", daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            self._reset()
+
+    def attach(self):
+        """改为在当前运行中的事件循环上执行任务（ASGI 服务启动时调用）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not None and not self._attached:
+                raise RuntimeError("后台事件循环已启动，不能再切换到服务器事件循环")
+            loop.set_default_executor(
+                concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.blocking_workers, thread_name_prefix="task-blocking"
+                )
+            )
+            self._loop = loop
+            self._thread = threading.current_thread()
+            self._pid = os.getpid()
+            self._attached = True
+            self._reset()
+
+    def _reset(self):
+        """新的事件循环上重新计数"""
+        self._pending = 0
+        self._running = 0
+        self._client_pending = {}
+        self._free = self.max_concurrency
+        self._waiting = {}
+        self._turns = deque()
+
+    def submit(self, coro_fn: Callable[..., Awaitable[Any]], *args, client: str = "",
+               **kwargs) -> concurrent.futures.Future:
+        """提交协程函数，返回 concurrent.futures.Future
+
+        client: 客户端标识，排队时按客户端轮流放行
+        总队列或该客户端的配额已满时抛出 QueueFullError
+        """
+        self._ensure_started()
+        with self._lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                raise QueueFullError("任务队列已满")
+            if self.max_per_client and self._client_pending.get(client, 0) >= self.max_per_client:
+                raise QueueFullError("该客户端的排队任务过多")
+            self._pending += 1
+            self._client_pending[client] = self._client_pending.get(client, 0) + 1
+        try:
+            return asyncio.run_coroutine_threadsafe(self._run(coro_fn, client, args, kwargs), self._loop)
+        except Exception:
+            self._finish(client)
+            raise
+
+    def _finish(self, client: str):
+        with self._lock:
+            self._pending -= 1
+            remaining = self._client_pending.get(client, 0) - 1
+            if remaining > 0:
+                self._client_pending[client] = remaining
+            else:
+                self._client_pending.pop(client, None)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """在后台事件循环上同步执行一个协程（不占用任务配额）；不能在该事件循环线程中调用"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _run(self, coro_fn, client, args, kwargs):
+        try:
+            await self._acquire(client)
+            self._running += 1
+            try:
+                return await coro_fn(*args, **kwargs)
+            finally:
+                self._running -= 1
+                self._release()
+        finally:
+            self._finish(client)
+
+    async def _acquire(self, client: str):
+        """获取执行名额：有空闲且无人排队时直接执行，否则进入该客户端的等待队列"""
+        if self._free > 0 and not self._turns:
+            self._free -= 1
+            return
+        future = self._loop.create_future()
+        queue = self._waiting.get(client)
+        if queue is None:
+            queue = self._waiting[client] = deque()
+            self._turns.append(client)
+        queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分到名额后被取消，转交给下一个
+                self._release()
+            elif future in queue:
+                queue.remove(future)
+                if not queue:
+                    del self._waiting[client]
+                    self._turns.remove(client)
+            raise
+
+    def _release(self):
+        """归还名额：轮到的客户端放行一个任务，该客户端还有排队任务时排到队尾"""
+        while self._turns:
+            client = self._turns.popleft()
+            queue = self._waiting[client]
+            future = queue.popleft()
+            if queue:
+                self._turns.append(client)
+            else:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    def stats(self) -> Dict[str, int]:
+        """运行中和排队中的任务数"""
+        running = self._running
+        return {
+            "running": running,
+            "queued": max(0, self._pending - running),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "clients_waiting": len(self._waiting),
+        }
+
+    def shutdown(self, timeout: float = 5):
+        """停止后台事件循环（服务器的事件循环由服务器自己停止）"""
+        with self._lock:
+            loop, thread, attached = self._loop, self._thread, self._attached
+            self._loop = None
+            self._thread = None
+            self._attached = False
+        if loop is not None and not attached:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+
+
+def create_task_executor() -> TaskExecutor:
+    """根据环境变量创建任务执行器
+
+    SEARCH_MAX_CONCURRENCY: 同时执行的搜索任务数
+    SEARCH_MAX_QUEUE: 排队等待的最大任务数，超过后返回 429
+    SEARCH_BLOCKING_WORKERS: 执行同步调用（S3、core API）的线程数
+    SEARCH_MAX_PER_CLIENT: 单个客户端排队和执行中的任务数上限，0（默认）表示不限制；
+        客户端按 API Key 或 IP 区分，反向代理之后需同时设置 RATE_LIMIT_TRUSTED_PROXIES
+    """
+    return TaskExecutor(
+        max_concurrency=int(os.getenv("SEARCH_MAX_CONCURRENCY", 32)),
+        max_queue=int(os.getenv("SEARCH_MAX_QUEUE", 1000)),
+        blocking_workers=int(os.getenv("SEARCH_BLOCKING_WORKERS", 32)),
+        max_per_client=int(os.getenv("SEARCH_MAX_PER_CLIENT", 0)),
+    )
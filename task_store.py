@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务状态存储
+提供容量上限、TTL 过期清理和媒体索引，支持三种后端：
+- memory: 进程内存（默认）
+- sqlite: 本机共享的 SQLite/WAL 文件，适合单机多 worker
+- redis: Redis 协议后端，适合多机部署
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from media_registry import MediaRegistry
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 6 * 3600
+
+# 状态字符串驻留，避免每条记录各持有一份
+_STATUSES = {s: s for s in ("pending", "processing", "completed", "error")}
+
+
+def _pack(record: Dict[str, Any]) -> tuple:
+    """将任务记录压缩为元组"""
+    status = record.get("status")
+    return (
+        _STATUSES.get(status, status),
+        record.get("progress", 0),
+        record.get("message", ""),
+        record.get("data"),
+        record.get("created_at"),
+    )
+
+
+def _unpack(packed: tuple) -> Dict[str, Any]:
+    """将元组还原为接口返回的任务记录"""
+    status, progress, message, data, created_at = packed
+    return {
+        "status": status,
+        "progress": progress,
+        "message": message,
+        "data": data,
+        "created_at": created_at,
+    }
+
+
+class TaskStore:
+    """任务状态存储接口"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录，不存在或已过期返回 None"""
+        raise NotImplementedError
+
+    def set(self, task_id: str, record: Dict[str, Any]):
+        """写入任务记录"""
+        raise NotImplementedError
+
+    def delete(self, task_id: str):
+        """删除任务记录及其媒体索引"""
+        raise NotImplementedError
+
+    def register_media(self, task_id: str, media_list: Iterable[dict]):
+        """登记任务的媒体，随任务一起过期"""
+        raise NotImplementedError
+
+    def get_media(self, media_id: str) -> Optional[Dict[str, Any]]:
+        """按媒体 ID 查找媒体信息"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """进程内存后端，按最近更新时间做 LRU + TTL 清理"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL):
+        super().__init__(max_size, ttl)
+        self._lock = threading.Lock()
+        # task_id -> (更新时间, 压缩记录)
+        self._tasks: "OrderedDict[str, tuple]" = OrderedDict()
+        self._media = MediaRegistry()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            self.delete(task_id)
+            return None
+        return _unpack(entry[1])
+
+    def set(self, task_id: str, record: Dict[str, Any]):
+        with self._lock:
+            self._tasks[task_id] = (time.time(), _pack(record))
+            self._tasks.move_to_end(task_id)
+        self._evict()
+
+    def _evict(self):
+        """淘汰超出容量或已过期的任务及其媒体索引"""
+        now = time.time()
+        evicted = []
+        with self._lock:
+            # 按更新时间有序，只需从头部清理
+            while self._tasks:
+                oldest_id, (updated_at, _) = next(iter(self._tasks.items()))
+                if len(self._tasks) <= self.max_size and now - updated_at <= self.ttl:
+                    break
+                del self._tasks[oldest_id]
+                evicted.append(oldest_id)
+        for evicted_id in evicted:
+            self._media.evict_task(evicted_id)
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+        self._media.evict_task(task_id)
+
+    def register_media(self, task_id: str, media_list: Iterable[dict]):
+        self._media.register_task(task_id, media_list)
+
+    def get_media(self, media_id: str) -> Optional[Dict[str, Any]]:
+        # 先清理已过期的任务，不返回过期任务登记的媒体
+        self._evict()
+        return self._media.get(media_id)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite/WAL 后端，同一台机器上的多个 worker 共享一个文件"""
+
+    # 每写入多少次做一次过期和容量清理
+    PURGE_INTERVAL = 256
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL):
+        super().__init__(max_size, ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    data TEXT,
+                    created_at REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+                CREATE TABLE IF NOT EXISTS media (
+                    media_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (media_id, task_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_media_task_id ON media(task_id);
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT status, progress, message, data, created_at, updated_at FROM tasks WHERE task_id = ?",
+            (task_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[5] > self.ttl:
+            self.delete(task_id)
+            return None
+        return {
+            "status": row[0],
+            "progress": row[1],
+            "message": row[2],
+            "data": json.loads(row[3]) if row[3] is not None else None,
+            "created_at": row[4],
+        }
+
+    def set(self, task_id: str, record: Dict[str, Any]):
+        data = record.get("data")
+        self._conn().execute(
+            """
+            INSERT INTO tasks (task_id, status, progress, message, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(task_id) DO UPDATE SET
+                status = excluded.status,
+                progress = excluded.progress,
+                message = excluded.message,
+                data = excluded.data,
+                created_at = excluded.created_at,
+                updated_at = excluded.updated_at
+            """,
+            (
+                task_id,
+                record.get("status"),
+                record.get("progress", 0),
+                record.get("message", ""),
+                json.dumps(data, ensure_ascii=False) if data is not None else None,
+                record.get("created_at"),
+                time.time(),
+            ),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self.purge()
+
+    def purge(self):
+        """删除过期任务，并把任务数压回容量上限以内"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM tasks WHERE updated_at < ?", (time.time() - self.ttl,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()
+            if count > self.max_size:
+                conn.execute(
+                    "DELETE FROM tasks WHERE task_id IN "
+                    "(SELECT task_id FROM tasks ORDER BY updated_at LIMIT ?)",
+                    (count - self.max_size,),
+                )
+
+    def delete(self, task_id: str):
+        self._conn().execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+    def register_media(self, task_id: str, media_list: Iterable[dict]):
+        rows = []
+        for media in media_list:
+            if media.get("id") is None or "key" not in media:
+                continue
+            record = {k: v for k, v in media.items() if k != "watch_url"}
+            rows.append((str(media["id"]), task_id, json.dumps(record, ensure_ascii=False)))
+        if not rows:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO media (media_id, task_id, record) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def get_media(self, media_id: str) -> Optional[Dict[str, Any]]:
+        # 只返回未过期任务登记的媒体，与 get 的 TTL 判断一致
+        row = self._conn().execute(
+            """
+            SELECT media.record FROM media JOIN tasks ON tasks.task_id = media.task_id
+            WHERE media.media_id = ? AND tasks.updated_at >= ?
+            ORDER BY tasks.updated_at DESC LIMIT 1
+            """,
+            (str(media_id), time.time() - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()
+        return count
+
+
+class RedisTaskStore(TaskStore):
+    """Redis 协议后端
+
+    任务和媒体都以 JSON 字符串保存并设置过期时间，
+    另用一个有序集合按更新时间记录任务，超出容量时淘汰最旧的任务。
+    与 MediaRegistry 相同，登记媒体时记下每个任务的媒体 ID 集合和每个媒体的所属任务集合，
+    移除任务时按其媒体集合清理，只有最后一个所属任务被移除时才删除媒体索引。
+    client 只需实现 get/set/delete/zadd/zcard/zpopmin/zremrangebyscore/smembers 和 pipeline
+    （管道内用到 set/expire/sadd/srem/scard），可用本地 fake 替代。
+    """
+
+    def __init__(self, client, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL,
+                 prefix: str = "film-media:"):
+        super().__init__(max_size, ttl)
+        self.client = client
+        self.prefix = prefix
+        self._index_key = f"{prefix}tasks"
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisTaskStore":
+        """根据连接地址创建，需要安装 redis"""
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _task_key(self, task_id: str) -> str:
+        return f"{self.prefix}task:{task_id}"
+
+    def _media_key(self, media_id: str) -> str:
+        return f"{self.prefix}media:{media_id}"
+
+    def _owners_key(self, media_id: str) -> str:
+        return f"{self.prefix}media-owners:{media_id}"
+
+    def _task_media_key(self, task_id: str) -> str:
+        return f"{self.prefix}task-media:{task_id}"
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._task_key(task_id))
+        if raw is None:
+            return None
+        return _unpack(tuple(json.loads(raw)))
+
+    def set(self, task_id: str, record: Dict[str, Any]):
+        ttl = max(1, int(self.ttl))
+        self.client.set(self._task_key(task_id), json.dumps(_pack(record), ensure_ascii=False), ex=ttl)
+        self.client.zadd(self._index_key, {task_id: time.time()})
+        self._trim()
+
+    def _trim(self):
+        """淘汰超出容量或已过期的任务"""
+        # 任务键已由 Redis 过期删除，这里只同步清理有序集合
+        self.client.zremrangebyscore(self._index_key, 0, time.time() - self.ttl)
+        excess = self.client.zcard(self._index_key) - self.max_size
+        if excess <= 0:
+            return
+        for member, _ in self.client.zpopmin(self._index_key, excess):
+            task_id = member.decode() if isinstance(member, bytes) else member
+            self._delete_task(task_id)
+
+    def _delete_task(self, task_id: str):
+        task_media_key = self._task_media_key(task_id)
+        media_ids = [m.decode() if isinstance(m, bytes) else m for m in self.client.smembers(task_media_key)]
+        if media_ids:
+            # 移出所属任务并读取剩余数量在同一事务中完成
+            pipe = self.client.pipeline()
+            for media_id in media_ids:
+                pipe.srem(self._owners_key(media_id), task_id)
+                pipe.scard(self._owners_key(media_id))
+            remaining = pipe.execute()[1::2]
+            # 仍被其他任务引用的媒体保留索引
+            orphaned = [media_id for media_id, count in zip(media_ids, remaining) if count == 0]
+            if orphaned:
+                self.client.delete(*(self._media_key(m) for m in orphaned),
+                                   *(self._owners_key(m) for m in orphaned))
+        self.client.delete(task_media_key, self._task_key(task_id))
+
+    def delete(self, task_id: str):
+        self._delete_task(task_id)
+
+    def register_media(self, task_id: str, media_list: Iterable[dict]):
+        ttl = max(1, int(self.ttl))
+        media_ids = []
+        pipe = self.client.pipeline(transaction=False)
+        for media in media_list:
+            if media.get("id") is None or "key" not in media:
+                continue
+            media_id = str(media["id"])
+            record = {k: v for k, v in media.items() if k != "watch_url"}
+            pipe.set(self._media_key(media_id), json.dumps(record, ensure_ascii=False), ex=ttl)
+            pipe.sadd(self._owners_key(media_id), task_id)
+            pipe.expire(self._owners_key(media_id), ttl)
+            media_ids.append(media_id)
+        if not media_ids:
+            return
+        pipe.sadd(self._task_media_key(task_id), *media_ids)
+        pipe.expire(self._task_media_key(task_id), ttl)
+        pipe.execute()
+
+    def get_media(self, media_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._media_key(media_id))
+        return json.loads(raw) if raw is not None else None
+
+    def __len__(self) -> int:
+        return self.client.zcard(self._index_key)
+
+
+def create_task_store() -> TaskStore:
+    """根据环境变量创建任务存储
+
+    TASK_STORE_BACKEND: memory / sqlite / redis
+    TASK_STORE_URL: sqlite 文件路径或 redis 连接地址
+    TASK_STORE_MAX_SIZE: 最多保留的任务数
+    TASK_STORE_TTL: 任务最后一次更新后的保留秒数
+    """
+    backend = os.getenv("TASK_STORE_BACKEND", "memory").lower()
+    max_size = int(os.getenv("TASK_STORE_MAX_SIZE", DEFAULT_MAX_SIZE))
+    ttl = float(os.getenv("TASK_STORE_TTL", DEFAULT_TTL))
+
+    if backend == "sqlite":
+        path = os.getenv("TASK_STORE_URL", os.path.join("downloads", "task_store.sqlite3"))
+        return SQLiteTaskStore(path, max_size=max_size, ttl=ttl)
+    if backend == "redis":
+        url = os.getenv("TASK_STORE_URL", "redis://localhost:6379/0")
+        return RedisTaskStore.from_url(url, max_size=max_size, ttl=ttl)
+    if backend != "memory":
+        raise ValueError(f"不支持的任务存储后端: {backend}")
+    return MemoryTaskStore(max_size=max_size, ttl=ttl)
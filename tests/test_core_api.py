@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+core API 客户端熔断器：半开状态的试探请求无论以何种方式结束都要释放试探名额
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_api import AsyncCoreApiClient, CircuitBreaker  # noqa: E402
+
+RESET_TIMEOUT = 0.05
+
+
+async def _start_server(hang: asyncio.Event, entered: asyncio.Event):
+    """hang 未设置时 /slow 一直挂起，/ok 立即返回"""
+    async def slow(request):
+        entered.set()
+        await hang.wait()
+        return web.json_response({"ok": True})
+
+    async def ok(request):
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/slow", slow)
+    app.router.add_post("/ok", ok)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 1.5)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    async def scenario():
+        hang, entered = asyncio.Event(), asyncio.Event()
+        runner, base_url = await _start_server(hang, entered)
+        breaker = _half_open_breaker()
+        client = AsyncCoreApiClient(base_url, "token", max_retries=0, breaker=breaker)
+        try:
+            probe = asyncio.ensure_future(client.request("POST", "slow"))
+            await asyncio.wait_for(entered.wait(), 5)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+            # 被取消的试探按失败处理，重新熔断
+            assert breaker.state == CircuitBreaker.OPEN
+            await asyncio.sleep(RESET_TIMEOUT * 1.5)
+            # 冷却后可以再次试探，成功后恢复
+            assert await client.request("POST", "ok") == {"ok": True}
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            hang.set()
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_probe_failing_with_unexpected_error_releases_slot():
+    async def scenario():
+        hang, entered = asyncio.Event(), asyncio.Event()
+        runner, base_url = await _start_server(hang, entered)
+        breaker = _half_open_breaker()
+        client = AsyncCoreApiClient(base_url, "token", max_retries=0, breaker=breaker)
+        try:
+            # 请求体无法序列化为 JSON，在发出请求前抛出 TypeError
+            with pytest.raises(TypeError):
+                await client.request("POST", "ok", json_body=object())
+            assert breaker.state == CircuitBreaker.OPEN
+            await asyncio.sleep(RESET_TIMEOUT * 1.5)
+            assert await client.request("POST", "ok") == {"ok": True}
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            hang.set()
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+向量请求合并器：发送中的批次任务被持有，close() 取消并等待它们
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+def test_send_tasks_tracked_until_done():
+    async def embed_documents(texts):
+        await asyncio.sleep(0.01)
+        return [[float(len(text))] for text in texts]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_documents, window=0.001)
+        results = await asyncio.gather(batcher.embed("a"), batcher.embed("bb"))
+        assert results == [[1.0], [2.0]]
+        assert batcher._tasks == set()
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_in_flight_batches():
+    started = None
+
+    async def embed_documents(texts):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def scenario():
+        nonlocal started
+        started = asyncio.Event()
+        batcher = EmbeddingBatcher(embed_documents, window=0.001)
+        waiter = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.wait_for(started.wait(), 5)
+        assert len(batcher._tasks) == 1
+
+        await batcher.close()
+        assert batcher._tasks == set()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+媒体缓存：按累计大小淘汰，下载完成后不保留按对象的锁
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_cache import MediaCache  # noqa: E402
+
+SIZE = 1000
+
+
+class FakeDownloader:
+    """按 key 写入固定大小的文件，记录下载次数"""
+
+    def __init__(self):
+        self.downloads = 0
+
+    def download(self, bucket, key, local_path, on_bytes=None, head=None):
+        self.downloads += 1
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "wb") as f:
+            f.write(b"\0" * SIZE)
+
+
+def _head(key: str) -> dict:
+    return {"ETag": f'"{key}"', "ContentLength": SIZE}
+
+
+def test_evicts_by_running_total_without_scanning_every_miss(tmp_path):
+    cache = MediaCache(str(tmp_path), FakeDownloader(), max_bytes=3 * SIZE)
+    scans = []
+    entries = cache._entries
+    cache._entries = lambda: scans.append(1) or entries()
+
+    for i in range(3):
+        cache.fetch("bucket", f"film/{i}.mp4", _head(f"{i}"))
+    # 首次下载扫描一次得到基准，之后只累加
+    assert len(scans) == 1
+    assert cache._usage == 3 * SIZE
+
+    cache.fetch("bucket", "film/3.mp4", _head("3"))
+    assert len(scans) == 2
+    assert cache.usage() <= 3 * SIZE
+    assert cache._usage == cache.usage()
+
+
+def test_key_locks_released_after_fetch(tmp_path):
+    downloader = FakeDownloader()
+    cache = MediaCache(str(tmp_path), downloader, max_bytes=100 * SIZE)
+    threads = [
+        threading.Thread(target=cache.fetch, args=("bucket", f"film/{i % 4}.mp4", _head(f"{i % 4}")))
+        for i in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert downloader.downloads == 4
+    assert cache._key_locks == {}
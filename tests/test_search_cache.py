@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+搜索结果缓存失效：清空后不再返回旧结果，失效前开始的计算结果不写入缓存
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_cache import SearchResultCache  # noqa: E402
+
+
+def _result(media_id: str) -> dict:
+    return {"success": True, "media_list": [{"id": media_id}]}
+
+
+def test_clear_drops_cached_results():
+    async def scenario():
+        cache = SearchResultCache()
+
+        async def old():
+            return _result("old")
+
+        async def new():
+            return _result("new")
+
+        assert (await cache.get_or_compute("日落", 0, 5, old))["media_list"] == [{"id": "old"}]
+        cache.clear()
+        assert (await cache.get_or_compute("日落", 0, 5, new))["media_list"] == [{"id": "new"}]
+
+    asyncio.run(scenario())
+
+
+def test_computation_started_before_clear_is_not_cached():
+    async def scenario():
+        cache = SearchResultCache()
+        started, release = asyncio.Event(), asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            started.set()
+            await release.wait()
+            return _result(f"v{len(calls)}")
+
+        stale = asyncio.ensure_future(cache.get_or_compute("日落", 0, 5, compute))
+        await started.wait()
+        cache.clear()
+        # 清空后的请求不加入旧的计算
+        fresh = asyncio.ensure_future(cache.get_or_compute("日落", 0, 5, compute))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(stale, fresh)
+
+        assert len(calls) == 2
+        assert cache.get("日落", 0, 5)["media_list"] == [{"id": "v2"}]
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_only_matching_text():
+    cache = SearchResultCache()
+    cache.set("日落", 0, 5, _result("a"))
+    cache.set("海浪", 0, 5, _result("b"))
+    cache.invalidate(" 日落 ")
+    assert cache.get("日落", 0, 5) is None
+    assert cache.get("海浪", 0, 5) is not None
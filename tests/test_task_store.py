@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+任务存储的媒体索引：随任务移除而清理，被多个任务引用的媒体只在最后一个任务移除时删除
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import MemoryTaskStore, RedisTaskStore, SQLiteTaskStore  # noqa: E402
+
+
+def _media(media_id: str) -> dict:
+    return {"id": media_id, "key": f"film/{media_id}.mp4", "watch_url": "https://example.com"}
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "sqlite":
+            return SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"), **kwargs)
+        if request.param == "redis":
+            fakeredis = pytest.importorskip("fakeredis")
+            return RedisTaskStore(fakeredis.FakeRedis(), **kwargs)
+        return MemoryTaskStore(**kwargs)
+    return make
+
+
+def _complete(store, task_id: str, data: dict, media_list: list):
+    store.set(task_id, {"status": "completed", "progress": 100, "message": "", "data": data,
+                        "created_at": time.time()})
+    store.register_media(task_id, media_list)
+
+
+def test_batch_media_removed_with_task(make_store):
+    store = make_store()
+    items = [{"text": "a", "media_list": [_media("m1")]}, {"text": "b", "media_list": [_media("m2")]}]
+    _complete(store, "batch", {"items": items}, [_media("m1"), _media("m2")])
+    assert store.get_media("m2") == {"id": "m2", "key": "film/m2.mp4"}
+
+    store.delete("batch")
+    assert store.get_media("m1") is None
+    assert store.get_media("m2") is None
+
+
+def test_shared_media_kept_until_last_owner_removed(make_store):
+    store = make_store()
+    _complete(store, "old", {"media_list": [_media("m1")]}, [_media("m1")])
+    _complete(store, "new", {"media_list": [_media("m1")]}, [_media("m1")])
+
+    store.delete("old")
+    assert store.get_media("m1") is not None
+    store.delete("new")
+    assert store.get_media("m1") is None
+
+
+def test_media_of_expired_task_not_returned(make_store):
+    store = make_store(ttl=1)
+    _complete(store, "task", {"media_list": [_media("m1")]}, [_media("m1")])
+    assert store.get_media("m1") is not None
+    time.sleep(1.1)
+    assert store.get_media("m1") is None
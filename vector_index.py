@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地向量索引
+加载 film media 目录快照（id、key、元数据、512 维向量）到连续的 float32 矩阵，
+在本地完成 match-film-media 的余弦相似度检索：
+- exact: 矩阵乘法 + argpartition 精确 top-k
+- ivf:   倒排聚类近似检索，只扫描与查询最接近的 nprobe 个聚类，适合大目录
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_codec import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# 聚类时参与训练的最大样本数，以及分块计算时每块的行数
+_TRAIN_SAMPLE = 65536
+_CHUNK_ROWS = 65536
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """按行归一化（原地）"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回分数最高的 k 个下标（按分数降序）"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """分块计算每行最近的聚类中心"""
+    labels = np.empty(data.shape[0], dtype=np.int32)
+    for start in range(0, data.shape[0], _CHUNK_ROWS):
+        block = data[start:start + _CHUNK_ROWS]
+        labels[start:start + _CHUNK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def _spherical_kmeans(data: np.ndarray, nlist: int, iterations: int, seed: int) -> np.ndarray:
+    """球面 k-means，返回归一化后的聚类中心"""
+    rng = np.random.default_rng(seed)
+    if data.shape[0] > _TRAIN_SAMPLE:
+        data = data[rng.choice(data.shape[0], _TRAIN_SAMPLE, replace=False)]
+    centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        present, starts = np.unique(sorted_labels, return_index=True)
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        # 空聚类保留原中心
+        centroids[present] = sums
+        _normalize_rows(centroids)
+    return centroids
+
+
+class LocalVectorIndex:
+    """film media 本地向量索引"""
+
+    def __init__(self, ids: Sequence[Any], keys: Sequence[str], embeddings: np.ndarray,
+                 metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None):
+        if len(ids) != len(keys) or len(ids) != embeddings.shape[0]:
+            raise ValueError("ids、keys 与向量数量不一致")
+        self.ids = list(ids)
+        self.keys = list(keys)
+        self.metadata = list(metadata) if metadata is not None else [None] * len(self.ids)
+        self.matrix = _normalize_rows(np.ascontiguousarray(embeddings, dtype=np.float32))
+        # IVF 结构：聚类中心，以及按聚类重排后每个聚类在矩阵中的区间
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.nprobe = 8
+        self.mode = "exact"
+
+    @property
+    def dimensions(self) -> int:
+        return self.matrix.shape[1]
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorIndex":
+        """加载目录快照
+
+        .npz: 数组 ids、keys、embeddings，可选 metadata（每行一个 JSON 字符串）
+        .jsonl: 每行 {"id", "key", "embedding", 其余字段作为元数据}
+        """
+        if path.endswith(".npz"):
+            with np.load(path, allow_pickle=False) as snapshot:
+                metadata = None
+                if "metadata" in snapshot.files:
+                    metadata = [json.loads(m) if m else None for m in snapshot["metadata"].tolist()]
+                return cls(snapshot["ids"].tolist(), snapshot["keys"].tolist(),
+                           snapshot["embeddings"], metadata)
+
+        ids, keys, vectors, metadata = [], [], [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                ids.append(item.pop("id"))
+                keys.append(item.pop("key"))
+                vectors.append(item.pop("embedding"))
+                metadata.append(item or None)
+        return cls(ids, keys, np.asarray(vectors, dtype=np.float32), metadata)
+
+    def save(self, path: str):
+        """保存为 .npz 快照"""
+        metadata = np.array([json.dumps(m, ensure_ascii=False) if m else "" for m in self.metadata])
+        np.savez(path, ids=np.array(self.ids), keys=np.array(self.keys),
+                 embeddings=self.matrix, metadata=metadata)
+
+    def build_ivf(self, nlist: Optional[int] = None, nprobe: int = 8, iterations: int = 10, seed: int = 0):
+        """构建倒排聚类索引，并按聚类重排矩阵使每个聚类连续存放"""
+        n = len(self)
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        centroids = _spherical_kmeans(self.matrix, nlist, iterations, seed)
+        labels = _assign(self.matrix, centroids)
+        order = np.argsort(labels, kind="stable")
+
+        self.matrix = np.ascontiguousarray(self.matrix[order])
+        self.ids = [self.ids[i] for i in order]
+        self.keys = [self.keys[i] for i in order]
+        self.metadata = [self.metadata[i] for i in order]
+        counts = np.bincount(labels, minlength=nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.centroids = centroids
+        self.nprobe = nprobe
+        self.mode = "ivf"
+
+    def _prepare_query(self, query: Sequence[float]) -> np.ndarray:
+        # 也接受 embedding_codec 的紧凑格式
+        q = decode_embedding(query) if isinstance(query, (str, bytes)) else np.asarray(query, dtype=np.float32)
+        q = q.reshape(-1)
+        if q.shape[0] != self.dimensions:
+            raise ValueError(f"查询向量维度 {q.shape[0]} 与索引维度 {self.dimensions} 不一致")
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def search_indices(self, query: Sequence[float], k: int, mode: Optional[str] = None,
+                       nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (下标, 相似度)，按相似度降序；mode 默认使用索引当前模式"""
+        q = self._prepare_query(query)
+        if (mode or self.mode) == "ivf" and self.centroids is not None:
+            probes = _top_k(self.centroids @ q, nprobe or self.nprobe)
+            ranges = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in probes]
+            ranges = [(start, end) for start, end in ranges if end > start]
+            if not ranges:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            scores = np.concatenate([self.matrix[start:end] @ q for start, end in ranges])
+            positions = np.concatenate([np.arange(start, end) for start, end in ranges])
+            best = _top_k(scores, k)
+            return positions[best], scores[best]
+
+        scores = self.matrix @ q
+        best = _top_k(scores, k)
+        return best, scores[best]
+
+    def search(self, query: Sequence[float], match_threshold: float = 0, match_count: int = 5,
+               mode: Optional[str] = None, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """与 match-film-media 相同的语义：相似度大于阈值，按相似度降序，最多 match_count 条"""
+        indices, scores = self.search_indices(query, match_count, mode, nprobe)
+        results = []
+        for index, score in zip(indices.tolist(), scores.tolist()):
+            if score <= match_threshold:
+                break
+            item = dict(self.metadata[index] or {})
+            item.update({"id": self.ids[index], "key": self.keys[index], "similarity": score})
+            results.append(item)
+        return results
+
+
+def load_local_index() -> Optional[LocalVectorIndex]:
+    """根据环境变量加载本地索引，未配置时返回 None
+
+    FILM_MEDIA_INDEX_PATH: 目录快照文件（.npz 或 .jsonl）
+    FILM_MEDIA_INDEX_MODE: exact / ivf
+    FILM_MEDIA_INDEX_NLIST / FILM_MEDIA_INDEX_NPROBE: IVF 参数
+    """
+    path = os.getenv("FILM_MEDIA_INDEX_PATH")
+    if not path:
+        return None
+    index = LocalVectorIndex.load(path)
+    if os.getenv("FILM_MEDIA_INDEX_MODE", "exact") == "ivf":
+        nlist = os.getenv("FILM_MEDIA_INDEX_NLIST")
+        index.build_ivf(
+            nlist=int(nlist) if nlist else None,
+            nprobe=int(os.getenv("FILM_MEDIA_INDEX_NPROBE", 8)),
+        )
+    logger.info("本地向量索引已加载: %d 条, 模式 %s", len(index), index.mode)
+    return index